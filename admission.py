@@ -0,0 +1,179 @@
+"""
+Admission control for the Send OTP path:
+- token-bucket rate limits per email and per client IP
+- a dedicated, bounded thread pool so OTP work never queues on (or starves)
+  asyncio's default executor; once max_workers + max_queue calls are in
+  flight, new ones are rejected immediately instead of waiting
+- accepted / throttled / rejected counters
+- client_address: the client IP the per-IP limit is keyed on, which only
+  trusts X-Forwarded-For entries added by the TRUSTED_PROXY_HOPS proxies
+  in front of the app
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self, now: float, tokens: float = 1.0) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+
+class KeyedRateLimiter:
+    """
+    One token bucket per key. Only the max_keys most recently seen keys are
+    kept; a forgotten key simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float, max_keys: int = 100000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.try_acquire(now)
+
+
+def client_address(peer: Optional[str], forwarded: Optional[str], trusted_hops: int = 0) -> Optional[str]:
+    """
+    Client IP of a request from peer (the socket address) and its
+    X-Forwarded-For header. Each of the trusted_hops proxies in front of the
+    app appends the address it saw, so the client is the trusted_hops-th
+    entry from the right; anything left of it was sent by the client and is
+    ignored. With no trusted proxies the header is ignored entirely.
+    """
+    if trusted_hops <= 0 or not forwarded:
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+    if len(hops) < trusted_hops:
+        return peer
+    return hops[-trusted_hops]
+
+
+class RejectedError(Exception):
+    pass
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers: int = 4, max_queue: int = 32, name: str = 'bounded'):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        # calls waiting for a worker thread
+        return max(0, self._in_flight - self.max_workers)
+
+    def _done(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def submit(self, fn, *args):
+        """
+        Queue fn(*args) on the pool; raises RejectedError when the pool and its queue are full.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise RejectedError('executor saturated')
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class AdmissionController:
+    def __init__(self,
+                 per_email: KeyedRateLimiter,
+                 per_ip: KeyedRateLimiter,
+                 executor: BoundedExecutor):
+        self.per_email = per_email
+        self.per_ip = per_ip
+        self.executor = executor
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.throttled = 0
+        self.rejected = 0
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def check(self, email: str, client_ip: Optional[str]) -> bool:
+        """
+        Rate-limit check only; False means the caller should be throttled.
+        """
+        # the IP bucket is checked first so a bot cycling emails cannot drain email buckets
+        if client_ip and not self.per_ip.allow(client_ip):
+            self._count('throttled')
+            return False
+        if not self.per_email.allow(email.lower()):
+            self._count('throttled')
+            return False
+        return True
+
+    async def submit(self, fn, *args):
+        try:
+            future = self.executor.submit(fn, *args)
+        except RejectedError:
+            self._count('rejected')
+            raise
+        self._count('accepted')
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'accepted': self.accepted,
+                'throttled': self.throttled,
+                'rejected': self.rejected,
+                'in_flight': self.executor.in_flight,
+                'queue_depth': self.executor.queue_depth,
+            }
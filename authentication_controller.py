@@ -1,23 +1,85 @@
 from email_service import send_mail, has_email_provider
-from otp_generator import generate_otp
+from otp_generator import generate_otp, ReplayGuard, TOTPGenerator, TOTPGuard
+from otp_store import OTPBackend, OTPStore
+from outbox import DeliveryWorkers, Outbox, SENT
+from admission import AdmissionController, BoundedExecutor, KeyedRateLimiter
+from metrics import Counter, Gauge, Histogram
+from typing import Optional
 import os
+import secrets
+import time
 
-# in-memory store for OTPs (for demo/simple use)
-user_otp = {}
 
-def send_otp(email: str) -> bool:
+def create_otp_store() -> OTPBackend:
     """
-    Generate an OTP, store it and attempt sending it.
-    Returns True on success, False on failure.
+    Build the OTP backend selected by OTP_BACKEND:
+    - memory (default): per-process store, fine for a single main.py
+    - sqlite: file at OTP_SQLITE_PATH shared by every process on the host
     """
-    email = email.strip()
-    if not email:
-        print('send_otp: empty email provided')
-        return False
+    ttl = float(os.getenv('OTP_TTL_SECONDS', 300))
+    max_entries = int(os.getenv('OTP_MAX_ENTRIES', 10000))
+    max_attempts = int(os.getenv('OTP_MAX_ATTEMPTS', 5))
+    backend = os.getenv('OTP_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        from otp_sqlite import SQLiteOTPStore
+        return SQLiteOTPStore(
+            path=os.getenv('OTP_SQLITE_PATH', 'otp.sqlite3'),
+            ttl=ttl,
+            max_entries=max_entries,
+            max_attempts=max_attempts,
+        )
+    if backend != 'memory':
+        print(f'Unknown OTP_BACKEND {backend!r}; using memory')
+    return OTPStore(ttl=ttl, max_entries=max_entries, max_attempts=max_attempts)
+
+
+def create_totp_guard() -> TOTPGuard:
+    """
+    Used codes and failed attempts of stateless mode, kept where OTP_BACKEND
+    says: in this process (memory) or in OTP_SQLITE_PATH, shared by every
+    process on the host, so a code used on one worker can't be replayed on another.
+    """
+    backend = os.getenv('OTP_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        from otp_sqlite import SQLiteReplayGuard
+        return SQLiteReplayGuard(path=os.getenv('OTP_SQLITE_PATH', 'otp.sqlite3'))
+    if backend != 'memory':
+        print(f'Unknown OTP_BACKEND {backend!r}; using memory')
+    return ReplayGuard(max_entries=int(os.getenv('OTP_MAX_ENTRIES', 10000)))
+
+
+def create_totp() -> TOTPGenerator:
+    """
+    Stateless mode (OTP_MODE=stateless): codes are derived from OTP_SECRET and
+    the time window, so no code is stored and any process can verify them.
+    """
+    secret = os.getenv('OTP_SECRET')
+    if not secret:
+        print('OTP_SECRET not set; using a random per-process secret (codes only verify on this process)')
+        secret = secrets.token_hex(32)
+    return TOTPGenerator(
+        secret=secret.encode(),
+        step=int(os.getenv('OTP_TOTP_STEP', 60)),
+        drift=int(os.getenv('OTP_TOTP_DRIFT', 1)),
+        max_attempts=int(os.getenv('OTP_MAX_ATTEMPTS', 5)),
+        replay_guard=create_totp_guard(),
+    )
+
 
-    otp = generate_otp()
-    user_otp[email] = otp
+OTP_MODE = os.getenv('OTP_MODE', 'stored').lower()
+if OTP_MODE == 'stateless':
+    totp = create_totp()
+    otp_store = None
+else:
+    totp = None
+    otp_store = create_otp_store()
 
+
+def deliver_otp(email: str, otp: str) -> bool:
+    """
+    Send one OTP email (called by the outbox delivery workers).
+    Returns True on success, False on failure.
+    """
     # If no external provider configured, for convenience return True but log the OTP
     # (you can set DEV_SHOW_OTP to true in main to show it in the UI during testing)
     if not has_email_provider():
@@ -32,6 +94,136 @@ def send_otp(email: str) -> bool:
         else:
             print(f'Failed to send OTP to {email}')
             return False
+    except Exception as e:
+        print(f'Exception in deliver_otp: {e}')
+        return False
+
+
+# ---------------- Metrics ---------------- #
+otp_send_seconds = Histogram('otp_send_seconds', 'send_otp latency (generate, store and queue)')
+otp_send = Counter('otp_send', 'send_otp calls by result', labelnames=('result',))
+otp_delivery_seconds = Histogram(
+    'otp_delivery_seconds', 'Time from send_otp until the email was accepted by a provider',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+otp_delivery = Counter('otp_delivery', 'Outbox delivery attempts by resulting state', labelnames=('state',))
+_otp_send_ok = otp_send.labels('ok')
+_otp_send_error = otp_send.labels('error')
+
+
+def record_delivery(state: str, created_at: float):
+    otp_delivery.labels(state).inc()
+    if state == SENT:
+        otp_delivery_seconds.observe(max(0.0, time.time() - created_at))
+
+
+outbox = Outbox(
+    path=os.getenv('OUTBOX_PATH', 'outbox.sqlite3'),
+    max_attempts=int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5)),
+    backoff_base=float(os.getenv('OUTBOX_BACKOFF_BASE', 1)),
+    backoff_max=float(os.getenv('OUTBOX_BACKOFF_MAX', 60)),
+    retention_seconds=float(os.getenv('OUTBOX_RETENTION_SECONDS', 86400)),
+)
+# started / stopped with the app (see main.py)
+delivery_workers = DeliveryWorkers(
+    outbox, deliver_otp, workers=int(os.getenv('OUTBOX_WORKERS', 2)), on_result=record_delivery
+)
+
+# rate limits and a dedicated bounded pool for the Send OTP button (see main.py)
+otp_admission = AdmissionController(
+    per_email=KeyedRateLimiter(
+        rate_per_minute=float(os.getenv('OTP_RATE_PER_EMAIL', 3)),
+        burst=float(os.getenv('OTP_BURST_PER_EMAIL', 3)),
+    ),
+    per_ip=KeyedRateLimiter(
+        rate_per_minute=float(os.getenv('OTP_RATE_PER_IP', 20)),
+        burst=float(os.getenv('OTP_BURST_PER_IP', 10)),
+    ),
+    executor=BoundedExecutor(
+        max_workers=int(os.getenv('OTP_EXECUTOR_WORKERS', 4)),
+        max_queue=int(os.getenv('OTP_EXECUTOR_QUEUE', 32)),
+        name='send-otp',
+    ),
+)
+Gauge('otp_executor_queue_depth', 'Send OTP calls waiting for a worker').set_function(
+    lambda: otp_admission.executor.queue_depth)
+Gauge('otp_executor_in_flight', 'Send OTP calls running or queued').set_function(
+    lambda: otp_admission.executor.in_flight)
+Counter('otp_admission_accepted', 'Send OTP requests admitted').set_function(lambda: otp_admission.accepted)
+Counter('otp_admission_throttled', 'Send OTP requests rate limited').set_function(lambda: otp_admission.throttled)
+Counter('otp_admission_rejected', 'Send OTP requests rejected (executor full)').set_function(lambda: otp_admission.rejected)
+
+
+class ResendTooSoon(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f'a new code can be sent in {retry_after:.0f} s')
+        self.retry_after = retry_after
+
+
+def send_otp(email: str) -> Optional[str]:
+    """
+    Generate an OTP, store it and queue it for delivery.
+    Returns the outbox message id (poll it with delivery_status), or None on failure.
+    Raises ResendTooSoon in stateless mode if this window's code was already used.
+    """
+    with otp_send_seconds.time():
+        message_id = _send_otp(email)
+    (_otp_send_ok if message_id else _otp_send_error).inc()
+    return message_id
+
+
+def _send_otp(email: str) -> Optional[str]:
+    email = email.strip()
+    if not email:
+        print('send_otp: empty email provided')
+        return None
+
+    now = time.time()
+    if totp is not None:
+        retry_after = totp.retry_after(email, at=now)
+        if retry_after > 0:
+            raise ResendTooSoon(retry_after)
+        otp = totp.generate(email, at=now)
+        expires_at = totp.expires_at(at=now)
+    else:
+        otp = generate_otp()
+        otp_store.put(email, otp)
+        expires_at = now + otp_store.ttl
+
+    try:
+        # not delivered at all once the code can no longer be used
+        return outbox.enqueue(email, otp, expires_at=expires_at)
     except Exception as e:
         print(f'Exception in send_otp: {e}')
+        return None
+
+
+def delivery_status(message_id: str) -> Optional[str]:
+    """
+    queued / sending / retrying / sent / dead, or None for an unknown id.
+    """
+    status = outbox.status(message_id)
+    return status['status'] if status is not None else None
+
+
+def verify_otp(email: str, otp: str) -> bool:
+    """
+    Check the OTP entered for email. A correct OTP can only be used once.
+    """
+    email = (email or '').strip()
+    otp = (otp or '').strip()
+    if not email or not otp:
         return False
+    if totp is not None:
+        return totp.verify(email, otp)
+    return otp_store.verify(email, otp)
+
+
+def peek_otp(email: str) -> Optional[str]:
+    """
+    Current OTP for email without consuming it (DEV_SHOW_OTP debugging only).
+    """
+    email = (email or '').strip()
+    if totp is not None:
+        return totp.generate(email)
+    return otp_store.peek(email)
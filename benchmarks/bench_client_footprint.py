@@ -0,0 +1,103 @@
+"""
+Measure server memory and element count per connected page client.
+
+Starts main.py with DEBUG_FOOTPRINT enabled, opens N simulated clients per
+page (each GET builds the page's full element tree on the server, exactly as
+a browser visit does) and reports RSS growth and elements per client. Exits
+with status 1 when a budget is exceeded, so it can gate CI.
+
+    python benchmarks/bench_client_footprint.py --clients 200 --path /dashboard --path /campaign/n1-western-bypass
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get(url: str, timeout: float = 30.0) -> bytes:
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return resp.read()
+
+
+def footprint(base: str) -> dict:
+    return json.loads(get(f'{base}/_debug/footprint?collect=true'))
+
+
+def wait_ready(base: str, server: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'server exited with status {server.returncode}')
+        try:
+            return footprint(base)
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start in time')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=100, help='simulated clients per page')
+    parser.add_argument('--path', action='append', dest='paths', help='page to open (repeatable)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--max-kib-per-client', type=float, default=1536.0, help='RSS budget per client')
+    parser.add_argument('--max-elements-per-client', type=float, default=250.0, help='element budget per client')
+    parser.add_argument('--startup-timeout', type=float, default=60.0)
+    args = parser.parse_args()
+    paths = args.paths or ['/dashboard']
+
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, PORT=str(port), DEBUG_FOOTPRINT='true')
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'main.py')],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    failed = False
+    try:
+        # warm each page once so imports and caches don't count against clients
+        wait_ready(base, server, args.startup_timeout)
+        for path in paths:
+            get(base + path)
+
+        for path in paths:
+            before = footprint(base)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                list(pool.map(lambda _: get(base + path), range(args.clients)))
+            elapsed = time.perf_counter() - start
+            after = footprint(base)
+
+            kib_per_client = (after['rss_bytes'] - before['rss_bytes']) / 1024 / args.clients
+            elements = (after['elements'] - before['elements']) / args.clients
+            over = kib_per_client > args.max_kib_per_client or elements > args.max_elements_per_client
+            failed |= over
+            print(f'{path:<40} {args.clients} clients in {elapsed:.2f}s  '
+                  f'{kib_per_client:8.1f} KiB/client  {elements:6.1f} elements/client  '
+                  f'{after["gc_objects"] - before["gc_objects"]:+d} objects'
+                  + ('  OVER BUDGET' if over else ''))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Sustained car-count ingestion rate of CountIngester on one core.
+
+Cameras post batches of --batch events. For --seconds, batches are fed to
+the ingester while its background thread flushes to a temporary log
+directory and the car_counts rollups, as in the server. The rate is
+measured twice: for ingest() alone, and including json.loads of the
+request body, which is what /api/ingest does per request. At the end the
+log is replayed to check that every event was written.
+
+    python benchmarks/bench_ingest.py --cameras 500 --batch 100 --seconds 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ingestion import CountIngester, SegmentLog  # noqa: E402
+from timeseries import TimeSeriesStore  # noqa: E402
+
+
+def make_bodies(cameras: int, batch: int, seed: int = 1):
+    """
+    One request body per camera, each with `batch` events a second apart.
+    """
+    rng = np.random.default_rng(seed)
+    start = int(time.time()) - batch
+    return [
+        json.dumps({'batches': [{
+            'camera_id': f'cam-{c}',
+            'timestamps': list(range(start, start + batch)),
+            'counts': rng.integers(0, 30, batch).tolist(),
+        }]}).encode()
+        for c in range(cameras)
+    ]
+
+
+def run(ingester: CountIngester, bodies, seconds: float, parse: bool) -> int:
+    parsed = [json.loads(body)['batches'][0] for body in bodies]
+    events = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for body, batch in zip(bodies, parsed):
+            if parse:
+                batch = json.loads(body)['batches'][0]
+            events += ingester.ingest(batch['camera_id'], batch['timestamps'], batch['counts'])
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cameras', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=100, help='events per request')
+    parser.add_argument('--seconds', type=float, default=10.0, help='per measurement')
+    parser.add_argument('--capacity', type=int, default=4096, help='ring buffer events per camera')
+    parser.add_argument('--flush-seconds', type=float, default=1.0)
+    args = parser.parse_args()
+
+    bodies = make_bodies(args.cameras, args.batch)
+    for parse in (False, True):
+        with tempfile.TemporaryDirectory() as directory:
+            ingester = CountIngester(directory, capacity=args.capacity, flush_seconds=args.flush_seconds,
+                                     sink=TimeSeriesStore())
+            start = time.perf_counter()
+            events = run(ingester, bodies, args.seconds, parse)
+            ingester.stop()
+            elapsed = time.perf_counter() - start
+            written = sum(len(ts) for _, ts, _ in SegmentLog.replay(os.path.join(directory, '0')))
+            if written != events:
+                raise AssertionError(f'{events} events ingested but {written} in the log')
+            label = 'json.loads + ingest()' if parse else 'ingest()'
+            print(f'{label:>22}: {events / elapsed:>12,.0f} events/s  ({events:,} events in {elapsed:.1f}s, '
+                  f'{ingester.stats()["cameras"]} cameras, all replayed from the log)')
+
+
+if __name__ == '__main__':
+    main()
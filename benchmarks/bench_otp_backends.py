@@ -0,0 +1,59 @@
+"""
+Compare OTP verification throughput across storage backends.
+
+    python benchmarks/bench_otp_backends.py --emails 20000 --threads 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from otp_store import OTPStore  # noqa: E402
+from otp_sqlite import SQLiteOTPStore  # noqa: E402
+
+
+def run(store, emails, threads):
+    for i, email in enumerate(emails):
+        store.put(email, f'{i % 1000000:06d}')
+
+    def verify_chunk(chunk):
+        ok = 0
+        for i, email in chunk:
+            ok += store.verify(email, f'{i % 1000000:06d}')
+        return ok
+
+    indexed = list(enumerate(emails))
+    chunks = [indexed[n::threads] for n in range(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        verified = sum(pool.map(verify_chunk, chunks))
+    elapsed = time.perf_counter() - start
+    return verified, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    emails = [f'user{i}@novo.com' for i in range(args.emails)]
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            'memory': OTPStore(max_entries=2 * args.emails),
+            'sqlite': SQLiteOTPStore(path=os.path.join(tmp, 'otp.sqlite3'), max_entries=2 * args.emails),
+        }
+        print(f'{"backend":<8} {"verified":>9} {"seconds":>8} {"verify/s":>10}')
+        for name, store in backends.items():
+            verified, elapsed = run(store, emails, args.threads)
+            print(f'{name:<8} {verified:>9} {elapsed:>8.3f} {verified / elapsed:>10.0f}')
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Full and incremental report runs of ReportPipeline, and event-loop lag.
+
+Builds --campaigns campaigns of --cameras cameras with --days of hourly
+car counts, then measures:
+- the first run, which reports the whole history;
+- incremental runs after each further hour of counts arrives;
+- the worst event-loop stall while the runs are in flight, against the
+  stall of computing the same first run inline on the loop.
+The last incremental reports are checked against a from-scratch run.
+
+    python benchmarks/bench_reports.py --campaigns 200 --cameras 4 --days 90
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from campaign_repository import CampaignRepository  # noqa: E402
+from report_pipeline import HOUR, ReportJob, ReportPipeline, compute_report  # noqa: E402
+from timeseries import TimeSeriesStore  # noqa: E402
+
+
+def write_campaigns(path: str, n: int, cameras: int):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('campaign_id,description,area,status,cameras,reports\n')
+        for i in range(n):
+            f.write(f'c{i},Campaign {i},Area {i % 10},open,{cameras},0\n')
+
+
+def add_hours(store: TimeSeriesStore, repository: CampaignRepository, start: int, hours: int, rng):
+    buckets = start + np.arange(hours, dtype=np.int64) * HOUR
+    profile = 40 + 30 * np.sin((buckets // HOUR % 24) / 24 * 2 * np.pi)
+    for campaign in repository.list():
+        for camera_id in campaign.camera_ids:
+            store.add(camera_id, buckets, rng.poisson(profile))
+
+
+class LagMonitor:
+    """
+    Largest gap between wake-ups of a coroutine that sleeps `tick` seconds.
+    """
+
+    def __init__(self, tick: float = 0.005):
+        self.tick = tick
+        self.worst = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.tick)
+            self.worst = max(self.worst, time.perf_counter() - t0 - self.tick)
+
+    def __enter__(self):
+        self.worst = 0.0
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+async def timed(coro, monitor: LagMonitor):
+    with monitor:
+        await asyncio.sleep(0.05)  # let the monitor start ticking
+        t0 = time.perf_counter()
+        result = await coro
+        elapsed = time.perf_counter() - t0
+        await asyncio.sleep(monitor.tick * 4)  # let it see a stall that just ended
+    return result, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--campaigns', type=int, default=200)
+    parser.add_argument('--cameras', type=int, default=4)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--increments', type=int, default=5, help='incremental runs of one new hour each')
+    parser.add_argument('--start-method', default='forkserver', choices=('fork', 'forkserver', 'spawn'))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'campaigns.csv')
+        write_campaigns(path, args.campaigns, args.cameras)
+        repository = CampaignRepository(path)
+        store = TimeSeriesStore()
+        start = int(time.time()) // HOUR * HOUR - args.days * 24 * HOUR
+        add_hours(store, repository, start, args.days * 24, rng)
+        print(f'{args.campaigns} campaigns x {args.cameras} cameras, {args.days} days of hourly counts, '
+              f'{args.workers} workers')
+
+        monitor = LagMonitor()
+        pipeline = ReportPipeline(repository, store, workers=args.workers, start_method=args.start_method)
+        made, elapsed = await timed(pipeline.run_once(), monitor)
+        print(f'first run:        {made} reports in {elapsed:6.2f}s  loop stall max {monitor.worst * 1000:6.1f} ms')
+
+        times, stalls = [], []
+        next_hour = start + args.days * 24 * HOUR
+        for _ in range(args.increments):
+            add_hours(store, repository, next_hour, 1, rng)
+            next_hour += HOUR
+            made, elapsed = await timed(pipeline.run_once(), monitor)
+            times.append(elapsed)
+            stalls.append(monitor.worst)
+        print(f'incremental run:  {made} reports in {statistics.median(times):6.2f}s  '
+              f'loop stall max {max(stalls) * 1000:6.1f} ms  (median of {args.increments})')
+        _, elapsed = await timed(pipeline.run_once(), monitor)
+        print(f'unchanged run:    0 reports in {elapsed:6.2f}s')
+
+        # the same first run computed on the event loop, as a page handler would
+        inline = ReportPipeline(repository, store)
+
+        async def on_loop():
+            for campaign in repository.list():
+                compute_report(inline._job(campaign))
+        _, elapsed = await timed(on_loop(), monitor)
+        print(f'inline full run:  {elapsed:6.2f}s  loop stall max {monitor.worst * 1000:6.1f} ms')
+
+        for campaign in repository.list():
+            expected = compute_report(ReportJob(campaign.campaign_id, 0, {}, inline._new_data(campaign)))[1]
+            report = pipeline.latest(campaign.campaign_id)
+            if (report.volume_total, report.daily_reports) != (expected.volume_total, expected.daily_reports) or \
+                    abs(report.variance_7d - expected.variance_7d) > 1e-6 * max(1.0, abs(expected.variance_7d)):
+                raise AssertionError(f'incremental report of {campaign.campaign_id} differs from a full run')
+        print('incremental reports match a from-scratch run')
+        await pipeline.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
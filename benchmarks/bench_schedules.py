@@ -0,0 +1,123 @@
+"""
+Bulk import, week-window queries and conflict checks of ScheduleStore.
+
+Generates --slots slots spread over --resources cameras in --areas areas
+across a year (random, so some overlap) and measures:
+- bulk_import() against inserting the same slots one by one;
+- window() for a random week of one area, what the /schedules page asks;
+- add() with its conflict check, and remove();
+- conflict detection of the tree sweep against a naive pairwise scan.
+
+    python benchmarks/bench_schedules.py --slots 200000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from interval_tree import IntervalTree  # noqa: E402
+from schedules import ScheduleConflict, ScheduleStore, Slot  # noqa: E402
+
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+YEAR = 365 * DAY
+
+
+def make_slots(n: int, resources: int, areas: int, seed: int = 1):
+    rng = random.Random(seed)
+    for i in range(n):
+        resource = rng.randrange(resources)
+        start = rng.randrange(YEAR // HOUR) * HOUR
+        yield Slot(f's{i}', f'cam-{resource}', f'area-{resource % areas}', f'campaign-{resource % 50}',
+                   start, start + rng.choice((1, 2, 4, 8, 24)) * HOUR, 'bench')
+
+
+def ms(values):
+    return f'p50 {statistics.median(values) * 1000:7.3f} ms  max {max(values) * 1000:7.3f} ms'
+
+
+def naive_pairs(slots):
+    return sum(1 for i, a in enumerate(slots) for b in slots[i + 1:] if a.start < b.end and b.start < a.end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--slots', type=int, default=200_000)
+    parser.add_argument('--resources', type=int, default=2_000)
+    parser.add_argument('--areas', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--dense', type=int, default=5_000, help='slots of the camera checked pairwise')
+    args = parser.parse_args()
+
+    slots = list(make_slots(args.slots, args.resources, args.areas))
+    store = ScheduleStore()
+    start = time.perf_counter()
+    conflicts = store.bulk_import(slots)
+    print(f'bulk_import: {len(store)} slots in {time.perf_counter() - start:.2f}s '
+          f'({len(conflicts)} conflicting pairs found)')
+
+    one_by_one = ScheduleStore()
+    start = time.perf_counter()
+    for slot in slots:
+        one_by_one.add(slot, allow_conflicts=True)
+    print(f'add() one by one: {time.perf_counter() - start:.2f}s')
+
+    rng = random.Random(2)
+    times, shown = [], []
+    for _ in range(args.queries):
+        week = rng.randrange(YEAR - WEEK)
+        t0 = time.perf_counter()
+        window = store.window(week, week + WEEK, area=f'area-{rng.randrange(args.areas)}')
+        times.append(time.perf_counter() - t0)
+        shown.append(sum(len(v) for v in window.values()))
+    print(f'window(one week, one area): {ms(times)}  ({statistics.mean(shown):.0f} slots shown)')
+
+    # correctness of one window against a scan
+    week, area = YEAR // 2, 'area-0'
+    expected = sorted(s.slot_id for s in slots if s.area == area and s.start < week + WEEK and s.end > week)
+    found = sorted(s.slot_id for v in store.window(week, week + WEEK, area=area).values() for s in v)
+    if found != expected:
+        raise AssertionError('window mismatch')
+
+    add_times, remove_times, rejected = [], [], 0
+    for i in range(args.queries):
+        start = rng.randrange(YEAR // HOUR) * HOUR
+        slot = Slot(f'new-{i}', f'cam-{rng.randrange(args.resources)}', 'area-0', 'campaign-0', start, start + 2 * HOUR)
+        t0 = time.perf_counter()
+        try:
+            store.add(slot)
+        except ScheduleConflict:
+            rejected += 1
+            add_times.append(time.perf_counter() - t0)
+            continue
+        add_times.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        store.remove(slot.slot_id)
+        remove_times.append(time.perf_counter() - t0)
+    print(f'add() with conflict check: {ms(add_times)}  ({rejected}/{args.queries} rejected)')
+    print(f'remove(): {ms(remove_times)}')
+
+    # one busy camera: the naive check compares every pair
+    dense = sorted(make_slots(args.dense, 1, 1, seed=3), key=lambda s: s.start)
+    t0 = time.perf_counter()
+    expected = naive_pairs(dense)
+    naive = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    tree = IntervalTree((s.start, s.end, s.slot_id, s) for s in dense)
+    swept = sum(1 for _ in tree.overlapping_pairs())
+    sweep = time.perf_counter() - t0
+    if swept != expected:
+        raise AssertionError(f'conflict mismatch: {swept} != {expected}')
+    print(f'all conflicts of one camera with {len(dense)} slots ({swept} pairs): '
+          f'naive pairwise {naive * 1000:.0f} ms, tree build + sweep {sweep * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
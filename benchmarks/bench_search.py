@@ -0,0 +1,120 @@
+"""
+Typeahead latency of SearchIndex on a synthetic corpus (default 100k documents).
+
+Documents are generated from South African road, suburb and landmark names
+plus random street names, so the vocabulary and posting lengths resemble a
+large campaign/camera catalogue. Each query is "typed" one keystroke at a
+time and every prefix is searched, as the debounced /search input would in
+the worst case. Reports build time, per-keystroke latency percentiles and
+incremental update throughput; exits with status 1 when the p95 keystroke
+latency is over --max-p95-ms.
+
+    python benchmarks/bench_search.py --docs 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from search_index import Document, SearchIndex  # noqa: E402
+
+ROADS = ['N1', 'N3', 'N12', 'N14', 'N17', 'M1', 'M2', 'M5', 'R21', 'R24', 'R55', 'R59', 'R101', 'R511']
+PLACES = ['Rivonia', 'Sandton', 'Midrand', 'Randburg', 'Soweto', 'Rosebank', 'Fourways', 'Centurion',
+          'Kempton Park', 'Germiston', 'Boksburg', 'Benoni', 'Roodepoort', 'Krugersdorp', 'Alberton',
+          'Bryanston', 'Woodmead', 'Edenvale', 'Bedfordview', 'Melrose', 'Parktown', 'Braamfontein']
+LANDMARKS = ['Western Bypass', 'Eastern Bypass', 'corridor', 'interchange', 'off-ramp', 'on-ramp', 'highway',
+             'bridge', 'toll plaza', 'taxi rank', 'shopping centre', 'CBD', 'airport', 'station', 'stadium']
+SYLLABLES = ['ka', 'ma', 'to', 'ri', 'lo', 'ne', 'wa', 'be', 'sa', 'mo', 'di', 'ku', 'ze', 'pa', 'ho', 'ti']
+
+QUERIES = ['N1 Western Bypass', 'Rivonia', 'rivnia road', 'M1 corridor Braamfontein', 'R21 airport',
+           'kempton park interchange', 'sandton', 'toll plaza n3', 'fourways', 'soweto taxi rank']
+
+
+def street(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def make_documents(n: int, seed: int = 1):
+    rng = random.Random(seed)
+    kinds = ('campaign', 'camera', 'camera', 'area')
+    for i in range(n):
+        road, place, landmark = rng.choice(ROADS), rng.choice(PLACES), rng.choice(LANDMARKS)
+        title = f'{road} {landmark} {place}'
+        text = f'The {road} {landmark} between {street(rng)} Road and {street(rng)} Street near {place}'
+        yield Document(f'doc-{i}', kinds[i % len(kinds)], title, text, f'/campaign/doc-{i}')
+
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--docs', type=int, default=100_000)
+    parser.add_argument('--k', type=int, default=10, help='results per query')
+    parser.add_argument('--rounds', type=int, default=5, help='times each query is typed')
+    parser.add_argument('--updates', type=int, default=5000, help='documents replaced in the update test')
+    parser.add_argument('--max-p95-ms', type=float, default=10.0, help='keystroke latency budget')
+    args = parser.parse_args()
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for doc in make_documents(args.docs):
+        index.add(doc)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    index.warm()
+    warm = time.perf_counter() - start
+    print(f'built {len(index)} documents in {build:.2f}s, impact lists in {warm:.2f}s '
+          f'({index.vocabulary_size} tokens)')
+
+    latencies = []
+    per_query = {}
+    for _ in range(args.rounds):
+        for query in QUERIES:
+            for end in range(1, len(query) + 1):
+                prefix = query[:end]
+                if prefix.endswith(' '):
+                    continue
+                t0 = time.perf_counter()
+                hits = index.search(prefix, k=args.k)
+                elapsed = time.perf_counter() - t0
+                latencies.append(elapsed)
+                per_query.setdefault(query, []).append(elapsed)
+                if end == len(query):
+                    per_query[query + ' hits'] = len(hits)
+
+    ms = [x * 1000 for x in latencies]
+    print(f'{len(ms)} keystrokes: p50 {percentile(ms, 0.5):.2f} ms  p95 {percentile(ms, 0.95):.2f} ms  '
+          f'p99 {percentile(ms, 0.99):.2f} ms  max {max(ms):.2f} ms')
+    for query in QUERIES:
+        times = [x * 1000 for x in per_query[query]]
+        print(f'  {query!r:<30} mean {statistics.mean(times):6.2f} ms  max {max(times):6.2f} ms  '
+              f'{per_query[query + " hits"]} hits')
+
+    rng = random.Random(2)
+    replacements = list(make_documents(args.updates, seed=3))
+    start = time.perf_counter()
+    for doc in replacements:
+        index.add(doc._replace(doc_id=f'doc-{rng.randrange(args.docs)}'))
+    for i in range(args.updates):
+        index.remove(f'doc-{rng.randrange(args.docs)}')
+    elapsed = time.perf_counter() - start
+    print(f'{args.updates} replacements + {args.updates} removals in {elapsed:.2f}s '
+          f'({2 * args.updates / elapsed:,.0f} updates/s)')
+
+    p95 = percentile(ms, 0.95)
+    if p95 > args.max_p95_ms:
+        print(f'p95 {p95:.2f} ms is over the {args.max_p95_ms:.1f} ms budget')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
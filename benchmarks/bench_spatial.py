@@ -0,0 +1,116 @@
+"""
+Viewport, bbox and nearest-camera queries of SpatialIndex at city scale.
+
+Generates --cameras cameras along random road polylines around
+Johannesburg, builds the index and measures:
+- view(): per-pan latency, markers per viewport and how many markers a pan
+  adds/removes (what the /areas page sends) at each zoom level;
+- bbox() and nearest() latency, checked against a brute-force scan.
+
+    python benchmarks/bench_spatial.py --cameras 50000
+"""
+
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from spatial_index import Camera, SpatialIndex, distance_m  # noqa: E402
+
+CENTER = (-26.15, 28.1)
+WIDTH, HEIGHT = 1280, 800
+
+
+def make_cameras(n: int, roads: int = 200, seed: int = 1):
+    rng = random.Random(seed)
+    per_road = max(1, n // roads)
+    made = 0
+    for r in range(roads):
+        lat, lon = CENTER[0] + rng.uniform(-0.5, 0.5), CENTER[1] + rng.uniform(-0.5, 0.5)
+        heading = rng.uniform(0, 2 * math.pi)
+        for c in range(per_road if r < roads - 1 else n - made):
+            heading += rng.uniform(-0.2, 0.2)
+            lat += 0.002 * math.sin(heading)
+            lon += 0.002 * math.cos(heading)
+            yield Camera(f'cam-{made}', f'road-{r}', f'R{r}', f'Road {r} camera {c}', lat, lon)
+            made += 1
+
+
+def ms(values):
+    return f'p50 {statistics.median(values) * 1000:6.2f} ms  max {max(values) * 1000:6.2f} ms'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cameras', type=int, default=50_000)
+    parser.add_argument('--pans', type=int, default=50, help='viewport moves per zoom level')
+    parser.add_argument('--queries', type=int, default=200, help='bbox and nearest queries')
+    args = parser.parse_args()
+
+    cameras = list(make_cameras(args.cameras))
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = SpatialIndex()
+    for camera in cameras:
+        index.insert(camera)
+    build = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'indexed {len(index)} cameras in {build:.2f}s, {memory / 2 ** 20:.1f} MiB')
+
+    rng = random.Random(2)
+    print(f'\nview() for a {WIDTH}x{HEIGHT} map, {args.pans} pans of a quarter screen per zoom')
+    for zoom in range(6, 18):
+        degrees_per_px = 360 / (256 * 2 ** zoom)
+        lat, lon = CENTER
+        previous = set()
+        times, sizes, diffs = [], [], []
+        for _ in range(args.pans):
+            # random walk of quarter-screen pans, kept over the cameras
+            lat = min(max(lat + rng.uniform(-0.25, 0.25) * HEIGHT * degrees_per_px, CENTER[0] - 0.5), CENTER[0] + 0.5)
+            lon = min(max(lon + rng.uniform(-0.25, 0.25) * WIDTH * degrees_per_px, CENTER[1] - 0.5), CENTER[1] + 0.5)
+            t0 = time.perf_counter()
+            markers = index.view((lat, lon), zoom, WIDTH, HEIGHT)
+            times.append(time.perf_counter() - t0)
+            keys = {m.key for m in markers}
+            sizes.append(len(keys))
+            diffs.append(len(keys - previous) + len(previous - keys))
+            previous = keys
+        print(f'  zoom {zoom:>2}: {ms(times)}  markers mean {statistics.mean(sizes):6.1f} max {max(sizes):4}  '
+              f'changed per pan {statistics.mean(diffs):6.1f}')
+
+    times, checked = [], 0
+    for _ in range(args.queries):
+        lat, lon = CENTER[0] + rng.uniform(-0.5, 0.5), CENTER[1] + rng.uniform(-0.5, 0.5)
+        size = rng.uniform(0.01, 0.1)
+        t0 = time.perf_counter()
+        found = index.bbox(lat - size, lon - size, lat + size, lon + size)
+        times.append(time.perf_counter() - t0)
+        expected = {c.camera_id for c in cameras if lat - size <= c.lat <= lat + size and lon - size <= c.lon <= lon + size}
+        if {c.camera_id for c in found} != expected:
+            raise AssertionError(f'bbox mismatch at {lat}, {lon}')
+        checked += len(expected)
+    print(f'\nbbox(): {ms(times)}  ({checked / args.queries:.0f} cameras per box, all matched a full scan)')
+
+    times = []
+    for i in range(args.queries):
+        lat, lon = CENTER[0] + rng.uniform(-0.5, 0.5), CENTER[1] + rng.uniform(-0.5, 0.5)
+        t0 = time.perf_counter()
+        found = index.nearest(lat, lon, k=5)
+        times.append(time.perf_counter() - t0)
+        if i < 20:
+            best = sorted(distance_m(lat, lon, c.lat, c.lon) for c in cameras)[:5]
+            if any(abs(a - b[0]) > 1.0 for a, b in zip(best, found)):
+                raise AssertionError(f'nearest mismatch at {lat}, {lon}')
+    print(f'nearest(k=5): {ms(times)}  (first 20 matched a full scan)')
+
+
+if __name__ == '__main__':
+    main()
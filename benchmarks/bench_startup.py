@@ -0,0 +1,136 @@
+"""
+Cold-start time of main.py: eager imports vs LAZY_PAGES (with and without PREWARM).
+
+For each mode the app is started with `python -X importtime`, and the script
+measures the time until the port answers GET / (login page) and the time of
+the first GET /dashboard. It then prints the slowest top-level imports and
+the import time of every project module (cumulative, as reported by
+-X importtime).
+
+    python benchmarks/bench_startup.py --runs 3 --top 15
+"""
+
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get(url: str, timeout: float = 30.0):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        resp.read()
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    module -> (self seconds, cumulative seconds, nesting depth)
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2)
+    return modules
+
+
+def project_modules() -> set:
+    names = {f[:-3] for f in os.listdir(ROOT) if f.endswith('.py')}
+    for package in ('pages', 'components'):
+        names |= {f'{package}.{f[:-3]}' for f in os.listdir(os.path.join(ROOT, package)) if f.endswith('.py')}
+    return names
+
+
+MODES = (
+    # label, LAZY_PAGES, PREWARM
+    ('eager', 'false', 'false'),
+    ('lazy', 'true', 'false'),
+    ('lazy+prewarm', 'true', 'true'),
+)
+
+
+def run_once(lazy: str, prewarm: str, timeout: float) -> dict:
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, PORT=str(port), LAZY_PAGES=lazy, PREWARM=prewarm)
+    workdir = tempfile.mkdtemp(prefix='novolab-startup-')
+    stderr_path = os.path.join(workdir, 'stderr.txt')
+    with open(stderr_path, 'w') as stderr:
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, '-X', 'importtime', os.path.join(ROOT, 'main.py')],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=stderr,
+        )
+        try:
+            ready = None
+            while time.perf_counter() - start < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f'app exited with status {server.returncode}')
+                try:
+                    get(base + '/', timeout=1.0)
+                    ready = time.perf_counter() - start
+                    break
+                except OSError:
+                    time.sleep(0.02)
+            if ready is None:
+                raise RuntimeError('app did not start in time')
+            first = time.perf_counter()
+            get(base + '/dashboard')
+            dashboard = time.perf_counter() - first
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+    with open(stderr_path) as f:
+        modules = parse_importtime(f.read())
+    return {'ready': ready, 'dashboard': dashboard, 'modules': modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    results = {}
+    for label, lazy, prewarm in MODES:
+        runs = [run_once(lazy, prewarm, args.timeout) for _ in range(args.runs)]
+        results[label] = runs
+        ready = statistics.median(r['ready'] for r in runs)
+        dashboard = statistics.median(r['dashboard'] for r in runs)
+        print(f'{label:<13} port answering GET / after {ready * 1000:7.0f} ms   first GET /dashboard {dashboard * 1000:6.0f} ms')
+
+    # with prewarm the background imports also show up in -X importtime, so list eager vs lazy only
+    ours = project_modules()
+    for label in ('eager', 'lazy'):
+        modules = results[label][-1]['modules']
+        top_level = [(name, m) for name, m in modules.items() if m[2] == 0]
+        print(f'\n{label}: slowest top-level imports (cumulative ms, self ms)')
+        for name, (self_s, cumulative_s, _) in sorted(top_level, key=lambda item: -item[1][1])[:args.top]:
+            print(f'  {cumulative_s * 1000:8.1f} {self_s * 1000:8.1f}  {name}')
+        project = sorted(((name, m) for name, m in modules.items() if name in ours), key=lambda item: -item[1][1])
+        print(f'{label}: project modules (cumulative ms, self ms)')
+        for name, (self_s, cumulative_s, _) in project:
+            print(f'  {cumulative_s * 1000:8.1f} {self_s * 1000:8.1f}  {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Local stand-ins for the email providers, used by the load test.
+
+- FakeSMTPServer: plain-text SMTP (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA,
+  NOOP, RSET, QUIT) on 127.0.0.1; run the app with SMTP_USE_SSL=false.
+  drop_connections() hangs up on every client, as a server timing out idle
+  connections would.
+- FakeSendGrid: HTTP stub for POST /v3/mail/send; point SENDGRID_API_URL at it.
+
+Both add `latency` seconds per message, fail a share `error_rate` of them
+(SMTP 451 / HTTP 503) and record delivered OTPs in a shared Inbox, so a
+simulated user can "read" the code it was sent.
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+OTP_PATTERN = re.compile(r'Your OTP is (\d+)')
+
+
+class Inbox:
+    def __init__(self):
+        self._messages: Dict[str, str] = {}
+        self._cond = threading.Condition()
+        self.delivered = 0
+        self.failed = 0
+
+    def deliver(self, email: str, body: str):
+        match = OTP_PATTERN.search(body)
+        if not match:
+            return
+        with self._cond:
+            self._messages[email.lower()] = match.group(1)
+            self.delivered += 1
+            self._cond.notify_all()
+
+    def wait_for(self, email: str, timeout: float = 30.0) -> Optional[str]:
+        """
+        Pop the OTP delivered to email, waiting up to timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        email = email.lower()
+        with self._cond:
+            while email not in self._messages:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._messages.pop(email)
+
+
+# ---------------- SMTP ---------------- #
+class FakeSMTPServer:
+    def __init__(self, inbox: Inbox, latency: float = 0.0, error_rate: float = 0.0, port: int = 0):
+        self.inbox = inbox
+        self.latency = latency
+        self.error_rate = error_rate
+        self.port = port
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._writers = set()
+        self.connections = 0
+
+    def start(self) -> 'FakeSMTPServer':
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._session, '127.0.0.1', self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='fake-smtp', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            sessions = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in sessions:
+                task.cancel()
+            await asyncio.gather(*sessions, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def drop_connections(self):
+        async def drop():
+            for writer in list(self._writers):
+                writer.close()
+
+        asyncio.run_coroutine_threadsafe(drop(), self._loop).result(timeout=5)
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        def reply(line: str):
+            writer.write((line + '\r\n').encode())
+
+        self._writers.add(writer)
+        self.connections += 1
+        reply('220 fake-smtp ready')
+        recipients = []
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                command = raw.decode(errors='replace').strip()
+                verb = command.split(' ', 1)[0].upper()
+                if verb in ('EHLO', 'HELO'):
+                    reply('250-fake-smtp')
+                    reply('250 AUTH PLAIN LOGIN')
+                elif verb == 'AUTH':
+                    if command.upper().startswith('AUTH LOGIN'):
+                        reply('334 VXNlcm5hbWU6')
+                        await reader.readline()
+                        reply('334 UGFzc3dvcmQ6')
+                        await reader.readline()
+                    reply('235 authenticated')
+                elif verb == 'MAIL':
+                    recipients = []
+                    reply('250 ok')
+                elif verb == 'RCPT':
+                    recipients.append(command.split(':', 1)[1].strip().strip('<>'))
+                    reply('250 ok')
+                elif verb == 'DATA':
+                    reply('354 end with <CRLF>.<CRLF>')
+                    await writer.drain()
+                    lines = []
+                    while True:
+                        line = await reader.readline()
+                        if not line or line in (b'.\r\n', b'.\n'):
+                            break
+                        lines.append(line.decode(errors='replace'))
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    if random.random() < self.error_rate:
+                        self.inbox.failed += 1
+                        reply('451 temporary failure')
+                    else:
+                        body = ''.join(lines)
+                        for recipient in recipients:
+                            self.inbox.deliver(recipient, body)
+                        reply('250 queued')
+                elif verb in ('NOOP', 'RSET'):
+                    reply('250 ok')
+                elif verb == 'QUIT':
+                    reply('221 bye')
+                    await writer.drain()
+                    break
+                else:
+                    reply('502 not implemented')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+# ---------------- SendGrid ---------------- #
+class FakeSendGrid:
+    def __init__(self, inbox: Inbox, latency: float = 0.0, error_rate: float = 0.0, port: int = 0):
+        self.inbox = inbox
+        self.latency = latency
+        self.error_rate = error_rate
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.port}/v3/mail/send'
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = self.rfile.read(length)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if random.random() < stub.error_rate:
+                    stub.inbox.failed += 1
+                    self._send(503, b'{"errors":[{"message":"injected failure"}]}')
+                    return
+                try:
+                    data = json.loads(payload)
+                    body = ' '.join(c.get('value', '') for c in data.get('content', []))
+                    for personalization in data.get('personalizations', []):
+                        for to in personalization.get('to', []):
+                            stub.inbox.deliver(to['email'], body)
+                except (ValueError, KeyError, TypeError):
+                    self._send(400, b'{"errors":[{"message":"bad request"}]}')
+                    return
+                self._send(202, b'')
+
+            def _send(self, status: int, body: bytes):
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'FakeSendGrid':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-sendgrid', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,261 @@
+"""
+Load test for the login and dashboard flows.
+
+Starts the app (main.py), a fake SMTP server and a fake SendGrid stub (see
+fake_services.py), then runs --users concurrent simulated users, each going
+through the flow --iterations times:
+
+    GET /  ->  send_otp  ->  OTP arrives  ->  verify_otp  ->  GET /dashboard  ->  GET /campaign/{id}
+
+Page steps are real HTTP requests against the app (each builds the page for
+a new client, as a browser visit does). The Send OTP and Login button
+handlers run over NiceGUI's websocket, so those steps call send_otp /
+verify_otp in this process instead, with the same outbox, delivery workers
+and pooled transports talking to the stand-ins; "otp_delivered" is the time
+until the OTP email reached the fake provider.
+
+Results (throughput and p50/p95/p99 per step) are written as JSON so runs
+can be compared:
+
+    python benchmarks/load_test.py --users 20 --iterations 5 --provider both --error-rate 0.05
+    python benchmarks/load_test.py --users 20 --iterations 5 --compare benchmarks/results/load-<previous>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_services import FakeSendGrid, FakeSMTPServer, Inbox  # noqa: E402
+
+STEPS = ('login_page', 'send_otp', 'otp_delivered', 'login', 'dashboard', 'campaign')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def http_get(url: str, timeout: float = 30.0) -> int:
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        resp.read()
+        return resp.status
+
+
+def wait_ready(url: str, server: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f'app exited with status {server.returncode}')
+        try:
+            http_get(url, timeout=2.0)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('app did not start in time')
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+        self._lock = threading.Lock()
+
+    def record(self, step: str, seconds: float, ok: bool = True):
+        with self._lock:
+            if ok:
+                self.timings[step].append(seconds)
+            else:
+                self.errors[step] += 1
+
+    def step(self, step: str, fn, *args):
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception:
+            self.record(step, 0.0, ok=False)
+            return None
+        self.record(step, time.perf_counter() - start, ok=bool(result))
+        return result
+
+    def summary(self, elapsed: float) -> dict:
+        steps = {}
+        for step in STEPS:
+            values = self.timings[step]
+            steps[step] = {
+                'count': len(values),
+                'errors': self.errors[step],
+                'throughput_per_s': len(values) / elapsed if elapsed else 0.0,
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+            }
+        return steps
+
+
+def print_summary(steps: dict, baseline: dict = None):
+    header = f'{"step":<14} {"ok":>6} {"err":>5} {"req/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}'
+    if baseline:
+        header += f' {"p95 vs base":>12}'
+    print(header)
+    for step, s in steps.items():
+        line = (f'{step:<14} {s["count"]:>6} {s["errors"]:>5} {s["throughput_per_s"]:>8.1f} '
+                f'{s["p50_ms"]:>9.1f} {s["p95_ms"]:>9.1f} {s["p99_ms"]:>9.1f}')
+        base = (baseline or {}).get(step)
+        if base and base['p95_ms']:
+            line += f' {(s["p95_ms"] / base["p95_ms"] - 1) * 100:>+11.1f}%'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10, help='concurrent simulated users')
+    parser.add_argument('--iterations', type=int, default=5, help='flows per user')
+    parser.add_argument('--provider', choices=('smtp', 'sendgrid', 'both'), default='both')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added per email by the stand-ins')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of emails the stand-ins reject')
+    parser.add_argument('--otp-timeout', type=float, default=60.0, help='seconds to wait for an OTP email')
+    parser.add_argument('--url', help='use an already running app instead of starting main.py')
+    parser.add_argument('--out', help='results file (default benchmarks/results/load-<timestamp>.json)')
+    parser.add_argument('--compare', help='previous results file to compare p95 latencies against')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    inbox = Inbox()
+    smtp = FakeSMTPServer(inbox, latency=args.latency, error_rate=args.error_rate).start()
+    sendgrid = FakeSendGrid(inbox, latency=args.latency, error_rate=args.error_rate).start()
+
+    workdir = tempfile.mkdtemp(prefix='novolab-load-')
+    env = {
+        'SENDER_EMAIL': 'load-test@novolab.local',
+        'SMTP_SERVER': '127.0.0.1',
+        'SMTP_PORT': str(smtp.port),
+        'SMTP_USE_SSL': 'false',
+        'SENDGRID_API_URL': sendgrid.url,
+        'OUTBOX_PATH': os.path.join(workdir, 'outbox.sqlite3'),
+        'OTP_MAX_ENTRIES': str(max(10000, 2 * args.users * args.iterations)),
+    }
+    if args.provider in ('smtp', 'both'):
+        env['SENDER_PASSWORD'] = 'load-test'
+    if args.provider in ('sendgrid', 'both'):
+        env['SENDGRID_API_KEY'] = 'load-test'
+    os.environ.update(env)
+
+    # imported after the env is set: the outbox and email config read it
+    from authentication_controller import delivery_workers, send_otp, verify_otp  # noqa: E402
+    from campaign_repository import campaigns  # noqa: E402
+    from email_transport import close_all  # noqa: E402
+
+    campaign_ids = [c.campaign_id for c in campaigns.list(status='open')] or ['unknown']
+
+    server = None
+    base = args.url
+    if base is None:
+        port = free_port()
+        base = f'http://127.0.0.1:{port}'
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'main.py')],
+            cwd=workdir, env=dict(os.environ, PORT=str(port)),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='delivery', daemon=True).start()
+
+    async def start_workers():
+        delivery_workers.start()
+
+    recorder = Recorder()
+
+    def flow(user: int, iteration: int):
+        email = f'user{user}-{iteration}@load.test'
+        if not recorder.step('login_page', http_get, base + '/'):
+            return
+        sent_at = time.perf_counter()
+        if not recorder.step('send_otp', send_otp, email):
+            return
+        otp = inbox.wait_for(email, timeout=args.otp_timeout)
+        recorder.record('otp_delivered', time.perf_counter() - sent_at, ok=otp is not None)
+        if otp is None:
+            return
+        if not recorder.step('login', verify_otp, email, otp):
+            return
+        recorder.step('dashboard', http_get, base + '/dashboard')
+        recorder.step('campaign', http_get, f'{base}/campaign/{random.choice(campaign_ids)}')
+
+    def user_loop(user: int):
+        for iteration in range(args.iterations):
+            flow(user, iteration)
+
+    try:
+        wait_ready(base + '/', server, timeout=60.0)
+        asyncio.run_coroutine_threadsafe(start_workers(), loop).result()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            list(pool.map(user_loop, range(args.users)))
+        elapsed = time.perf_counter() - start
+        asyncio.run_coroutine_threadsafe(delivery_workers.stop(), loop).result()
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        close_all()
+        smtp.stop()
+        sendgrid.stop()
+        loop.call_soon_threadsafe(loop.stop)
+
+    steps = recorder.summary(elapsed)
+    result = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+        'elapsed_s': elapsed,
+        'flows_per_s': len(recorder.timings['campaign']) / elapsed if elapsed else 0.0,
+        'emails': {'delivered': inbox.delivered, 'rejected_by_stand_in': inbox.failed},
+        'steps': steps,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['steps']
+    print(f'{args.users} users x {args.iterations} flows in {elapsed:.2f}s '
+          f'({result["flows_per_s"]:.1f} complete flows/s, {args.provider}, '
+          f'latency {args.latency * 1000:.0f} ms, error rate {args.error_rate:.0%})')
+    print_summary(steps, baseline)
+
+    out = args.out or os.path.join(ROOT, 'benchmarks', 'results', f'load-{time.strftime("%Y%m%d-%H%M%S")}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f'results written to {out}')
+
+
+if __name__ == '__main__':
+    main()
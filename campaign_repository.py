@@ -0,0 +1,177 @@
+"""
+Campaign data layer.
+
+Campaigns are loaded from CAMPAIGNS_PATH (a .csv file, or a SQLite database
+with a `campaigns` table using the same columns) into an immutable in-memory
+snapshot with indexes by id, status and area. Page handlers read the
+snapshot directly; the file is re-read only when its mtime/size change,
+checked at most once every check_interval seconds.
+"""
+
+import csv
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+OPEN = 'open'
+CLOSED = 'closed'
+
+COLUMNS = ('campaign_id', 'description', 'area', 'status', 'cameras', 'reports', 'image_src', 'video_src')
+
+
+class Campaign:
+    __slots__ = COLUMNS
+
+    def __init__(self,
+                 campaign_id: str,
+                 description: str,
+                 area: str = '',
+                 status: str = OPEN,
+                 cameras: int = 0,
+                 reports: int = 0,
+                 image_src: str = '',
+                 video_src: Optional[str] = None):
+        self.campaign_id = campaign_id
+        self.description = description
+        self.area = area
+        self.status = status
+        self.cameras = cameras
+        self.reports = reports
+        self.image_src = image_src
+        self.video_src = video_src
+
+    @property
+    def is_open(self) -> bool:
+        return self.status == OPEN
+
+    @property
+    def camera_ids(self) -> Tuple[str, ...]:
+        # cameras are numbered 1..cameras within a campaign
+        return tuple(f'{self.campaign_id}-cam{n}' for n in range(1, self.cameras + 1))
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'Campaign':
+        return cls(
+            campaign_id=row['campaign_id'].strip(),
+            description=row.get('description') or '',
+            area=row.get('area') or '',
+            status=(row.get('status') or OPEN).strip().lower(),
+            cameras=int(row.get('cameras') or 0),
+            reports=int(row.get('reports') or 0),
+            image_src=row.get('image_src') or '',
+            video_src=row.get('video_src') or None,
+        )
+
+    def __repr__(self) -> str:
+        return f'Campaign({self.campaign_id!r}, status={self.status!r})'
+
+
+class CampaignSnapshot:
+    """
+    Immutable view of every campaign plus its secondary indexes.
+    """
+
+    def __init__(self, campaigns: Tuple[Campaign, ...]):
+        self.campaigns = campaigns
+        self.by_id: Dict[str, Campaign] = {}
+        by_status: Dict[str, list] = {}
+        by_area: Dict[str, list] = {}
+        for campaign in campaigns:
+            self.by_id[campaign.campaign_id] = campaign
+            by_status.setdefault(campaign.status, []).append(campaign)
+            by_area.setdefault(campaign.area, []).append(campaign)
+        self.by_status: Dict[str, Tuple[Campaign, ...]] = {k: tuple(v) for k, v in by_status.items()}
+        self.by_area: Dict[str, Tuple[Campaign, ...]] = {k: tuple(v) for k, v in by_area.items()}
+        self.camera_ids: FrozenSet[str] = frozenset(c for campaign in campaigns for c in campaign.camera_ids)
+
+    def __len__(self) -> int:
+        return len(self.campaigns)
+
+
+def load_campaigns(path: str) -> Tuple[Campaign, ...]:
+    if path.endswith(('.sqlite3', '.sqlite', '.db')):
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(f'SELECT {", ".join(COLUMNS)} FROM campaigns ORDER BY rowid').fetchall()
+        finally:
+            conn.close()
+        return tuple(Campaign.from_row(dict(row)) for row in rows)
+    with open(path, newline='', encoding='utf-8') as f:
+        return tuple(Campaign.from_row(row) for row in csv.DictReader(f))
+
+
+class CampaignRepository:
+    def __init__(self, path: str, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = CampaignSnapshot(())
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def snapshot(self) -> CampaignSnapshot:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._refresh(now)
+        return self._snapshot
+
+    def _refresh(self, now: float):
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            signature = self._file_signature()
+            if signature is None or signature == self._signature:
+                return
+            try:
+                campaigns = load_campaigns(self.path)
+            except Exception as e:
+                # keep serving the previous snapshot
+                print(f'Failed to load campaigns from {self.path}: {e}')
+                return
+            self._snapshot = CampaignSnapshot(campaigns)
+            self._signature = signature
+
+    def reload(self) -> CampaignSnapshot:
+        self._checked_at = 0.0
+        self._signature = None
+        return self.snapshot()
+
+    def get(self, campaign_id: str) -> Optional[Campaign]:
+        return self.snapshot().by_id.get(campaign_id)
+
+    def list(self, status: Optional[str] = None, area: Optional[str] = None) -> Tuple[Campaign, ...]:
+        snap = self.snapshot()
+        if status is None and area is None:
+            return snap.campaigns
+        if area is None:
+            return snap.by_status.get(status, ())
+        in_area = snap.by_area.get(area, ())
+        if status is None:
+            return in_area
+        return tuple(c for c in in_area if c.status == status)
+
+    def page(self, offset: int, limit: int, status: Optional[str] = None) -> Tuple[Campaign, ...]:
+        return self.list(status=status)[offset:offset + limit]
+
+    def count(self, status: Optional[str] = None) -> int:
+        return len(self.list(status=status))
+
+
+_DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'campaigns.csv')
+
+# shared by every page handler
+campaigns = CampaignRepository(
+    os.getenv('CAMPAIGNS_PATH', _DEFAULT_PATH),
+    check_interval=float(os.getenv('CAMPAIGNS_RELOAD_SECONDS', 5)),
+)
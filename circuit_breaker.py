@@ -0,0 +1,119 @@
+"""
+Circuit breaker for outbound providers.
+
+closed    -> calls go through; outcomes of the last `window` calls are tracked
+open      -> failure rate (or slow-call rate) over the window crossed its threshold;
+             calls are rejected until open_seconds have passed
+half_open -> a limited number of trial calls are let through; one success closes
+             the breaker again, one failure re-opens it
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self,
+                 name: str,
+                 window: int = 20,
+                 min_calls: int = 5,
+                 failure_rate: float = 0.5,
+                 open_seconds: float = 30.0,
+                 slow_call_seconds: Optional[float] = None,
+                 slow_call_rate: float = 0.5,
+                 half_open_calls: int = 1):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.half_open_calls = half_open_calls
+
+        self._calls = deque(maxlen=window)  # (ok, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now: float):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._trials = 0
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self._times_opened += 1
+
+    def allow(self) -> bool:
+        """
+        True if a call may be attempted now. Every allowed call must be
+        followed by record_success or record_failure.
+        """
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._trials < self.half_open_calls:
+                self._trials += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self, latency: float = 0.0):
+        self._record(True, latency)
+
+    def record_failure(self, latency: float = 0.0):
+        self._record(False, latency)
+
+    def _record(self, ok: bool, latency: float):
+        slow = self.slow_call_seconds is not None and latency >= self.slow_call_seconds
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if ok and not slow:
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+            if self._state == OPEN:
+                return
+            self._calls.append((ok, slow))
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for call_ok, _ in self._calls if not call_ok)
+            slow_calls = sum(1 for _, call_slow in self._calls if call_slow)
+            if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+                self._open(now)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            total = len(self._calls)
+            return {
+                'name': self.name,
+                'state': self._state,
+                'window_calls': total,
+                'window_failures': sum(1 for ok, _ in self._calls if not ok),
+                'window_slow': sum(1 for _, slow in self._calls if slow),
+                'rejected': self._rejected,
+                'times_opened': self._times_opened,
+            }
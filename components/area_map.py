@@ -0,0 +1,105 @@
+from typing import Callable, Dict, Optional, Tuple
+from nicegui import ui
+from spatial_index import Camera, Marker, SpatialIndex
+
+_CAMERA_STYLE = {'radius': 7, 'color': '#1d4ed8', 'weight': 2, 'fillColor': '#3b82f6', 'fillOpacity': 0.9}
+_CLUSTER_STYLE = {'color': '#111827', 'weight': 1, 'fillColor': '#111827', 'fillOpacity': 0.75}
+_COUNT_TOOLTIP = {'permanent': True, 'direction': 'center', 'className': 'cluster-count'}
+_CLUSTER_CSS = '''
+<style>
+.leaflet-tooltip.cluster-count { background: transparent; border: 0; box-shadow: none; color: white; font-weight: 600; }
+.leaflet-tooltip.cluster-count::before { display: none; }
+</style>
+'''
+
+
+# ---------------- AreaMap (viewport-diffed markers) ---------------- #
+class AreaMap:
+    """
+    Leaflet map of the cameras in a SpatialIndex.
+
+    After every pan or zoom the server asks the index for the markers of
+    the new viewport (clusters at low zoom, cameras up close) and only adds
+    the markers that weren't on the map yet and removes the ones that left,
+    so panning sends a few dozen layers instead of the whole set.
+
+    on_select(distance_m, camera) is called with the camera nearest to a
+    click on the map.
+    """
+
+    def __init__(self,
+                 index: SpatialIndex,
+                 center: Tuple[float, float] = (-26.13, 28.1),
+                 zoom: int = 10,
+                 on_select: Optional[Callable[[float, Camera], None]] = None):
+        self.index = index
+        self.center = center
+        self.zoom = zoom
+        self.on_select = on_select
+        self.size = (1024.0, 640.0)  # replaced by the real size once the map reports it
+        self.markers: Dict[str, object] = {}  # marker key -> leaflet layer
+        self.map = None
+        self.status = None
+
+    def build(self):
+        ui.add_head_html(_CLUSTER_CSS)
+        self.map = ui.leaflet(center=self.center, zoom=self.zoom).classes('w-full h-[70vh] rounded-lg')
+        self.status = ui.label('').classes('text-xs text-gray-500')
+        self.map.on('init', self._on_init)
+        self.map.on('map-moveend', self._on_move)
+        self.map.on('map-resize', self._on_resize)
+        self.map.on('map-click', self._on_click)
+
+    # ---------------- events ---------------- #
+    async def _on_init(self, _e=None):
+        size = await self.map.run_map_method('getSize')
+        if size:
+            self.size = (size['x'], size['y'])
+        self.refresh()
+
+    def _on_move(self, e):
+        self.center = tuple(e.args['center'])
+        self.zoom = e.args['zoom']
+        self.refresh()
+
+    def _on_resize(self, e):
+        new_size = e.args.get('newSize') or {}
+        if new_size:
+            self.size = (new_size['x'], new_size['y'])
+            self.refresh()
+
+    def _on_click(self, e):
+        if self.on_select is None:
+            return
+        latlng = e.args.get('latlng') or {}
+        if not latlng:
+            return
+        nearest = self.index.nearest(latlng['lat'], latlng['lng'], k=1)
+        if nearest:
+            self.on_select(*nearest[0])
+
+    # ---------------- markers ---------------- #
+    def refresh(self):
+        markers = {m.key: m for m in self.index.view(self.center, self.zoom, *self.size)}
+        stale = [key for key in self.markers if key not in markers]
+        for key in stale:
+            self.map.remove_layer(self.markers.pop(key))
+        added = 0
+        for key, marker in markers.items():
+            if key not in self.markers:
+                self.markers[key] = self._add(marker)
+                added += 1
+        cameras = sum(m.count for m in markers.values())
+        self.status.set_text(f'{cameras} cameras in view as {len(markers)} markers '
+                             f'(+{added} / -{len(stale)} on the last move)')
+
+    def _add(self, marker: Marker):
+        if marker.camera is not None:
+            layer = self.map.generic_layer(name='circleMarker', args=[[marker.lat, marker.lon], _CAMERA_STYLE])
+            layer.run_method('bindTooltip', marker.camera.label)
+            return layer
+        radius = min(12 + 4 * len(str(marker.count)), 28)
+        layer = self.map.generic_layer(name='circleMarker', args=[[marker.lat, marker.lon],
+                                                                  {**_CLUSTER_STYLE, 'radius': radius}])
+        layer.run_method('bindTooltip', str(marker.count), _COUNT_TOOLTIP)
+        return layer
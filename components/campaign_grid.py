@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from typing import Callable, List, Sequence
+import math
+from nicegui import ui
+
+
+# ---------------- CampaignGrid (virtualized) ---------------- #
+class CampaignGrid:
+    """
+    Scrollable grid that only materializes the rows in (or near) the viewport.
+
+    A fixed pool of (visible_rows + 2 * overscan) rows of cards is built once;
+    scrolling rebinds those cards to other campaigns and resizes two spacer
+    divs so the scrollbar still reflects the full list. Campaigns are fetched
+    page by page through fetch(offset, limit) as the window reaches them, and
+    only the last max_cached_pages pages are kept.
+
+    card_factory() must return an unbuilt card with build() and bind(campaign)
+    methods; bind(None) hides the card.
+    """
+
+    def __init__(self,
+                 count: Callable[[], int],
+                 fetch: Callable[[int, int], Sequence],
+                 card_factory: Callable[[], object],
+                 columns: int = 3,
+                 row_height: int = 340,
+                 gap: int = 16,
+                 visible_rows: int = 3,
+                 overscan: int = 1,
+                 page_size: int = 60,
+                 max_cached_pages: int = 8):
+        self.count = count
+        self.fetch = fetch
+        self.card_factory = card_factory
+        self.columns = columns
+        self.row_height = row_height
+        self.gap = gap
+        self.visible_rows = visible_rows
+        self.overscan = overscan
+        self.page_size = page_size
+        self.max_cached_pages = max_cached_pages
+
+        self.total = 0
+        self.first_row = -1
+        self.cards: List[object] = []
+        self._rows = []
+        self.scroll = None
+        self._top_spacer = None
+        self._bottom_spacer = None
+        self._pages = OrderedDict()  # page index -> campaigns, least recently used first
+
+    @property
+    def pool_rows(self) -> int:
+        return self.visible_rows + 2 * self.overscan
+
+    def build(self):
+        self.total = self.count()
+        self.scroll = ui.scroll_area().classes('w-full').style(
+            f'height: {self.visible_rows * self.row_height}px;'
+        )
+        self.scroll.on('scroll', self._on_scroll, args=['verticalPosition'], throttle=0.05)
+
+        with self.scroll:
+            self._top_spacer = ui.element('div').style('height: 0px;')
+            for _ in range(self.pool_rows):
+                row = ui.row().classes('w-full items-start').style(
+                    f'flex-wrap: nowrap; gap: {self.gap}px; height: {self.row_height - self.gap}px; margin-bottom: {self.gap}px;'
+                )
+                self._rows.append(row)
+                with row:
+                    for _ in range(self.columns):
+                        card = self.card_factory()
+                        card.build()
+                        card.root.style(f'height: {self.row_height - self.gap}px;')
+                        self.cards.append(card)
+            self._bottom_spacer = ui.element('div').style('height: 0px;')
+
+        self._show_from(0)
+        return self.scroll
+
+    def _page(self, index: int) -> Sequence:
+        page = self._pages.get(index)
+        if page is None:
+            page = self.fetch(index * self.page_size, self.page_size)
+            self._pages[index] = page
+            if len(self._pages) > self.max_cached_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(index)
+        return page
+
+    def _items(self, offset: int, limit: int) -> list:
+        items = []
+        end = min(offset + limit, self.total)
+        position = offset
+        while position < end:
+            index, start = divmod(position, self.page_size)
+            page = self._page(index)
+            if start >= len(page):
+                break
+            chunk = page[start:start + (end - position)]
+            items.extend(chunk)
+            position += len(chunk)
+        return items
+
+    def _on_scroll(self, e):
+        position = e.args.get('verticalPosition') or 0
+        self._show_from(max(0, int(position // self.row_height) - self.overscan))
+
+    def _show_from(self, first_row: int):
+        total_rows = math.ceil(self.total / self.columns)
+        first_row = max(0, min(first_row, total_rows - self.pool_rows))
+        if first_row == self.first_row:
+            return
+        self.first_row = first_row
+
+        items = self._items(first_row * self.columns, len(self.cards))
+        for i, card in enumerate(self.cards):
+            card.bind(items[i] if i < len(items) else None)
+
+        shown_rows = min(self.pool_rows, total_rows)
+        for i, row in enumerate(self._rows):
+            row.set_visibility(i < shown_rows)
+        self._top_spacer.style(f'height: {first_row * self.row_height}px;')
+        self._bottom_spacer.style(
+            f'height: {max(0, total_rows - first_row - shown_rows) * self.row_height}px;'
+        )
+
+    def refresh(self):
+        """
+        Re-read the campaign count and current window (e.g. after the data changed).
+        """
+        self.total = self.count()
+        self._pages.clear()
+        first_row, self.first_row = self.first_row, -1
+        self._show_from(max(0, first_row))
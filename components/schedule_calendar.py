@@ -0,0 +1,240 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from nicegui import ui
+from schedules import ScheduleConflict, ScheduleStore, Slot, from_seconds, to_seconds
+
+DAY = 86400
+WEEK = 7 * DAY
+ALL_AREAS = 'All areas'
+
+_LANE = 'relative flex-grow h-10 rounded-md bg-gray-50 overflow-hidden'
+_BAR = 'absolute top-1 bottom-1 rounded px-1 text-[10px] leading-8 text-white truncate cursor-pointer'
+_BAR_OK = _BAR + ' bg-blue-600 hover:bg-blue-700'
+_BAR_CONFLICT = _BAR + ' bg-red-600 hover:bg-red-700 ring-2 ring-red-300'
+# faint day separators behind the bars
+_DAY_LINES = 'background-image: repeating-linear-gradient(to right, #e5e7eb 0 1px, transparent 1px calc(100% / 7))'
+
+
+def week_of(day: datetime) -> datetime:
+    day = day.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday())
+
+
+# ---------------- Shared handlers ---------------- #
+def _slot_clicked(e):
+    bar = e.sender
+    bar.calendar.show_slot(bar.slot)
+
+
+# ---------------- ScheduleCalendar (week view) ---------------- #
+class ScheduleCalendar:
+    """
+    Week view of a ScheduleStore: one lane per resource, one bar per slot.
+
+    Each refresh asks the store only for the visible week (and area), so
+    the cost follows what is on screen rather than the whole schedule.
+    Adding or deleting a slot only redraws that resource's lane.
+    Slots that overlap another slot of the same resource are drawn red.
+    The slot details and new-slot dialogs are built once and rebound.
+    """
+
+    def __init__(self, store: ScheduleStore, week: Optional[datetime] = None):
+        self.store = store
+        self.week = week_of(week or datetime.now())
+        self.area: Optional[str] = None
+        self.title = None
+        self.status = None
+        self.days = []
+        self.lanes = None
+        self.empty = None
+        self._lanes = {}  # resource -> its lane row
+        self._counts = {}  # resource -> (slots, slots in conflict) this week
+        self._elapsed = 0.0
+        self.details = None
+        self.editor = None
+
+    def build(self):
+        with ui.row().classes('w-full items-center gap-2'):
+            ui.button(icon='chevron_left', on_click=lambda: self.move(-1)).props('flat round dense')
+            ui.button('Today', on_click=self.today).props('flat dense no-caps')
+            ui.button(icon='chevron_right', on_click=lambda: self.move(1)).props('flat round dense')
+            self.title = ui.label('').classes('text-lg font-semibold ml-2')
+            ui.space()
+            ui.select([ALL_AREAS] + self.store.areas(), value=ALL_AREAS,
+                      on_change=self._area_changed).props('dense outlined').classes('w-56')
+            ui.button('New slot', icon='add', on_click=self.new_slot).props('unelevated dense no-caps')
+        self.status = ui.label('').classes('text-xs text-gray-500')
+        with ui.row().classes('w-full gap-2 flex-nowrap'):
+            ui.element('div').classes('w-56 shrink-0')
+            with ui.row().classes('flex-grow gap-0 flex-nowrap'):
+                self.days = [ui.label('').classes('flex-1 text-xs font-semibold text-gray-600') for _ in range(7)]
+        self.lanes = ui.column().classes('w-full gap-1')
+        self._build_dialogs()
+        self.refresh()
+
+    def _build_dialogs(self):
+        with ui.dialog() as self.details, ui.card().classes('w-96 gap-1'):
+            self.details.title = ui.label('').classes('text-lg font-semibold')
+            self.details.when = ui.label('').classes('text-sm')
+            self.details.where = ui.label('').classes('text-sm text-gray-600')
+            self.details.conflicts = ui.label('').classes('text-sm text-red-600')
+            with ui.row().classes('w-full justify-end'):
+                ui.button('Delete', on_click=self._delete).props('flat color=negative no-caps')
+                ui.button('Close', on_click=self.details.close).props('flat no-caps')
+        self.details.slot = None
+
+        with ui.dialog() as self.editor, ui.card().classes('w-96 gap-2'):
+            ui.label('New slot').classes('text-lg font-semibold')
+            self.editor.resource = ui.select(self.store.resources(), label='Camera').classes('w-full')
+            self.editor.label = ui.input('Label').classes('w-full')
+            self.editor.start = ui.input('Start').props('type=datetime-local').classes('w-full')
+            self.editor.end = ui.input('End').props('type=datetime-local').classes('w-full')
+            with ui.row().classes('w-full justify-end'):
+                ui.button('Cancel', on_click=self.editor.close).props('flat no-caps')
+                ui.button('Save', on_click=self._save).props('unelevated no-caps')
+
+    # ---------------- navigation ---------------- #
+    def move(self, weeks: int):
+        self.week += timedelta(weeks=weeks)
+        self.refresh()
+
+    def today(self):
+        self.week = week_of(datetime.now())
+        self.refresh()
+
+    def _area_changed(self, e):
+        self.area = None if e.value == ALL_AREAS else e.value
+        self.refresh()
+
+    # ---------------- drawing ---------------- #
+    def refresh(self):
+        """
+        Redraw the whole week (after navigating or changing the area).
+        """
+        start = to_seconds(self.week)
+        t0 = time.perf_counter()
+        window = self.store.window(start, start + WEEK, area=self.area)
+        conflicted = {resource: self._conflicted(resource, slots) for resource, slots in window.items()}
+        self._elapsed = time.perf_counter() - t0
+
+        last = self.week + timedelta(days=6)
+        self.title.set_text(f'{self.week:%d %b} – {last:%d %b %Y}')
+        for n, label in enumerate(self.days):
+            label.set_text(f'{self.week + timedelta(days=n):%a %d}')
+
+        self.lanes.clear()
+        self._lanes.clear()
+        self._counts.clear()
+        with self.lanes:
+            self.empty = ui.label('No schedules in this area.').classes('text-sm text-gray-500')
+            for resource in sorted(window):
+                self._lanes[resource] = self._lane(resource, window[resource], conflicted[resource])
+        self._update_status()
+
+    def refresh_lane(self, resource: str):
+        """
+        Redraw one resource's lane, adding or dropping it as needed.
+        """
+        old = self._lanes.pop(resource, None)
+        self._counts.pop(resource, None)
+        if self.store.in_area(resource, self.area):
+            start = to_seconds(self.week)
+            t0 = time.perf_counter()
+            slots = self.store.resource_window(resource, start, start + WEEK)
+            conflicted = self._conflicted(resource, slots)
+            self._elapsed = time.perf_counter() - t0
+            with self.lanes:
+                lane = self._lane(resource, slots, conflicted)
+            # lanes are sorted by resource, after the "no schedules" label
+            lane.move(self.lanes, target_index=1 + sum(1 for r in self._lanes if r < resource))
+            self._lanes[resource] = lane
+        if old is not None:
+            self.lanes.remove(old)
+        self._update_status()
+
+    def _conflicted(self, resource: str, slots) -> set:
+        return {slot.slot_id for slot in slots
+                if self.store.conflicts(resource, slot.start, slot.end, exclude=slot.slot_id)}
+
+    def _lane(self, resource: str, slots, conflicted: set):
+        start = to_seconds(self.week)
+        with ui.row().classes('w-full gap-2 items-center flex-nowrap') as row:
+            ui.label(resource).classes('w-56 shrink-0 text-xs text-gray-700 truncate')
+            with ui.element('div').classes(_LANE).style(_DAY_LINES):
+                for slot in slots:
+                    self._bar(slot, start, slot.slot_id in conflicted)
+        self._counts[resource] = (len(slots), len(conflicted))
+        return row
+
+    def _update_status(self):
+        self.empty.set_visibility(not self._lanes)
+        count = sum(n for n, _ in self._counts.values())
+        conflicts = sum(n for _, n in self._counts.values())
+        self.status.set_text(f'{count} slots this week, {conflicts} in conflict '
+                             f'(queried in {self._elapsed * 1000:.1f} ms)')
+
+    def _bar(self, slot: Slot, week_start: int, conflict: bool):
+        left = max(slot.start - week_start, 0) / WEEK * 100
+        right = min(slot.end - week_start, WEEK) / WEEK * 100
+        bar = ui.label(slot.label or slot.campaign_id).classes(_BAR_CONFLICT if conflict else _BAR_OK) \
+            .style(f'left: {left:.3f}%; width: {max(right - left, 0.3):.3f}%')
+        bar.tooltip(f'{slot.label} {from_seconds(slot.start):%a %H:%M}–{from_seconds(slot.end):%a %H:%M}')
+        bar.calendar = self
+        bar.slot = slot
+        bar.on('click', _slot_clicked)
+
+    # ---------------- slot dialogs ---------------- #
+    def show_slot(self, slot: Slot):
+        conflicts = self.store.conflicts(slot.resource, slot.start, slot.end, exclude=slot.slot_id)
+        self.details.slot = slot
+        self.details.title.set_text(slot.label or slot.slot_id)
+        self.details.when.set_text(f'{from_seconds(slot.start):%a %d %b %H:%M} – {from_seconds(slot.end):%a %d %b %H:%M}')
+        self.details.where.set_text(f'{slot.resource} · {slot.area} · {slot.campaign_id}')
+        self.details.conflicts.set_text(
+            'Overlaps ' + ', '.join(c.label or c.slot_id for c in conflicts) if conflicts else '')
+        self.details.open()
+
+    def _delete(self):
+        slot = self.details.slot
+        self.details.close()
+        if slot is not None and self.store.remove(slot.slot_id) is not None:
+            self.refresh_lane(slot.resource)
+
+    def new_slot(self):
+        day = self.week + timedelta(hours=8)
+        self.editor.resource.set_options(self.store.resources(self.area))
+        self.editor.start.set_value(f'{day:%Y-%m-%dT%H:%M}')
+        self.editor.end.set_value(f'{day + timedelta(hours=4):%Y-%m-%dT%H:%M}')
+        self.editor.open()
+
+    def _save(self):
+        resource = self.editor.resource.value
+        if not resource:
+            ui.notify('Pick a camera', color='red')
+            return
+        try:
+            start = to_seconds(datetime.fromisoformat(self.editor.start.value))
+            end = to_seconds(datetime.fromisoformat(self.editor.end.value))
+        except (TypeError, ValueError):
+            ui.notify('Enter a start and end time', color='red')
+            return
+        if end <= start:
+            ui.notify('The slot must end after it starts', color='red')
+            return
+        area, campaign_id = self.store.owner(resource) or (self.area or '', '')
+        slot = Slot(slot_id=f's-{uuid.uuid4().hex[:8]}',
+                    resource=resource,
+                    area=area,
+                    campaign_id=campaign_id,
+                    start=start,
+                    end=end,
+                    label=self.editor.label.value or '')
+        try:
+            self.store.add(slot)
+        except ScheduleConflict as e:
+            ui.notify(f'Conflicts with {", ".join(c.label or c.slot_id for c in e.conflicts)}', color='red')
+            return
+        self.editor.close()
+        self.refresh_lane(resource)
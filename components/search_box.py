@@ -0,0 +1,119 @@
+import time
+from typing import Callable, List, Optional, Set
+from nicegui import run, ui
+from search_index import Hit
+
+KIND_FILTERS = {
+    'All': None,
+    'Campaigns': {'campaign'},
+    'Cameras': {'camera'},
+    'Areas': {'area'},
+}
+KIND_LABELS = {'campaign': 'Campaign', 'camera': 'Camera', 'area': 'Area'}
+
+_ROW = 'w-full items-center gap-3 px-3 py-2 rounded-md cursor-pointer hover:bg-gray-100'
+_BADGE = 'text-xs font-semibold uppercase text-gray-500 w-20 shrink-0'
+
+
+# ---------------- Shared handlers ---------------- #
+def _result_clicked(e):
+    row = e.sender
+    if row.url:
+        ui.navigate.to(row.url)
+
+
+# ---------------- SearchBox (typeahead) ---------------- #
+class SearchBox:
+    """
+    Debounced typeahead over a search function.
+
+    The input only sends its value after `debounce_ms` without typing, and
+    the fixed pool of `max_results` rows is built once; each search rebinds
+    the rows to the new hits and hides the unused ones.
+
+    Searches run in a worker thread (run.io_bound: the index lives in this
+    process, so a process pool would have to copy it), at most one at a time
+    per box; input that arrives meanwhile is searched once the running
+    search finishes, and only the latest query's hits are shown.
+
+    search(query, k, kinds) must return a list of search_index.Hit.
+    """
+
+    def __init__(self,
+                 search: Callable[[str, int, Optional[Set[str]]], List[Hit]],
+                 max_results: int = 10,
+                 debounce_ms: int = 150):
+        self.search = search
+        self.max_results = max_results
+        self.debounce_ms = debounce_ms
+        self.kinds: Optional[Set[str]] = None
+        self.input = None
+        self.status = None
+        self.rows = []
+        self._searching = False
+        self._dirty = False
+
+    def build(self):
+        with ui.row().classes('w-full items-center gap-4'):
+            self.input = ui.input(placeholder='Search campaigns, areas and cameras (e.g. "N1 Western Bypass")') \
+                .props(f'outlined dense clearable autofocus debounce={self.debounce_ms}').classes('flex-grow')
+            ui.toggle(list(KIND_FILTERS), value='All', on_change=self._kind_changed).props('dense no-caps')
+        self.status = ui.label('').classes('text-xs text-gray-500')
+        with ui.column().classes('w-full gap-1'):
+            for _ in range(self.max_results):
+                with ui.row().classes(_ROW) as row:
+                    row.badge = ui.label('').classes(_BADGE)
+                    with ui.column().classes('gap-0 min-w-0'):
+                        row.title = ui.label('').classes('text-sm font-semibold')
+                        row.text = ui.label('').classes('text-xs text-gray-600 truncate')
+                row.url = None
+                row.on('click', _result_clicked)
+                row.set_visibility(False)
+                self.rows.append(row)
+        self.input.on_value_change(self.refresh)
+
+    async def _kind_changed(self, e):
+        self.kinds = KIND_FILTERS[e.value]
+        await self.refresh()
+
+    async def refresh(self, _e=None):
+        self._dirty = True
+        if self._searching:
+            return  # the running search loops again for the latest input
+        self._searching = True
+        try:
+            while self._dirty:
+                self._dirty = False
+                query = (self.input.value or '').strip()
+                if not query:
+                    hits, elapsed = [], 0.0
+                else:
+                    start = time.perf_counter()
+                    hits = await run.io_bound(self.search, query, self.max_results, self.kinds)
+                    elapsed = time.perf_counter() - start
+                if not self._dirty:
+                    self._show(query, hits or [], elapsed)
+        finally:
+            self._searching = False
+
+    def _show(self, query: str, hits: List[Hit], elapsed: float):
+        for i, row in enumerate(self.rows):
+            hit = hits[i] if i < len(hits) else None
+            if hit is None:
+                if row.visible:
+                    row.set_visibility(False)
+                continue
+            doc = hit.doc
+            row.badge.set_text(KIND_LABELS.get(doc.kind, doc.kind))
+            row.title.set_text(doc.title)
+            row.text.set_text(doc.text)
+            row.url = doc.url
+            if not row.visible:
+                row.set_visibility(True)
+
+        if not query:
+            self.status.set_text('')
+        elif hits:
+            self.status.set_text(f'Top {len(hits)} results in {elapsed * 1000:.1f} ms')
+        else:
+            self.status.set_text(f'No results for "{query}"')
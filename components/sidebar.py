@@ -1 +1,102 @@
+from typing import Callable, Optional
+from nicegui import ui
+from static_assets import asset_url
 
+
+# ---------------- NAV ROUTES ---------------- #
+NAV_ROUTES = {
+    'Campaigns': '/dashboard',
+    'Areas': '/areas',
+    'Campaign Schedules': '/schedules',
+    'Search': '/search'
+}
+
+# class strings are module constants so every client's buttons share the same objects
+_NAV_BASE = 'block text-left text-sm px-3 py-2 w-full rounded-none transition-colors duration-150 flex items-center gap-2 text-white '
+_NAV_ACTIVE = _NAV_BASE + 'bg-blue-600 hover:bg-blue-700 font-semibold border-l-4 border-blue-800'
+_NAV_INACTIVE = _NAV_BASE + 'bg-black hover:bg-gray-800 font-normal border-l-0'
+_ICON_ACTIVE = 'radio_button_checked'
+_ICON_INACTIVE = 'radio_button_unchecked'
+
+
+# ---------------- Shared handlers ---------------- #
+# One function for every button of every client; the button carries its own
+# nav name and sidebar, so no closure is allocated per button.
+def _nav_clicked(e):
+    btn = e.sender
+    btn.sidebar.navigate(btn.nav_name)
+
+
+def _sign_out(_e=None):
+    ui.navigate.to('/')
+
+
+# ---------------- Sidebar Component ---------------- #
+class Sidebar:
+    def __init__(self, on_nav: Optional[Callable[[str], None]] = None, active_nav: str = 'Campaigns', logo_src: Optional[str] = None):
+        self.on_nav = on_nav
+        self.active_nav = active_nav
+        self.logo_src = logo_src or asset_url('logo.svg')
+        self.buttons = {}
+        self.root = None
+
+    def build(self):
+        # idempotent build inside page functions
+        if self.root is not None:
+            return
+
+        self.root = ui.column().classes(
+            'bg-black text-white h-screen w-64 m-0 p-0 gap-0 fixed left-0 top-0 flex flex-col justify-between items-stretch'
+        )
+
+        with self.root:
+            # Logo at very top-left (minimal padding)
+            with ui.row().classes('items-center justify-start p-1'):
+                ui.image(self.logo_src).classes('h-8 w-auto object-contain').style('display:block;')
+
+            # Management heading immediately under the logo (no vertical gap)
+            ui.label('Management').classes('font-semibold text-gray-400 text-sm pl-3').style('margin:0; padding:0;')
+
+            # Compact navigation buttons; the active state is styled once at creation
+            with ui.column().classes('gap-0 w-full').style('margin:0; padding:0;'):
+                for opt in NAV_ROUTES:
+                    active = opt == self.active_nav
+                    btn = ui.button(opt, icon=_ICON_ACTIVE if active else _ICON_INACTIVE, on_click=_nav_clicked)
+                    btn.classes(_NAV_ACTIVE if active else _NAV_INACTIVE)
+                    btn.nav_name = opt
+                    btn.sidebar = self
+                    self.buttons[opt] = btn
+
+            # Sign out at bottom (padded)
+            with ui.column().classes('w-full p-4'):
+                ui.button('Sign out', on_click=_sign_out).classes(
+                    'w-full rounded-md px-4 py-2 bg-red-600 hover:bg-red-700 text-white font-semibold'
+                )
+
+    @staticmethod
+    def _set_active(btn, active: bool):
+        btn.props(f'icon={_ICON_ACTIVE if active else _ICON_INACTIVE}')
+        btn.classes(replace=_NAV_ACTIVE if active else _NAV_INACTIVE)
+
+    def update_active(self, active: str):
+        previous, self.active_nav = self.active_nav, active
+        if self.root is None or previous == active:
+            return
+        # only the two buttons whose state changes are restyled
+        if previous in self.buttons:
+            self._set_active(self.buttons[previous], False)
+        if active in self.buttons:
+            self._set_active(self.buttons[active], True)
+
+    def navigate(self, nav_name: str):
+        if self.on_nav is not None:
+            self.on_nav(nav_name)
+            return
+        self.update_active(nav_name)
+        ui.navigate.to(NAV_ROUTES.get(nav_name, '/dashboard'))
+
+
+def make_sidebar_for_page(active_nav: str) -> Sidebar:
+    sidebar = Sidebar(active_nav=active_nav)
+    sidebar.build()
+    return sidebar
@@ -0,0 +1,35 @@
+from typing import Optional
+from nicegui import ui
+
+
+# ---------------- VideoDialog (one per client) ---------------- #
+class VideoDialog:
+    """
+    A single video dialog shared by every card on a page. It is built the
+    first time something is played and afterwards only its source changes,
+    so repeated plays don't leave dialogs behind. Closing it pauses playback.
+    """
+
+    def __init__(self):
+        self.client = ui.context.client
+        self.dialog = None
+        self.video = None
+
+    def _build(self):
+        with self.client.content:
+            with ui.dialog() as self.dialog, ui.card().classes('w-full max-w-4xl p-0'):
+                self.video = ui.video('').classes('w-full').props('playsinline')
+            self.dialog.on_value_change(self._on_toggle)
+
+    def _on_toggle(self, e):
+        if not e.value:
+            self.video.pause()
+
+    def show(self, src: Optional[str]):
+        if not src:
+            return
+        if self.dialog is None:
+            self._build()
+        if self.video.source != src:
+            self.video.set_source(src)
+        self.dialog.open()
@@ -2,90 +2,197 @@
 Email sending module with:
 - SendGrid API (recommended on Render — uses HTTPS)
 - fallback to SMTP (if SENDGRID_API_KEY not set and SMTP env vars present)
+
+Connections are pooled and reused across calls, see email_transport. The
+transports (requests, smtplib, the MIME classes) are imported on the first
+send, not at startup.
+
+Providers are built once from a snapshot of the env vars (call
+reload_email_config() after changing them). Each provider sits behind a
+circuit breaker, so while SendGrid is failing or slow, OTPs go straight to
+SMTP instead of waiting out the SendGrid timeout first. Breaker tuning:
+- EMAIL_BREAKER_WINDOW (default 20) — calls remembered per provider
+- EMAIL_BREAKER_FAILURE_RATE (default 0.5) — failure share that opens the breaker
+- EMAIL_BREAKER_SLOW_SECONDS (default 5) — calls at least this slow count as slow
+- EMAIL_BREAKER_OPEN_SECONDS (default 30) — how long an open breaker rejects calls
 """
 
 import os
-import json
-import ssl
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from smtplib import SMTP_SSL, SMTPAuthenticationError, SMTPConnectError
-import requests
+import threading
+import time
+from typing import List, Optional
+from circuit_breaker import CircuitBreaker, OPEN
+from metrics import Counter, Histogram
 
-def has_email_provider() -> bool:
-    """
-    Returns True if either SendGrid or SMTP env vars are configured.
-    """
-    if os.getenv('SENDGRID_API_KEY'):
-        return True
-    if os.getenv('SENDER_EMAIL') and os.getenv('SENDER_PASSWORD'):
-        return True
-    return False
+email_send_seconds = Histogram('email_send_seconds', 'Latency of one send_mail attempt per provider', labelnames=('provider',))
+email_send = Counter('email_send', 'send_mail attempts per provider and result', labelnames=('provider', 'result'))
 
-def send_mail(receiver_addr: str, otp: str) -> bool:
-    """
-    Send the OTP to receiver_addr.
-    Tries SendGrid first (if SENDGRID_API_KEY is present), otherwise falls back to SMTP.
-    Returns True on success, False on failure.
-    """
-    sender_addr = os.getenv('SENDER_EMAIL')
-    sendgrid_api_key = os.getenv('SENDGRID_API_KEY')
 
-    # Prefer SendGrid (HTTPS) — tends to work reliably on cloud hosts
-    if sendgrid_api_key and sender_addr:
+class EmailConfig:
+    def __init__(self,
+                 sender_addr: Optional[str] = None,
+                 sender_password: Optional[str] = None,
+                 sendgrid_api_key: Optional[str] = None,
+                 smtp_server: str = 'smtp.gmail.com',
+                 smtp_port: int = 465):
+        self.sender_addr = sender_addr
+        self.sender_password = sender_password
+        self.sendgrid_api_key = sendgrid_api_key
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+
+    @classmethod
+    def from_env(cls) -> 'EmailConfig':
+        return cls(
+            sender_addr=os.getenv('SENDER_EMAIL'),
+            sender_password=os.getenv('SENDER_PASSWORD'),
+            sendgrid_api_key=os.getenv('SENDGRID_API_KEY'),
+            smtp_server=os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
+            smtp_port=int(os.getenv('SMTP_PORT', 465)),
+        )
+
+
+def _make_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        window=int(os.getenv('EMAIL_BREAKER_WINDOW', 20)),
+        failure_rate=float(os.getenv('EMAIL_BREAKER_FAILURE_RATE', 0.5)),
+        slow_call_seconds=float(os.getenv('EMAIL_BREAKER_SLOW_SECONDS', 5)),
+        open_seconds=float(os.getenv('EMAIL_BREAKER_OPEN_SECONDS', 30)),
+    )
+
+
+class SendGridProvider:
+    name = 'sendgrid'
+
+    def __init__(self, config: EmailConfig):
+        self.api_key = config.sendgrid_api_key
+        self.sender_addr = config.sender_addr
+        self.breaker = _make_breaker(self.name)
+
+    def send(self, receiver_addr: str, otp: str) -> bool:
+        data = {
+            "personalizations": [{"to": [{"email": receiver_addr}]}],
+            "from": {"email": self.sender_addr},
+            "subject": "Your OTP code",
+            "content": [{"type": "text/plain", "value": f"Your OTP is {otp}"}]
+        }
         try:
-            url = 'https://api.sendgrid.com/v3/mail/send'
-            headers = {
-                'Authorization': f'Bearer {sendgrid_api_key}',
-                'Content-Type': 'application/json'
-            }
-            data = {
-                "personalizations": [{"to": [{"email": receiver_addr}]}],
-                "from": {"email": sender_addr},
-                "subject": "Your OTP code",
-                "content": [{"type": "text/plain", "value": f"Your OTP is {otp}"}]
-            }
-            resp = requests.post(url, headers=headers, json=data, timeout=10)
+            from email_transport import get_sendgrid_transport
+            resp = get_sendgrid_transport().post(self.api_key, data)
             if resp.status_code in (200, 202):
                 return True
             else:
                 print(f'SendGrid error: status={resp.status_code} body={resp.text}')
         except Exception as e:
             print(f'Exception while sending via SendGrid: {e}')
+        return False
 
-    # Fallback to SMTP SSL (requires SENDER_EMAIL and SENDER_PASSWORD)
-    if sender_addr and os.getenv('SENDER_PASSWORD'):
+
+class SMTPProvider:
+    name = 'smtp'
+
+    def __init__(self, config: EmailConfig):
+        self.sender_addr = config.sender_addr
+        self.password = config.sender_password
+        self.server_addr = config.smtp_server
+        self.port = config.smtp_port
+        self.breaker = _make_breaker(self.name)
+
+    def send(self, receiver_addr: str, otp: str) -> bool:
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        from smtplib import SMTPAuthenticationError, SMTPConnectError
+        from email_transport import get_smtp_pool
         try:
-            password = os.getenv('SENDER_PASSWORD')
             msg = MIMEMultipart()
             msg['To'] = receiver_addr
-            msg['From'] = sender_addr
+            msg['From'] = self.sender_addr
             msg['Subject'] = 'Your OTP code'
             body = f'Your OTP is {otp}'
             msg.attach(MIMEText(body, 'plain'))
 
-            context = ssl.create_default_context()
-            port = int(os.getenv('SMTP_PORT', 465))
-            server_addr = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-
-            with SMTP_SSL(server_addr, port, context=context) as server:
-                server.login(sender_addr, password)
-                server.send_message(msg)
-                return True
+            get_smtp_pool(self.server_addr, self.port, self.sender_addr, self.password).send_message(msg)
+            return True
         except SMTPConnectError:
             print('Connection: Failed to connect to mail server')
         except SMTPAuthenticationError:
             print('Authentication: Wrong Password, please check password')
         except Exception as e:
             print(f'Unexpected error sending email via SMTP: {e}')
+        return False
 
-    # If we get here, no provider succeeded
-    print('send_mail: No email provider succeeded or no credentials provided.')
-    return False
+
+def build_providers(config: EmailConfig) -> list:
+    """
+    Providers in preference order: SendGrid (HTTPS) first, SMTP SSL as fallback.
+    """
+    providers = []
+    if config.sendgrid_api_key and config.sender_addr:
+        providers.append(SendGridProvider(config))
+    if config.sender_addr and config.sender_password:
+        providers.append(SMTPProvider(config))
+    return providers
+
+
+_providers = None
+_providers_lock = threading.Lock()
+
+
+def get_providers() -> list:
+    global _providers
+    if _providers is None:
+        with _providers_lock:
+            if _providers is None:
+                _providers = build_providers(EmailConfig.from_env())
+    return _providers
+
+
+def reload_email_config():
+    """
+    Re-read the env vars; breakers start fresh.
+    """
+    global _providers
+    with _providers_lock:
+        _providers = build_providers(EmailConfig.from_env())
 
 
+def has_email_provider() -> bool:
+    """
+    Returns True if either SendGrid or SMTP env vars are configured.
+    """
+    return bool(get_providers())
+
 
+def send_mail(receiver_addr: str, otp: str) -> bool:
+    """
+    Send the OTP to receiver_addr.
+    Tries providers in preference order, skipping any whose circuit breaker is open.
+    Returns True on success, False on failure.
+    """
+    providers = get_providers()
+    for provider in providers:
+        if not provider.breaker.allow():
+            email_send.labels(provider.name, 'skipped').inc()
+            continue
+        start = time.monotonic()
+        ok = provider.send(receiver_addr, otp)
+        latency = time.monotonic() - start
+        email_send_seconds.labels(provider.name).observe(latency)
+        if ok:
+            provider.breaker.record_success(latency)
+            email_send.labels(provider.name, 'success').inc()
+            return True
+        provider.breaker.record_failure(latency)
+        email_send.labels(provider.name, 'failure').inc()
 
+    # If we get here, no provider succeeded
+    if providers and all(p.breaker.state == OPEN for p in providers):
+        print('send_mail: every email provider circuit is open.')
+    else:
+        print('send_mail: No email provider succeeded or no credentials provided.')
+    return False
 
-    
 
+def provider_stats() -> List[dict]:
+    return [provider.breaker.stats() for provider in get_providers()]
@@ -0,0 +1,289 @@
+"""
+Pooled transports used by email_service:
+- SMTPConnectionPool: bounded pool of authenticated SMTP_SSL connections
+  (NOOP keepalive on reuse, reconnect once on a dropped connection)
+- SendGridTransport: one shared keep-alive requests.Session for the SendGrid API
+
+Pool sizes come from env vars (read once, when a pool is first created):
+- SMTP_POOL_SIZE (default 4)
+- SMTP_KEEPALIVE_SECONDS (default 30) — idle connections older than this are NOOP-checked before reuse
+- SMTP_ACQUIRE_TIMEOUT (default 10) — seconds to wait for a free connection slot
+- SMTP_USE_SSL (default true) — false connects in plain text (local test servers only)
+- SENDGRID_POOL_SIZE (default 10)
+- SENDGRID_TIMEOUT (default 10) — seconds per SendGrid request
+- SENDGRID_API_URL (default the public v3 mail/send endpoint) — point at a stub for load tests
+"""
+
+import os
+import ssl
+import threading
+import time
+from collections import deque
+from smtplib import SMTP, SMTP_SSL, SMTPException, SMTPServerDisconnected
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SENDGRID_URL = 'https://api.sendgrid.com/v3/mail/send'
+
+_ssl_context = None
+_ssl_lock = threading.Lock()
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """
+    Build the default SSL context once; creating it reloads the CA bundle.
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        with _ssl_lock:
+            if _ssl_context is None:
+                _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+class SMTPConnectionPool:
+    def __init__(self,
+                 host: str,
+                 port: int,
+                 username: str,
+                 password: str,
+                 max_size: int = 4,
+                 keepalive_interval: float = 30.0,
+                 acquire_timeout: float = 10.0,
+                 timeout: float = 10.0,
+                 use_ssl: bool = True):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_size = max_size
+        self.keepalive_interval = keepalive_interval
+        self.acquire_timeout = acquire_timeout
+        self.timeout = timeout
+        self.use_ssl = use_ssl
+
+        self._idle = deque()  # (connection, last_used) — most recently used on the right
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._in_use = 0
+        self._created = 0
+        self._reused = 0
+        self._reconnects = 0
+        self._discarded = 0
+
+    def _connect(self) -> SMTP:
+        if self.use_ssl:
+            server = SMTP_SSL(self.host, self.port, context=get_ssl_context(), timeout=self.timeout)
+        else:
+            server = SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.login(self.username, self.password)
+        except Exception:
+            self._close_quietly(server)
+            raise
+        with self._lock:
+            self._created += 1
+        return server
+
+    @staticmethod
+    def _close_quietly(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _is_alive(self, server, last_used: float) -> bool:
+        # recently used connections are trusted; older ones get a NOOP probe
+        if time.monotonic() - last_used < self.keepalive_interval:
+            return True
+        try:
+            return server.noop()[0] == 250
+        except (SMTPException, OSError):
+            return False
+
+    def acquire(self) -> SMTP:
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f'SMTP pool exhausted ({self.max_size} connections busy)')
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    server, last_used = self._idle.pop()
+                if self._is_alive(server, last_used):
+                    with self._lock:
+                        self._reused += 1
+                        self._in_use += 1
+                    return server
+                self._close_quietly(server)
+                with self._lock:
+                    self._discarded += 1
+
+            server = self._connect()
+            with self._lock:
+                self._in_use += 1
+            return server
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, server, discard: bool = False):
+        with self._lock:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((server, time.monotonic()))
+            else:
+                self._discarded += 1
+        if discard:
+            self._close_quietly(server)
+        self._slots.release()
+
+    def send_message(self, msg):
+        """
+        Send msg on a pooled connection. A connection the server dropped is
+        replaced once; any other error discards the connection and propagates.
+        """
+        server = self.acquire()
+        try:
+            try:
+                server.send_message(msg)
+            except (SMTPServerDisconnected, ConnectionError):
+                self._close_quietly(server)
+                with self._lock:
+                    self._reconnects += 1
+                server = self._connect()
+                server.send_message(msg)
+        except Exception:
+            self.release(server, discard=True)
+            raise
+        self.release(server)
+
+    def close(self):
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for server, _ in idle:
+            self._close_quietly(server)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'host': self.host,
+                'port': self.port,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'created': self._created,
+                'reused': self._reused,
+                'reconnects': self._reconnects,
+                'discarded': self._discarded,
+            }
+
+
+class SendGridTransport:
+    def __init__(self, url: str = SENDGRID_URL, pool_size: int = 10, timeout: float = 10.0):
+        self.url = url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    def post(self, api_key: str, data: dict) -> requests.Response:
+        headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        }
+        try:
+            resp = self.session.post(self.url, headers=headers, json=data, timeout=self.timeout)
+        except Exception:
+            with self._lock:
+                self._requests += 1
+                self._errors += 1
+            raise
+        with self._lock:
+            self._requests += 1
+            if resp.status_code not in (200, 202):
+                self._errors += 1
+        return resp
+
+    def close(self):
+        self.session.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'url': self.url,
+                'pool_size': self.pool_size,
+                'requests': self._requests,
+                'errors': self._errors,
+            }
+
+
+# ---------------- shared instances ---------------- #
+_pools: Dict[Tuple[str, int, str], SMTPConnectionPool] = {}
+_sendgrid = None
+_registry_lock = threading.Lock()
+
+
+def get_smtp_pool(host: str, port: int, username: str, password: str) -> SMTPConnectionPool:
+    key = (host, port, username)
+    pool = _pools.get(key)
+    if pool is None or pool.password != password:
+        with _registry_lock:
+            pool = _pools.get(key)
+            if pool is None or pool.password != password:
+                if pool is not None:
+                    pool.close()
+                pool = SMTPConnectionPool(
+                    host, port, username, password,
+                    max_size=int(os.getenv('SMTP_POOL_SIZE', 4)),
+                    keepalive_interval=float(os.getenv('SMTP_KEEPALIVE_SECONDS', 30)),
+                    acquire_timeout=float(os.getenv('SMTP_ACQUIRE_TIMEOUT', 10)),
+                    use_ssl=os.getenv('SMTP_USE_SSL', 'true').lower() in ('1', 'true', 'yes'),
+                )
+                _pools[key] = pool
+    return pool
+
+
+def get_sendgrid_transport() -> SendGridTransport:
+    global _sendgrid
+    if _sendgrid is None:
+        with _registry_lock:
+            if _sendgrid is None:
+                _sendgrid = SendGridTransport(
+                    url=os.getenv('SENDGRID_API_URL', SENDGRID_URL),
+                    pool_size=int(os.getenv('SENDGRID_POOL_SIZE', 10)),
+                    timeout=float(os.getenv('SENDGRID_TIMEOUT', 10)),
+                )
+    return _sendgrid
+
+
+def transport_stats() -> dict:
+    """
+    Snapshot of every transport created so far.
+    """
+    return {
+        'smtp': [pool.stats() for pool in list(_pools.values())],
+        'sendgrid': _sendgrid.stats() if _sendgrid is not None else None,
+    }
+
+
+def close_all():
+    global _sendgrid
+    with _registry_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+        if _sendgrid is not None:
+            _sendgrid.close()
+            _sendgrid = None
@@ -0,0 +1,530 @@
+"""
+Ingestion of car-count events from cameras.
+
+Batches posted to /api/ingest are copied into a per-camera RingBuffer: two
+preallocated NumPy columns (timestamp, count), so an event never becomes a
+Python object once its batch is parsed. A background thread flushes the
+buffered events every INGEST_FLUSH_SECONDS:
+- to an append-only SegmentLog of memory-mapped files, where a segment's
+  header counts its committed records and is only advanced after the
+  records themselves are synced, so a crash loses at most the last flush;
+- to the car_counts rollups the campaign charts read.
+A ring that fills up between flushes triggers a flush instead of dropping
+events.
+
+Each process writes its own subdirectory of INGEST_DIR (WORKER_INDEX under
+launcher.py), so workers never append to the same file. recover() adds
+what every writer committed since its last call to car_counts, keeping a
+read position per writer: on startup that is the whole log (main.py runs
+it in the background once the app is up), after that the flush thread calls
+it every INGEST_FLUSH_SECONDS, so counts posted to any worker reach the
+charts of every worker within about a second. Positions only move under
+the flush lock, so no event reaches the sink twice.
+
+The log keeps what the rollups keep (timeseries.RETENTION): every
+INGEST_COMPACT_SECONDS a writer rewrites its sealed segments with events
+older than the finest rollup's retention summed into hour (then day)
+buckets, and events older than every retention dropped, so a restart
+replays the same rollups from a log that doesn't grow with raw history.
+Ages are measured from now. Directories of writers that no longer run
+are read but not compacted.
+
+ingest_many() checks every batch of a request, and that the request
+doesn't take the ingester past max_cameras distinct cameras, before it
+buffers any of them, so a rejected request leaves nothing behind to be
+duplicated by a retry. Appending may block on a flush when a ring is full,
+so callers on an event loop run it in a thread.
+"""
+
+import glob
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from timeseries import RESOLUTIONS, RETENTION, TimeSeriesStore, car_counts
+
+RECORD = np.dtype([('camera', '<u4'), ('count', '<u4'), ('timestamp', '<i8')])
+HEADER = np.dtype([('magic', 'S8'), ('committed', '<u8')])
+HEADER_BYTES = 64
+MAGIC = b'NVLCNT01'
+MAX_CAMERA_ID = 128
+
+
+# ---------------- Ring buffer ---------------- #
+class RingBuffer:
+    """
+    The last `capacity` events of one camera. Events between the flushed
+    and written cursors (both totals since creation) are waiting for a
+    flush; appends never overwrite them.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.counts = np.zeros(capacity, dtype=np.uint32)
+        self.written = 0
+        self.flushed = 0
+        self.lock = threading.Lock()
+
+    def pending(self) -> int:
+        return self.written - self.flushed
+
+    def _copy_in(self, position: int, timestamps: np.ndarray, counts: np.ndarray):
+        start = position % self.capacity
+        first = min(len(timestamps), self.capacity - start)
+        self.timestamps[start:start + first] = timestamps[:first]
+        self.counts[start:start + first] = counts[:first]
+        rest = len(timestamps) - first
+        if rest:
+            self.timestamps[:rest] = timestamps[first:]
+            self.counts[:rest] = counts[first:]
+
+    def _copy_out(self, position: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        start = position % self.capacity
+        if start + n <= self.capacity:
+            return self.timestamps[start:start + n].copy(), self.counts[start:start + n].copy()
+        first = self.capacity - start
+        return (np.concatenate([self.timestamps[start:], self.timestamps[:n - first]]),
+                np.concatenate([self.counts[start:], self.counts[:n - first]]))
+
+    def append(self, timestamps: np.ndarray, counts: np.ndarray) -> bool:
+        """
+        Append a batch; False (and nothing appended) if it doesn't fit next
+        to the unflushed events.
+        """
+        with self.lock:
+            if self.pending() + len(timestamps) > self.capacity:
+                return False
+            self._copy_in(self.written, timestamps, counts)
+            self.written += len(timestamps)
+            return True
+
+    def unflushed(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self.lock:
+            return self._copy_out(self.flushed, self.pending())
+
+    def mark_flushed(self, n: int):
+        with self.lock:
+            self.flushed += n
+
+
+# ---------------- Append-only log ---------------- #
+def _segment_path(directory: str, number: int) -> str:
+    return os.path.join(directory, f'segment-{number:06d}.log')
+
+
+def _segments(directory: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, 'segment-*.log')))
+
+
+def _segment_number(path: str) -> int:
+    return int(os.path.basename(path)[len('segment-'):-len('.log')])
+
+
+def _read_segment(path: str) -> np.ndarray:
+    header = np.memmap(path, dtype=HEADER, mode='r', shape=(1,))
+    if header[0]['magic'] != MAGIC:
+        raise ValueError(f'{path} is not a count log')
+    committed = int(header[0]['committed'])
+    if committed == 0:
+        return np.empty(0, dtype=RECORD)
+    return np.array(np.memmap(path, dtype=RECORD, mode='r', offset=HEADER_BYTES, shape=(committed,)))
+
+
+def _write_segment(path: str, records: np.ndarray):
+    # a sealed segment, rewritten whole: header and exactly its records
+    header = np.array([(MAGIC, len(records))], dtype=HEADER)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(header.tobytes().ljust(HEADER_BYTES, b'\0'))
+        f.write(records.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def compact_records(records: np.ndarray, now: float,
+                    retention: Dict[int, Optional[int]] = RETENTION) -> Tuple[np.ndarray, float]:
+    """
+    records as the rollups still need them at now: events within the
+    finest resolution's retention as recorded, older ones summed per camera
+    into buckets of the finest resolution that still keeps them, and those
+    no resolution keeps dropped. Also returns when that next changes.
+    """
+    timestamps = records['timestamp']
+    bucket = np.zeros(len(records), dtype=np.int64)  # 0: not placed yet
+    expires = np.full(len(records), math.inf)
+    for i, resolution in enumerate(RESOLUTIONS):
+        limit = retention.get(resolution)
+        placed = bucket == 0
+        if limit is not None:
+            placed &= timestamps >= now - limit
+        bucket[placed] = 1 if i == 0 else resolution
+        if limit is not None:
+            expires[placed] = timestamps[placed] + limit
+    kept = bucket > 0
+    records, bucket = records[kept], bucket[kept]
+    due = float(expires[kept].min()) if len(records) else math.inf
+
+    coarse = bucket > 1
+    if not coarse.any():
+        return records, due
+    rolled = records[coarse]
+    keys = np.empty(len(rolled), dtype=[('camera', '<u4'), ('timestamp', '<i8')])
+    keys['camera'] = rolled['camera']
+    keys['timestamp'] = rolled['timestamp'] - rolled['timestamp'] % bucket[coarse]
+    unique, inverse = np.unique(keys, return_inverse=True)
+    summed = np.empty(len(unique), dtype=RECORD)
+    summed['camera'] = unique['camera']
+    summed['timestamp'] = unique['timestamp']
+    summed['count'] = np.minimum(np.bincount(inverse, weights=rolled['count']), 0xFFFFFFFF)
+    return np.concatenate([summed, records[~coarse]]), due
+
+
+class SegmentLog:
+    """
+    Records appended to fixed-size memory-mapped segment files in one
+    directory, plus the catalog of camera ids the records refer to by
+    number (cameras.txt, one id per line). Single writer.
+    """
+
+    def __init__(self, directory: str, segment_records: int = 1 << 20):
+        self.directory = directory
+        self.segment_records = segment_records
+        os.makedirs(directory, exist_ok=True)
+        self._catalog_path = os.path.join(directory, 'cameras.txt')
+        self.cameras: List[str] = self.read_catalog(directory)
+        self._numbers: Dict[str, int] = {c: n for n, c in enumerate(self.cameras)}
+        segments = _segments(directory)
+        self._segment = len(segments) - 1 if segments else 0
+        self._open(self._segment)
+
+    @staticmethod
+    def read_catalog(directory: str) -> List[str]:
+        try:
+            with open(os.path.join(directory, 'cameras.txt'), encoding='utf-8') as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def _open(self, number: int):
+        path = _segment_path(self.directory, number)
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.truncate(HEADER_BYTES + self.segment_records * RECORD.itemsize)  # sparse until written
+            header = np.memmap(path, dtype=HEADER, mode='r+', shape=(1,))
+            header[0] = (MAGIC, 0)
+            header.flush()
+        self._header = np.memmap(path, dtype=HEADER, mode='r+', shape=(1,))
+        size = (os.path.getsize(path) - HEADER_BYTES) // RECORD.itemsize
+        self._records = np.memmap(path, dtype=RECORD, mode='r+', offset=HEADER_BYTES, shape=(size,))
+        self._committed = int(self._header[0]['committed'])
+
+    def camera_numbers(self, camera_ids: List[str]) -> List[int]:
+        new = [c for c in dict.fromkeys(camera_ids) if c not in self._numbers]
+        if new:
+            # the catalog is written (and synced) before any record can refer to it
+            with open(self._catalog_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(c + '\n' for c in new))
+                f.flush()
+                os.fsync(f.fileno())
+            for camera_id in new:
+                self._numbers[camera_id] = len(self.cameras)
+                self.cameras.append(camera_id)
+        return [self._numbers[c] for c in camera_ids]
+
+    def append(self, records: np.ndarray):
+        while len(records):
+            room = len(self._records) - self._committed
+            if room == 0:
+                self._segment += 1
+                self._open(self._segment)
+                continue
+            part, records = records[:room], records[room:]
+            end = self._committed + len(part)
+            self._records[self._committed:end] = part
+            self._records.flush()
+            self._header['committed'][0] = end
+            self._header.flush()
+            self._committed = end
+
+    def position(self) -> Tuple[int, int]:
+        return self._segment, self._committed
+
+    @staticmethod
+    def read(directory: str, position: Tuple[int, int] = (0, 0)) \
+            -> Tuple[List[Tuple[str, np.ndarray, np.ndarray]], Tuple[int, int]]:
+        """
+        (camera id, timestamps, counts) for every camera with records
+        committed in directory after position (segment number, records),
+        and the position after them.
+        """
+        segment, offset = position
+        parts = []
+        for path in _segments(directory):
+            number = _segment_number(path)
+            if number < segment:
+                continue
+            records = _read_segment(path)
+            parts.append(records[offset:] if number == segment else records)
+            segment, offset = number, len(records)
+        records = np.concatenate(parts) if parts else np.empty(0, dtype=RECORD)
+        if len(records) == 0:
+            return [], (segment, offset)
+        # read after the records: a camera is in the catalog before any record refers to it
+        cameras = SegmentLog.read_catalog(directory)
+        order = np.argsort(records['camera'], kind='stable')
+        records = records[order]
+        numbers, starts = np.unique(records['camera'], return_index=True)
+        return [(cameras[number], chunk['timestamp'].astype(np.int64), chunk['count'].astype(np.int64))
+                for number, chunk in zip(numbers, np.split(records, starts[1:]))], (segment, offset)
+
+    @staticmethod
+    def replay(directory: str) -> Iterator[Tuple[str, np.ndarray, np.ndarray]]:
+        """
+        (camera id, timestamps, counts) for every camera with committed
+        records in directory.
+        """
+        yield from SegmentLog.read(directory)[0]
+
+
+# ---------------- Ingester ---------------- #
+def parse_batch(camera_id, timestamps, counts) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (timestamps as int64, counts as uint32) of one batch; raises ValueError
+    for anything malformed.
+    """
+    if not isinstance(camera_id, str) or not camera_id or len(camera_id) > MAX_CAMERA_ID or '\n' in camera_id:
+        raise ValueError('invalid camera_id')
+    try:
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64)
+    except (OverflowError, TypeError) as e:
+        raise ValueError(f'timestamps and counts must be integers ({e})')
+    if timestamps.ndim != 1 or timestamps.shape != counts.shape:
+        raise ValueError('timestamps and counts must be lists of the same length')
+    if len(counts) and (counts.min() < 0 or counts.max() > 0xFFFFFFFF):
+        raise ValueError('counts must be between 0 and 2**32 - 1')
+    return timestamps, counts.astype(np.uint32)
+
+
+class CountIngester:
+    def __init__(self,
+                 directory: str,
+                 writer: str = '0',
+                 capacity: int = 4096,
+                 flush_seconds: float = 1.0,
+                 segment_records: int = 1 << 20,
+                 max_cameras: int = 10000,
+                 compact_seconds: float = 3600.0,
+                 retention: Dict[int, Optional[int]] = RETENTION,
+                 sink: Optional[TimeSeriesStore] = car_counts):
+        self.directory = directory
+        self.writer = writer
+        self.capacity = capacity
+        self.max_cameras = max_cameras
+        self.flush_seconds = flush_seconds
+        self.segment_records = segment_records
+        self.compact_seconds = compact_seconds
+        self.retention = retention
+        self.sink = sink
+        self.events = 0  # accepted since start
+        self.flushed = 0  # written to the log since start
+        self._rings: Dict[str, RingBuffer] = {}
+        self._log: Optional[SegmentLog] = None
+        self._positions: Dict[str, Tuple[int, int]] = {}  # writer -> read position of its log
+        self._compact_due: Dict[str, float] = {}  # sealed segment -> when compacting it changes it
+        self._compacted_at = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def rings(self, camera_ids: Iterable[str]) -> List[RingBuffer]:
+        """
+        The rings of camera_ids, creating missing ones; raises ValueError
+        (creating none) if that would exceed max_cameras.
+        """
+        rings = self._rings
+        if all(camera_id in rings for camera_id in camera_ids):
+            return [rings[camera_id] for camera_id in camera_ids]
+        with self._lock:
+            new = {camera_id for camera_id in camera_ids if camera_id not in rings}
+            if len(rings) + len(new) > self.max_cameras:
+                raise ValueError(f'more than {self.max_cameras} cameras')
+            for camera_id in new:
+                rings[camera_id] = RingBuffer(self.capacity)
+        return [rings[camera_id] for camera_id in camera_ids]
+
+    def ingest(self, camera_id: str, timestamps, counts) -> int:
+        """
+        Buffer counts observed by camera_id at unix timestamps (seconds).
+        Raises ValueError for a malformed batch; returns events accepted.
+        """
+        return self.ingest_many([(camera_id, timestamps, counts)])
+
+    def ingest_many(self, batches: Iterable[Tuple[str, object, object]]) -> int:
+        """
+        Buffer (camera_id, timestamps, counts) batches, all or none: raises
+        ValueError, having buffered nothing, if any batch is malformed or
+        there would be too many cameras. Returns events accepted.
+        """
+        parsed = [(camera_id,) + parse_batch(camera_id, timestamps, counts)
+                  for camera_id, timestamps, counts in batches]
+        rings = self.rings([camera_id for camera_id, _, _ in parsed])
+
+        self.start()
+        accepted = 0
+        for ring, (_, timestamps, counts) in zip(rings, parsed):
+            # batches larger than the ring go in ring-sized parts
+            for lo in range(0, len(timestamps), self.capacity):
+                ts, cs = timestamps[lo:lo + self.capacity], counts[lo:lo + self.capacity]
+                while not ring.append(ts, cs):
+                    self.flush()
+            accepted += len(timestamps)
+        self.events += accepted
+        return accepted
+
+    def flush(self) -> int:
+        """
+        Write the buffered events to the log, then to the sink; returns the
+        number of events written.
+        """
+        with self._flush_lock:
+            batches = []
+            for camera_id, ring in list(self._rings.items()):
+                timestamps, counts = ring.unflushed()
+                if len(timestamps):
+                    batches.append((camera_id, ring, timestamps, counts))
+            if not batches:
+                return 0
+
+            if self._log is None:
+                # this writer's earlier records go to the sink first, if recover() hasn't read them yet
+                self._catch_up(self.writer)
+                self._log = SegmentLog(os.path.join(self.directory, self.writer), self.segment_records)
+            numbers = self._log.camera_numbers([camera_id for camera_id, _, _, _ in batches])
+            records = np.empty(sum(len(b[2]) for b in batches), dtype=RECORD)
+            offset = 0
+            for number, (_, _, timestamps, counts) in zip(numbers, batches):
+                end = offset + len(timestamps)
+                records['camera'][offset:end] = number
+                records['timestamp'][offset:end] = timestamps
+                records['count'][offset:end] = counts
+                offset = end
+            self._log.append(records)
+            self._positions[self.writer] = self._log.position()
+
+            for camera_id, ring, timestamps, counts in batches:
+                ring.mark_flushed(len(timestamps))
+                if self.sink is not None:
+                    self.sink.add(camera_id, timestamps, counts.astype(np.int64))
+            self.flushed += len(records)
+            return len(records)
+
+    def recover(self) -> int:
+        """
+        Add every writer's records committed since the last call (on the
+        first call, the whole log) to the sink; returns events added.
+        """
+        added = 0
+        with self._flush_lock:
+            for directory in sorted(glob.glob(os.path.join(self.directory, '*'))):
+                if os.path.isdir(directory):
+                    added += self._catch_up(os.path.basename(directory))
+        return added
+
+    def _catch_up(self, writer: str) -> int:
+        # called with the flush lock held
+        directory = os.path.join(self.directory, writer)
+        try:
+            batches, position = SegmentLog.read(directory, self._positions.get(writer, (0, 0)))
+        except (OSError, ValueError) as e:
+            print(f'Ingest: skipping {directory}: {e}')
+            return 0
+        self._positions[writer] = position
+        for camera_id, timestamps, counts in batches:
+            if self.sink is not None:
+                self.sink.add(camera_id, timestamps, counts)
+        return sum(len(timestamps) for _, timestamps, _ in batches)
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """
+        Rewrite this writer's sealed segments to what the rollups still keep
+        (see compact_records), deleting emptied ones; returns records removed.
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        with self._flush_lock:
+            segments = _segments(os.path.join(self.directory, self.writer))
+            current = self._log.position()[0] if self._log is not None else None
+            for path in segments:
+                number = _segment_number(path)
+                if number == current or (current is None and path == segments[-1]):
+                    continue  # still being appended to
+                if self._compact_due.get(path, 0.0) > now:
+                    continue
+                records = _read_segment(path)
+                compacted, self._compact_due[path] = compact_records(records, now, self.retention)
+                if len(compacted) == len(records) and np.array_equal(compacted, records):
+                    continue
+                if len(compacted):
+                    _write_segment(path, compacted)
+                else:
+                    os.remove(path)
+                    del self._compact_due[path]
+                removed += len(records) - len(compacted)
+        return removed
+
+    # ---------------- background flushing ---------------- #
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ingest-flush', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                # the events stay in the rings and are retried on the next flush
+                print(f'Ingest flush failed: {e}')
+            try:
+                # counts other processes ingested since the last pass
+                self.recover()
+                if time.time() - self._compacted_at >= self.compact_seconds:
+                    self._compacted_at = time.time()
+                    self.compact()
+            except Exception as e:
+                print(f'Ingest log read failed: {e}')
+
+    def stats(self) -> dict:
+        return {
+            'cameras': len(self._rings),
+            'events': self.events,
+            'flushed': self.flushed,
+            'pending': sum(ring.pending() for ring in list(self._rings.values())),
+        }
+
+
+# shared by the ingestion endpoint of this process
+count_ingester = CountIngester(
+    directory=os.getenv('INGEST_DIR', 'ingest'),
+    writer=os.getenv('WORKER_INDEX', '0'),
+    capacity=int(os.getenv('INGEST_RING_CAPACITY', 4096)),
+    flush_seconds=float(os.getenv('INGEST_FLUSH_SECONDS', 1.0)),
+    max_cameras=int(os.getenv('INGEST_MAX_CAMERAS', 10000)),
+    compact_seconds=float(os.getenv('INGEST_COMPACT_SECONDS', 3600)),
+)
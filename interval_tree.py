@@ -0,0 +1,233 @@
+"""
+Augmented interval tree for the schedule store.
+
+Intervals are half-open [start, end) with an id and a payload, kept in a
+treap (a binary search tree ordered by (start, id) that is balanced by
+random heap priorities) where every node also records the largest end in
+its subtree. Overlap queries skip any subtree whose largest end is before
+the query start and stop at the first node starting after the query end,
+so they cost O(log n) plus the intervals reported instead of a scan.
+
+Inserts and removals are O(log n) expected. Bulk construction from an
+unsorted list is a sort plus a linear pass (the Cartesian tree of the
+sorted intervals), much cheaper than n inserts.
+
+Not thread-safe; callers serialize updates (see schedules.ScheduleStore).
+"""
+
+import heapq
+import random
+from typing import Any, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class Interval(NamedTuple):
+    start: int
+    end: int
+    item_id: Hashable
+    value: Any
+
+
+class _Node:
+    __slots__ = ('start', 'end', 'item_id', 'value', 'priority', 'max_end', 'left', 'right')
+
+    def __init__(self, start, end, item_id, value, priority: float):
+        self.start = start
+        self.end = end
+        self.item_id = item_id
+        self.value = value
+        self.priority = priority
+        self.max_end = end
+        self.left: Optional['_Node'] = None
+        self.right: Optional['_Node'] = None
+
+    def interval(self) -> Interval:
+        return Interval(self.start, self.end, self.item_id, self.value)
+
+
+def _update(node: _Node):
+    max_end = node.end
+    if node.left is not None and node.left.max_end > max_end:
+        max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > max_end:
+        max_end = node.right.max_end
+    node.max_end = max_end
+
+
+def _before(start, item_id, node: _Node) -> bool:
+    return start < node.start or (start == node.start and item_id < node.item_id)
+
+
+def _rotate_right(node: _Node) -> _Node:
+    top = node.left
+    node.left = top.right
+    top.right = node
+    _update(node)
+    _update(top)
+    return top
+
+
+def _rotate_left(node: _Node) -> _Node:
+    top = node.right
+    node.right = top.left
+    top.left = node
+    _update(node)
+    _update(top)
+    return top
+
+
+def _insert(node: Optional[_Node], new: _Node) -> _Node:
+    if node is None:
+        return new
+    if _before(new.start, new.item_id, node):
+        node.left = _insert(node.left, new)
+        if node.left.priority > node.priority:
+            return _rotate_right(node)
+    else:
+        node.right = _insert(node.right, new)
+        if node.right.priority > node.priority:
+            return _rotate_left(node)
+    _update(node)
+    return node
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    # every key in left sorts before every key in right
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _remove(node: Optional[_Node], start, item_id) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """
+    Remove (start, item_id) below node; returns (new subtree, removed node).
+    """
+    if node is None:
+        return None, None
+    if start == node.start and item_id == node.item_id:
+        return _merge(node.left, node.right), node
+    if _before(start, item_id, node):
+        node.left, removed = _remove(node.left, start, item_id)
+    else:
+        node.right, removed = _remove(node.right, start, item_id)
+    if removed is not None:
+        _update(node)
+    return node, removed
+
+
+# ---------------- IntervalTree ---------------- #
+class IntervalTree:
+    def __init__(self, intervals: Iterable[Tuple[int, int, Hashable, Any]] = (), seed: Optional[int] = None):
+        self._random = random.Random(seed)
+        self._root: Optional[_Node] = None
+        self._size = 0
+        self.rebuild(intervals)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Interval]:
+        """
+        Every interval in (start, id) order.
+        """
+        stack, node = [], self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.interval()
+            node = node.right
+
+    # ---------------- updates ---------------- #
+    def rebuild(self, intervals: Iterable[Tuple[int, int, Hashable, Any]]):
+        """
+        Replace the content with intervals, building the treap bottom-up.
+        """
+        nodes = []
+        for start, end, item_id, value in intervals:
+            if not start < end:
+                raise ValueError(f'empty interval {item_id!r}: [{start}, {end})')
+            nodes.append(_Node(start, end, item_id, value, self._random.random()))
+        nodes.sort(key=lambda n: (n.start, n.item_id))
+
+        # Cartesian tree of the sorted nodes: the rightmost path is kept on a
+        # stack, each node adopts the popped lower-priority part as its left
+        stack: List[_Node] = []
+        for node in nodes:
+            last = None
+            while stack and stack[-1].priority < node.priority:
+                last = stack.pop()
+            node.left = last
+            if stack:
+                stack[-1].right = node
+            stack.append(node)
+        self._root = stack[0] if stack else None
+        self._size = len(nodes)
+
+        # max_end bottom-up: reversed pre-order visits children before parents
+        order, pending = [], [self._root] if self._root is not None else []
+        while pending:
+            node = pending.pop()
+            order.append(node)
+            if node.left is not None:
+                pending.append(node.left)
+            if node.right is not None:
+                pending.append(node.right)
+        for node in reversed(order):
+            _update(node)
+
+    def insert(self, start: int, end: int, item_id: Hashable, value: Any = None):
+        if not start < end:
+            raise ValueError(f'empty interval {item_id!r}: [{start}, {end})')
+        self._root = _insert(self._root, _Node(start, end, item_id, value, self._random.random()))
+        self._size += 1
+
+    def remove(self, start: int, item_id: Hashable) -> bool:
+        self._root, removed = _remove(self._root, start, item_id)
+        if removed is None:
+            return False
+        self._size -= 1
+        return True
+
+    # ---------------- queries ---------------- #
+    def overlap(self, start: int, end: int) -> List[Interval]:
+        """
+        Intervals overlapping [start, end), in (start, id) order.
+        """
+        found = []
+        stack, node = [], self._root
+        while True:
+            # walk left, skipping subtrees that all end at or before start
+            while node is not None and node.max_end > start:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                break
+            node = stack.pop()
+            if node.start >= end:
+                break  # everything after this in order starts too late
+            if node.end > start:
+                found.append(node.interval())
+            node = node.right
+        return found
+
+    def overlapping_pairs(self) -> Iterator[Tuple[Interval, Interval]]:
+        """
+        Every pair of overlapping intervals, by a sweep over the sorted
+        intervals with a heap of the ones still open: O(n log n + pairs).
+        """
+        active: List[Tuple[int, int, Interval]] = []  # (end, tiebreak, interval)
+        for n, interval in enumerate(self):
+            while active and active[0][0] <= interval.start:
+                heapq.heappop(active)
+            for _, _, other in active:
+                yield other, interval
+            heapq.heappush(active, (interval.end, n, interval))
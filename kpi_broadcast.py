@@ -0,0 +1,142 @@
+"""
+Per-campaign KPI broadcast hub.
+
+Instead of every open tab recomputing the same KPIs, each campaign has one
+KPITopic: a single background task computes the values every `interval`
+seconds while anyone is subscribed, and only the keys whose value changed
+are pushed to subscribers. Publishes that arrive within `coalesce_seconds`
+of each other are merged into one push. Subscriptions are tied to a NiceGUI
+client and dropped when the client is deleted (disconnected for good).
+"""
+
+import asyncio
+import inspect
+from typing import Any, Callable, Dict, Optional
+
+Delta = Dict[str, Any]
+
+
+class KPITopic:
+    def __init__(self,
+                 key: str,
+                 compute: Callable[[str], Any],
+                 interval: float = 5.0,
+                 coalesce_seconds: float = 0.25,
+                 on_idle: Optional[Callable[['KPITopic'], None]] = None):
+        self.key = key
+        self.compute = compute
+        self.interval = interval
+        self.coalesce_seconds = coalesce_seconds
+        self.on_idle = on_idle
+
+        self.values: Delta = {}
+        self.subscribers: Dict[str, Callable[[Delta], None]] = {}
+        self._pending: Delta = {}
+        self._flush_handle = None
+        self._task = None
+
+    def subscribe(self, subscriber_id: str, callback: Callable[[Delta], None]):
+        self.subscribers[subscriber_id] = callback
+        if self.values:
+            # late joiners get the full current state once, then deltas
+            self._deliver(subscriber_id, callback, dict(self.values))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unsubscribe(self, subscriber_id: str):
+        self.subscribers.pop(subscriber_id, None)
+        if not self.subscribers:
+            self.stop()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self.on_idle is not None:
+            self.on_idle(self)
+
+    def publish(self, values: Delta):
+        """
+        Record new values; changed keys are pushed after the coalescing window.
+        """
+        for name, value in values.items():
+            if self.values.get(name, _MISSING) != value:
+                self.values[name] = value
+                self._pending[name] = value
+        if self._pending and self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.coalesce_seconds, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        delta, self._pending = self._pending, {}
+        if not delta:
+            return
+        for subscriber_id, callback in list(self.subscribers.items()):
+            self._deliver(subscriber_id, callback, delta)
+
+    def _deliver(self, subscriber_id: str, callback: Callable[[Delta], None], delta: Delta):
+        try:
+            callback(delta)
+        except Exception as e:
+            print(f'KPI subscriber {subscriber_id} failed, unsubscribing: {e}')
+            self.unsubscribe(subscriber_id)
+
+    async def _run(self):
+        while self.subscribers:
+            try:
+                if inspect.iscoroutinefunction(self.compute):
+                    values = await self.compute(self.key)
+                else:
+                    # computations may block (database, files); keep them off the event loop
+                    values = await asyncio.to_thread(self.compute, self.key)
+                if values:
+                    self.publish(values)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'KPI computation for {self.key} failed: {e}')
+            await asyncio.sleep(self.interval)
+
+
+_MISSING = object()
+
+
+class KPIHub:
+    def __init__(self, compute: Callable[[str], Any], interval: float = 5.0, coalesce_seconds: float = 0.25):
+        self.compute = compute
+        self.interval = interval
+        self.coalesce_seconds = coalesce_seconds
+        self.topics: Dict[str, KPITopic] = {}
+
+    def _drop(self, topic: KPITopic):
+        if self.topics.get(topic.key) is topic and not topic.subscribers:
+            del self.topics[topic.key]
+
+    def subscribe(self, key: str, client, callback: Callable[[Delta], None]):
+        """
+        Subscribe a NiceGUI client to the topic `key`; callback(delta) receives
+        changed values. The subscription ends when the client is deleted.
+        """
+        topic = self.topics.get(key)
+        if topic is None:
+            topic = KPITopic(key, self.compute, self.interval, self.coalesce_seconds, on_idle=self._drop)
+            self.topics[key] = topic
+        subscriber_id = f'{client.id}:{id(callback)}'
+        topic.subscribe(subscriber_id, callback)
+        client.on_delete(lambda: topic.unsubscribe(subscriber_id))
+        return subscriber_id
+
+    def publish(self, key: str, values: Delta):
+        """
+        Push values computed elsewhere (e.g. a report job) to the topic's subscribers.
+        """
+        topic = self.topics.get(key)
+        if topic is not None:
+            topic.publish(values)
+
+    def stats(self) -> dict:
+        return {key: len(topic.subscribers) for key, topic in self.topics.items()}
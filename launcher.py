@@ -0,0 +1,327 @@
+"""
+Multi-process launcher: N copies of main.py behind a small sticky balancer.
+
+NiceGUI keeps each client's element tree in the process that built the
+page, and the browser's websocket has to reach that same process. The
+balancer therefore pins every browser to one worker:
+
+- the first response to a browser without the cookie gets
+  `Set-Cookie: novolab_worker=<n>`, and later requests carrying it (page
+  loads, the socket.io websocket) go to worker n;
+- requests without a cookie are routed by a hash of the client IP, so
+  cookie-less clients are still sticky.
+
+Every plain HTTP request is proxied with `Connection: close`, so each
+request arrives on a new connection and gets its own routing decision,
+X-Forwarded-For and cookie. Only websocket upgrades keep their connection,
+whose frames are piped through unchanged to the worker that accepted it.
+X-Forwarded-For is always replaced with the address the balancer saw, and
+workers are started with TRUSTED_PROXY_HOPS=1 so they trust exactly that.
+
+Workers listen on 127.0.0.1:WORKER_BASE_PORT+i and are restarted if they
+exit, after a delay that doubles with every exit in a row (1 s up to
+--max-restart-delay, default 60 s) so a crash-looping worker isn't
+restarted every second; a worker that stayed up that long starts over at
+1 s. With --stats-port (LAUNCHER_STATS_PORT) set, GET /_launcher/stats on
+127.0.0.1:<stats port> returns per-worker pid, port, restarts and
+open/total connections as JSON; it is never served on the public port.
+
+Workers share state through files, so OTP_BACKEND defaults to sqlite here
+(codes survive a worker restart and verify on any worker, and in stateless
+mode a used code or failed attempt is seen by every worker); the outbox is
+already a shared SQLite spool. Rate limits stay per worker.
+
+    python launcher.py --workers 4            # PORT (default 8000) is the public port
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+import zlib
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+COOKIE_NAME = 'novolab_worker'
+STATS_PATH = '/_launcher/stats'
+MAX_HEAD_BYTES = 64 * 1024
+
+_COOKIE = re.compile(rb'(?:^|;)\s*' + COOKIE_NAME.encode() + rb'=(\d+)')
+
+
+class Worker:
+    def __init__(self, index: int, port: int, env: dict):
+        self.index = index
+        self.port = port
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.crashes = 0  # exits in a row, each doubling the restart delay
+        self.restart_at: Optional[float] = None
+        self.active = 0
+        self.total = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        env = dict(self.env, PORT=str(self.port), HOST='127.0.0.1', WORKER_INDEX=str(self.index))
+        self.process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'main.py')], cwd=ROOT, env=env)
+        self.started_at = time.monotonic()
+
+    def stop(self):
+        if self.alive:
+            self.process.terminate()
+
+    def stats(self) -> dict:
+        return {
+            'index': self.index,
+            'port': self.port,
+            'pid': self.process.pid if self.process else None,
+            'alive': self.alive,
+            'restarts': self.restarts,
+            'crashes': self.crashes,
+            'uptime_s': round(time.monotonic() - self.started_at, 1) if self.alive else 0.0,
+            'active_connections': self.active,
+            'total_connections': self.total,
+        }
+
+
+def _header(head: bytes, name: bytes) -> Optional[bytes]:
+    for line in head.split(b'\r\n')[1:]:
+        key, _, value = line.partition(b':')
+        if key.strip().lower() == name:
+            return value.strip()
+    return None
+
+
+def _add_header(head: bytes, line: bytes) -> bytes:
+    # head ends with the blank line; insert before it
+    return head[:-2] + line + b'\r\n\r\n'
+
+
+def _set_header(head: bytes, name: bytes, value: bytes) -> bytes:
+    """
+    head with every `name` header replaced by one `name: value`.
+    """
+    lines = head[:-4].split(b'\r\n')
+    kept = [lines[0]] + [line for line in lines[1:] if line.partition(b':')[0].strip().lower() != name.lower()]
+    return b'\r\n'.join(kept) + b'\r\n' + name + b': ' + value + b'\r\n\r\n'
+
+
+class Balancer:
+    def __init__(self, workers: List[Worker], restart_delay: float = 1.0, max_restart_delay: float = 60.0):
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self._server = None
+        self._stats_server = None
+
+    # ---------------- routing ---------------- #
+    def _alive(self) -> List[Worker]:
+        return [w for w in self.workers if w.alive]
+
+    def pick(self, head: bytes, client_ip: str) -> tuple:
+        """
+        (worker, set_cookie) for a request head.
+        """
+        cookie = _header(head, b'cookie')
+        if cookie:
+            match = _COOKIE.search(cookie)
+            if match:
+                index = int(match.group(1))
+                if 0 <= index < len(self.workers) and self.workers[index].alive:
+                    return self.workers[index], False
+        alive = self._alive() or self.workers
+        worker = alive[zlib.crc32(client_ip.encode()) % len(alive)]
+        return worker, True
+
+    # ---------------- proxying ---------------- #
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername')
+        client_ip = peer[0] if peer else ''
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        # whatever the client sent, workers only see the address we saw
+        head = _set_header(head, b'X-Forwarded-For', client_ip.encode())
+        upgrade = _header(head, b'upgrade') is not None
+        if not upgrade:
+            head = _set_header(head, b'Connection', b'close')
+
+        worker, set_cookie = self.pick(head, client_ip)
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection('127.0.0.1', worker.port)
+        except OSError:
+            # worker is (re)starting; try the others before giving up
+            for other in self._alive():
+                if other is worker:
+                    continue
+                try:
+                    upstream_reader, upstream_writer = await asyncio.open_connection('127.0.0.1', other.port)
+                    worker, set_cookie = other, True
+                    break
+                except OSError:
+                    continue
+            else:
+                writer.write(b'HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                await writer.drain()
+                writer.close()
+                return
+
+        worker.active += 1
+        worker.total += 1
+        try:
+            upstream_writer.write(head)
+            cookie = f'Set-Cookie: {COOKIE_NAME}={worker.index}; Path=/; HttpOnly; SameSite=Lax'.encode() if set_cookie else None
+            to_upstream = asyncio.create_task(self._pipe(reader, upstream_writer))
+            await self._pipe(upstream_reader, writer, inject=cookie)
+            if upgrade:
+                await to_upstream
+            else:
+                # the worker closes after its response; a further request on
+                # this connection would bypass routing, so it is not forwarded
+                to_upstream.cancel()
+                await asyncio.gather(to_upstream, return_exceptions=True)
+        finally:
+            worker.active -= 1
+            for w in (writer, upstream_writer):
+                w.close()
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, inject: Optional[bytes] = None):
+        try:
+            if inject is not None:
+                head = await reader.readuntil(b'\r\n\r\n')
+                writer.write(_add_header(head, inject))
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            try:
+                if writer.can_write_eof():
+                    writer.write_eof()
+            except (OSError, RuntimeError):
+                pass
+
+    # ---------------- stats ---------------- #
+    async def handle_stats(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        request_line = head.split(b'\r\n', 1)[0].split(b' ')
+        if len(request_line) >= 2 and request_line[1].split(b'?')[0] == STATS_PATH.encode():
+            status = b'200 OK'
+            body = json.dumps({'workers': [w.stats() for w in self.workers]}, indent=2).encode()
+        else:
+            status, body = b'404 Not Found', b'{}'
+        writer.write(
+            b'HTTP/1.1 ' + status + b'\r\nContent-Type: application/json\r\n'
+            + f'Content-Length: {len(body)}\r\nCache-Control: no-store\r\nConnection: close\r\n\r\n'.encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    # ---------------- supervision ---------------- #
+    def restart_exited(self, now: float):
+        """
+        Schedule a restart for every worker that exited, and start those
+        whose delay has passed.
+        """
+        for worker in self.workers:
+            if worker.process is None or worker.process.poll() is None:
+                continue
+            if worker.restart_at is None:
+                # a worker that stayed up long enough starts over at the shortest delay
+                if now - worker.started_at >= self.max_restart_delay:
+                    worker.crashes = 0
+                delay = min(self.restart_delay * 2 ** worker.crashes, self.max_restart_delay)
+                worker.crashes += 1
+                worker.restart_at = now + delay
+                print(f'Worker {worker.index} exited with status {worker.process.returncode}; '
+                      f'restarting in {delay:.0f} s')
+            if now >= worker.restart_at:
+                worker.restart_at = None
+                worker.restarts += 1
+                worker.start()
+
+    async def supervise(self):
+        while True:
+            await asyncio.sleep(self.restart_delay)
+            self.restart_exited(time.monotonic())
+
+    async def serve(self, host: str, port: int, stats_port: int = 0):
+        self._server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEAD_BYTES)
+        print(f'Balancing {len(self.workers)} workers on http://{host}:{port}')
+        tasks = [self._server.serve_forever(), self.supervise()]
+        if stats_port:
+            # loopback only: worker pids and ports are not for the public listener
+            self._stats_server = await asyncio.start_server(self.handle_stats, '127.0.0.1', stats_port,
+                                                            limit=MAX_HEAD_BYTES)
+            print(f'Launcher stats on http://127.0.0.1:{stats_port}{STATS_PATH}')
+            tasks.append(self._stats_server.serve_forever())
+        async with self._server:
+            await asyncio.gather(*tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run several main.py workers behind a sticky balancer.')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 8000)))
+    parser.add_argument('--worker-base-port', type=int, default=int(os.getenv('WORKER_BASE_PORT', 8100)))
+    parser.add_argument('--stats-port', type=int, default=int(os.getenv('LAUNCHER_STATS_PORT', 0)),
+                        help='serve /_launcher/stats on 127.0.0.1 at this port (default: off)')
+    parser.add_argument('--max-restart-delay', type=float, default=float(os.getenv('MAX_RESTART_DELAY', 60)))
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('OTP_BACKEND', 'sqlite')
+    env.setdefault('TRUSTED_PROXY_HOPS', '1')
+    workers = [Worker(i, args.worker_base_port + i, env) for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+
+    balancer = Balancer(workers, max_restart_delay=args.max_restart_delay)
+
+    def shutdown(*_):
+        for worker in workers:
+            worker.stop()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        asyncio.run(balancer.serve(args.host, args.port, args.stats_port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            if worker.process is not None:
+                try:
+                    worker.process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    worker.process.kill()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Page modules, imported either up front or on first use.
+
+With LAZY_PAGES=true (for scale-to-zero hosts) main.py only registers the
+login page before binding the port. A request whose path belongs to a page
+module that hasn't been imported yet waits while LazyPageMiddleware imports
+it (registering its routes), then is routed normally. The page module's
+own imports, where nearly all the time goes, run in a thread; the module
+itself is executed on the event loop, one page at a time, so its routes
+and module-level setup never race the requests being routed. With PREWARM
+(default true) the remaining modules and the email transports are imported
+the same way PREWARM_DELAY_SECONDS after startup, so usually only the very
+first request pays for an import.
+
+Without LAZY_PAGES every module is imported immediately, as before.
+"""
+
+import ast
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+from typing import Iterable, List, Optional, Tuple
+
+LAZY_PAGES = os.getenv('LAZY_PAGES', 'false').lower() in ('1', 'true', 'yes')
+PREWARM = os.getenv('PREWARM', 'true').lower() in ('1', 'true', 'yes')
+PREWARM_DELAY_SECONDS = float(os.getenv('PREWARM_DELAY_SECONDS', 0.5))
+
+# (path prefix, module registering the routes under it); a prefix without a
+# trailing slash also matches the exact path
+PAGE_MODULES: Tuple[Tuple[str, str], ...] = (
+    ('/dashboard', 'pages.dashboard'),
+    ('/campaign/', 'pages.dashboard'),
+    ('/areas', 'pages.dashboard'),
+    ('/schedules', 'pages.dashboard'),
+    ('/search', 'pages.dashboard'),
+    ('/media', 'pages.media'),
+    ('/assets/', 'pages.assets'),
+    ('/api/ingest', 'pages.ingest'),
+)
+
+# imported on first use anyway (email_service defers them to the first send), but worth prewarming
+PREWARM_MODULES = ('email_transport',)
+
+
+def _matches(path: str, prefix: str) -> bool:
+    if prefix.endswith('/'):
+        return path.startswith(prefix)
+    return path == prefix or path.startswith(prefix + '/')
+
+
+def load_module(name: str) -> float:
+    """
+    Import a module (no-op when already imported); returns seconds spent.
+    """
+    if name in sys.modules:
+        return 0.0
+    start = time.perf_counter()
+    # __import__ rather than importlib.import_module: only the former is reported by -X importtime
+    __import__(name)
+    elapsed = time.perf_counter() - start
+    print(f'Loaded {name} in {elapsed * 1000:.0f} ms')
+    return elapsed
+
+
+def dependencies(name: str) -> List[str]:
+    """
+    Modules a page module imports at its top level, other than page modules.
+    """
+    spec = importlib.util.find_spec(name)
+    with open(spec.origin, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), spec.origin)
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.append(node.module)
+    return [n for n in dict.fromkeys(names) if not n.startswith('pages.')]
+
+
+def load_dependencies(name: str):
+    for dependency in dependencies(name):
+        # unconditionally: a module still being imported by another thread is
+        # already in sys.modules, and __import__ waits for it to finish
+        __import__(dependency)
+
+
+# page modules are executed on the event loop one at a time
+_page_lock = asyncio.Lock()
+
+
+async def load_page(name: str):
+    """
+    Import a page module without blocking the event loop for its dependencies.
+    """
+    if name in sys.modules:
+        return
+    await asyncio.to_thread(load_dependencies, name)
+    async with _page_lock:
+        load_module(name)
+
+
+class LazyPageMiddleware:
+    """
+    ASGI middleware importing the page module for a path before routing it.
+    """
+
+    def __init__(self, app, modules: Iterable[Tuple[str, str]] = PAGE_MODULES):
+        self.app = app
+        self.modules = tuple(modules)
+
+    def module_for(self, path: str) -> Optional[str]:
+        for prefix, name in self.modules:
+            if _matches(path, prefix):
+                return name
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] in ('http', 'websocket'):
+            name = self.module_for(scope.get('path', ''))
+            if name is not None and name not in sys.modules:
+                await load_page(name)
+        await self.app(scope, receive, send)
+
+
+_prewarm_task = None
+
+
+async def prewarm(delay: float = PREWARM_DELAY_SECONDS):
+    await asyncio.sleep(delay)
+    for name in dict.fromkeys(name for _, name in PAGE_MODULES):
+        try:
+            await load_page(name)
+        except Exception as e:
+            print(f'Prewarm of {name} failed: {e}')
+    for name in PREWARM_MODULES:
+        try:
+            await asyncio.to_thread(load_module, name)
+        except Exception as e:
+            print(f'Prewarm of {name} failed: {e}')
+
+
+def start_prewarm():
+    global _prewarm_task
+    _prewarm_task = asyncio.get_running_loop().create_task(prewarm())
+
+
+def load_pages(app):
+    """
+    Register the page modules with the NiceGUI app, lazily or right away.
+    """
+    if not LAZY_PAGES:
+        for name in dict.fromkeys(name for _, name in PAGE_MODULES):
+            __import__(name)
+        return
+    app.add_middleware(LazyPageMiddleware)
+    if PREWARM:
+        # startup handlers run before uvicorn binds the port; the task itself
+        # only starts importing after PREWARM_DELAY_SECONDS
+        app.on_startup(start_prewarm)
@@ -1,16 +1,34 @@
 import asyncio
+import math
 import os
-from nicegui import ui
-from authentication_controller import send_otp, user_otp
-import pages.dashboard  
+from typing import Optional
+from fastapi import Request
+from nicegui import app, background_tasks, ui
+from admission import RejectedError, client_address
+from authentication_controller import (
+    send_otp, verify_otp, peek_otp, delivery_status, delivery_workers, otp_admission, ResendTooSoon
+)
+from lazy_pages import load_pages
+import pages.debug
+import pages.metrics
+from metrics import track_page
+from static_assets import asset_url
+
+
+# proxies in front of this process that append to X-Forwarded-For (launcher.py sets 1)
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+
+
+def client_ip(request: Request) -> Optional[str]:
+    peer = request.client.host if request.client else None
+    return client_address(peer, request.headers.get('x-forwarded-for'), TRUSTED_PROXY_HOPS)
+
 
 @ui.page('/')
-def login_page():
-    ui.add_head_html('''
-        <style>
-        html,body { margin:0; padding:0; height:100%; width:100%; background-color:black; }
-        </style>
-    ''')
+@track_page
+def login_page(request: Request):
+    ip = client_ip(request)
+    ui.add_head_html(f'<link rel="stylesheet" href="{asset_url("login.css")}">')
 
     with ui.row().classes('bg-black w-screen h-screen justify-center items-center p-0 m-0'):
         with ui.card().classes('bg-white rounded-xl p-8 w-[420px]'):
@@ -38,41 +56,98 @@ def login_page():
                         ui.notify('Please enter an email', color='red')
                         return
 
+                    email = email_field.value.strip()
+                    if not otp_admission.check(email, ip):
+                        ui.notify('Too many OTP requests, please wait a minute', color='red')
+                        return
+
                     # show loading state on the send button
                     send_button.props('loading')
                     try:
-                        success = await asyncio.to_thread(send_otp, email_field.value.strip())
-                        if success:
-                            ui.notify('OTP sent! Check your email', color='green')
+                        try:
+                            message_id = await otp_admission.submit(send_otp, email)
+                        except RejectedError:
+                            ui.notify('Server busy, please try again shortly', color='red')
+                            return
+                        except ResendTooSoon as e:
+                            ui.notify(f'That code was already used; request a new one in {math.ceil(e.retry_after)} s',
+                                      color='red')
+                            return
+                        if message_id:
+                            ui.notify('Sending OTP...', color='blue')
                             otp_field.props(remove='disabled')
                             login_button.props(remove='disabled')
+                            watch_delivery(message_id)
 
                             # optional debug: reveal OTP when DEV_SHOW_OTP is enabled
                             if os.getenv('DEV_SHOW_OTP', 'false').lower() in ('1', 'true', 'yes'):
-                                otp = user_otp.get(email_field.value.strip())
+                                otp = peek_otp(email)
                                 ui.notify(f'DEBUG OTP: {otp}', color='blue', timeout=5000)
-                                print(f'DEBUG OTP for {email_field.value.strip()}: {otp}')
+                                print(f'DEBUG OTP for {email}: {otp}')
                         else:
                             ui.notify('Failed to send OTP. Check logs / env vars', color='red')
                     finally:
                         send_button.props(remove='loading')
 
+                def watch_delivery(message_id: str):
+                    # poll the outbox until the message is delivered or dead-lettered
+                    async def check():
+                        status = await asyncio.to_thread(delivery_status, message_id)
+                        if status == 'sent':
+                            timer.deactivate()
+                            ui.notify('OTP sent! Check your email', color='green')
+                        elif status in ('dead', None):
+                            timer.deactivate()
+                            ui.notify('Failed to send OTP. Check logs / env vars', color='red')
+
+                    timer = ui.timer(1.0, check)
+
                 # schedule the async handler when the button is clicked
                 send_button.on('click', lambda: asyncio.create_task(handle_send_otp()))
 
-                # Login logic
-                def handle_login():
-                    if user_otp.get(email_field.value.strip()) == otp_field.value:
+                # Login logic; with OTP_BACKEND=sqlite verify_otp may wait on the database lock
+                async def handle_login():
+                    if await asyncio.to_thread(verify_otp, email_field.value, otp_field.value):
                         ui.notify('Login successful', color='green')
-                        ui.open('/dashboard')
+                        ui.navigate.to('/dashboard')
                     else:
                         ui.notify('Wrong OTP', color='red')
 
                 login_button.on('click', handle_login)
 
-# Correct port binding for Render
+# dashboard, media and asset routes (imported on first use with LAZY_PAGES=true)
+load_pages(app)
+
+# OTP emails are delivered from the outbox by background workers
+app.on_startup(delivery_workers.start)
+app.on_shutdown(delivery_workers.stop)
+
+
+def recover_car_counts():
+    # imported here so that with LAZY_PAGES numpy and the ingester load after the port is bound
+    from ingestion import count_ingester
+    replayed = count_ingester.recover()
+    if replayed:
+        print(f'Ingest: replayed {replayed} car-count events')
+    # from now on it picks up what other workers ingest, and compacts this worker's log
+    count_ingester.start()
+
+
+async def start_car_counts():
+    # car counts flushed before the last restart go back into the charts, in the
+    # background: ingest requests are buffered meanwhile and flushed once it's done
+    await asyncio.to_thread(recover_car_counts)
+    # reports only after that: a run only looks back a few hours past what it has reported
+    from report_pipeline import report_pipeline
+    app.on_shutdown(report_pipeline.stop)
+    report_pipeline.start()
+
+
+app.on_startup(lambda: background_tasks.create(start_car_counts(), name='start car counts'))
+
+# Correct port binding for Render (launcher.py runs workers on HOST=127.0.0.1)
 ui.run(
-    host='0.0.0.0',
+    host=os.environ.get('HOST', '0.0.0.0'),
     port=int(os.environ.get('PORT', 8000)),
     reload=False
 )
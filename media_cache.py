@@ -0,0 +1,290 @@
+"""
+Local disk cache for campaign images and videos.
+
+Remote assets are fetched once and stored content-addressed (sha256 of the
+source URL) under MEDIA_CACHE_DIR; the cache is capped at MEDIA_CACHE_MAX_MB
+and evicts least recently used files first. Each process keeps its LRU
+index in memory, so it caches into its own subdirectory (WORKER_INDEX under
+launcher.py) and never deletes a file another process is serving. Image
+thumbnails are generated on demand for a fixed set of widths (needs Pillow;
+without it the original is served).
+
+Only hosts listed in MEDIA_ALLOWED_HOSTS are fetched, redirects included
+(they are followed by hand and every hop is checked), so the proxy cannot
+be pointed at arbitrary URLs. Downloads larger than MEDIA_MAX_DOWNLOAD_MB
+are abandoned.
+
+The HTTP endpoint lives in pages/media.py; pages build URLs with media_url().
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import requests
+
+THUMBNAIL_WIDTHS = (320, 480, 640, 960, 1280)
+MAX_REDIRECTS = 5
+
+
+class MediaError(Exception):
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class MediaCache:
+    def __init__(self,
+                 root: str,
+                 max_bytes: int = 512 * 1024 * 1024,
+                 allowed_hosts: Tuple[str, ...] = (),
+                 timeout: float = 15.0,
+                 max_download_bytes: int = 100 * 1024 * 1024,
+                 session: Optional[requests.Session] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.allowed_hosts = frozenset(h.lower() for h in allowed_hosts)
+        self.timeout = timeout
+        self.max_download_bytes = max_download_bytes
+        self.session = session or requests.Session()
+
+        self._index = OrderedDict()  # key -> size, least recently used first
+        self._size = 0
+        self._lock = threading.Lock()
+        # fetches of the same key are serialized on one of a fixed set of striped locks
+        self._key_locks = [threading.Lock() for _ in range(64)]
+        self._hits = 0
+        self._misses = 0
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    # ---------------- index ---------------- #
+    def _scan(self):
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith('.json') or name.startswith('.'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.root, name))
+            except OSError:
+                continue
+            entries.append((st.st_atime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._size += size
+
+    def _touch(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._index:
+                return False
+            self._index.move_to_end(key)
+            return True
+
+    def _add(self, key: str, size: int):
+        evicted = []
+        with self._lock:
+            self._size -= self._index.pop(key, 0)
+            self._index[key] = size
+            self._size += size
+            while self._size > self.max_bytes and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            for path in (self.path(old_key), self._meta_path(old_key)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def forget(self, url: str):
+        """
+        Drop url and its thumbnails from the index, e.g. after a file was
+        found missing, so the next get() fetches it again.
+        """
+        keys = [self.key_for(url)] + [self.key_for(url, width) for width in THUMBNAIL_WIDTHS]
+        with self._lock:
+            for key in keys:
+                self._size -= self._index.pop(key, 0)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        return self._key_locks[int(key[:8], 16) % len(self._key_locks)]
+
+    # ---------------- paths ---------------- #
+    @staticmethod
+    def key_for(url: str, width: Optional[int] = None) -> str:
+        raw = url if width is None else f'{url}@w{width}'
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.root, key + '.json')
+
+    def meta(self, key: str) -> dict:
+        try:
+            with open(self._meta_path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_atomic(self, key: str, write, meta: dict) -> int:
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            size = os.path.getsize(tmp)
+            with open(self._meta_path(key), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp, self.path(key))
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._add(key, size)
+        return size
+
+    # ---------------- fetching ---------------- #
+    def check_allowed(self, url: str):
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ('http', 'https') or parsed.netloc.lower() not in self.allowed_hosts:
+            raise MediaError(f'host not allowed: {parsed.netloc}', status_code=403)
+
+    def _open(self, url: str):
+        """
+        Response for url, following redirects only to allowed hosts.
+        """
+        location = url
+        for _ in range(MAX_REDIRECTS + 1):
+            self.check_allowed(location)
+            try:
+                resp = self.session.get(location, stream=True, timeout=self.timeout, allow_redirects=False)
+            except requests.RequestException as e:
+                raise MediaError(f'fetch failed: {e}')
+            if resp.status_code not in (301, 302, 303, 307, 308) or 'Location' not in resp.headers:
+                return resp
+            resp.close()
+            location = urllib.parse.urljoin(location, resp.headers['Location'])
+        raise MediaError('too many redirects')
+
+    def _fetch(self, url: str, key: str):
+        resp = self._open(url)
+        with resp:
+            if resp.status_code != 200:
+                raise MediaError(f'origin returned {resp.status_code}')
+            too_large = MediaError(f'larger than {self.max_download_bytes} bytes')
+            length = resp.headers.get('Content-Length', '')
+            if length.isdigit() and int(length) > self.max_download_bytes:
+                raise too_large
+            meta = {
+                'url': url,
+                'content_type': resp.headers.get('Content-Type', 'application/octet-stream'),
+                'fetched_at': time.time(),
+            }
+
+            def write(f):
+                size = 0
+                for chunk in resp.iter_content(chunk_size=256 * 1024):
+                    size += len(chunk)
+                    # Content-Length may be missing or wrong
+                    if size > self.max_download_bytes:
+                        raise too_large
+                    f.write(chunk)
+
+            self._write_atomic(key, write, meta)
+
+    def get(self, url: str) -> Tuple[str, dict]:
+        """
+        Local path and metadata of url, fetching it on first use.
+        """
+        self.check_allowed(url)
+        key = self.key_for(url)
+        if self._touch(key):
+            self._hits += 1
+            return self.path(key), self.meta(key)
+        with self._key_lock(key):
+            # another thread may have fetched it while we waited
+            if not self._touch(key):
+                self._misses += 1
+                self._fetch(url, key)
+        return self.path(key), self.meta(key)
+
+    def thumbnail(self, url: str, width: int) -> Tuple[str, dict]:
+        """
+        Image resized to the smallest standard width >= width (never upscaled).
+        """
+        width = next((w for w in THUMBNAIL_WIDTHS if w >= width), THUMBNAIL_WIDTHS[-1])
+        source_path, source_meta = self.get(url)
+        if not source_meta.get('content_type', '').startswith('image/'):
+            return source_path, source_meta
+        try:
+            from PIL import Image
+        except ImportError:
+            return source_path, source_meta
+
+        key = self.key_for(url, width)
+        if self._touch(key):
+            self._hits += 1
+            return self.path(key), self.meta(key)
+        with self._key_lock(key):
+            if not self._touch(key):
+                self._misses += 1
+                with Image.open(source_path) as img:
+                    if img.width <= width:
+                        return source_path, source_meta
+                    height = round(img.height * width / img.width)
+                    resized = img.convert('RGB').resize((width, height), Image.LANCZOS)
+                meta = {'url': url, 'width': width, 'content_type': 'image/jpeg', 'fetched_at': time.time()}
+                self._write_atomic(key, lambda f: resized.save(f, 'JPEG', quality=82, optimize=True), meta)
+        return self.path(key), self.meta(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'files': len(self._index),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+            }
+
+
+MEDIA_PROXY = os.getenv('MEDIA_PROXY', 'true').lower() in ('1', 'true', 'yes')
+
+media_cache = MediaCache(
+    root=os.path.join(os.getenv('MEDIA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'novolab-media')),
+                      os.getenv('WORKER_INDEX', '0')),
+    max_bytes=int(float(os.getenv('MEDIA_CACHE_MAX_MB', 512)) * 1024 * 1024),
+    max_download_bytes=int(float(os.getenv('MEDIA_MAX_DOWNLOAD_MB', 100)) * 1024 * 1024),
+    allowed_hosts=tuple(
+        h.strip() for h in os.getenv(
+            'MEDIA_ALLOWED_HOSTS', 'images.pexels.com,interactive-examples.mdn.mozilla.net'
+        ).split(',') if h.strip()
+    ),
+)
+
+
+def media_url(src: Optional[str], width: Optional[int] = None) -> Optional[str]:
+    """
+    URL of src through the local media proxy (resized to width for images).
+    Sources the proxy won't fetch are returned unchanged.
+    """
+    if not src or not MEDIA_PROXY:
+        return src
+    try:
+        media_cache.check_allowed(src)
+    except MediaError:
+        return src
+    query = {'src': src}
+    if width:
+        query['w'] = width
+    return '/media?' + urllib.parse.urlencode(query)
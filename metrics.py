@@ -0,0 +1,329 @@
+"""
+In-process metrics with Prometheus text exposition (served at /metrics, see
+pages/metrics.py).
+
+Recording is lock-free on the hot path: every thread increments its own
+shard (a small list reached through threading.local), and shards are only
+summed when /metrics is scraped. A lock is taken once per thread per metric,
+when that thread's shard is created, and when a new label combination is
+first used. Bind label values once (`child = metric.labels('smtp')`) where a
+call site is hot.
+
+Values that already live elsewhere (queue depths, admission counts) are
+exported with set_function(), so they cost nothing until scraped.
+"""
+
+import functools
+import inspect
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from profiling import profile_page
+
+# seconds; covers sub-millisecond page builds up to slow SMTP handshakes
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class _Sharded:
+    """
+    Per-thread cells of `width` floats; only the owning thread writes a cell.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self._local = threading.local()
+        self._cells: List[list] = []
+        self._lock = threading.Lock()
+
+    def cell(self) -> list:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0.0] * self.width
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+            return cell
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            cells = list(self._cells)
+        totals = [0.0] * self.width
+        for cell in cells:
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional['Registry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._function: Optional[Callable[[], float]] = None
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Child metric for one combination of label values (cached).
+        """
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}, got {key}')
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f'{self.name} has labels {self.labelnames}; use .labels(...)')
+        return self.labels()
+
+    def set_function(self, fn: Callable[[], float]):
+        """
+        Report fn() at scrape time instead of recorded values (unlabelled metrics only).
+        """
+        self._function = fn
+        return self
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f'{self.name} {_format_value(self._function())}']
+            except Exception as e:
+                print(f'metric {self.name} failed: {e}')
+                return []
+        lines = []
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.samples(self.name, self.labelnames, key))
+        return lines
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+# ---------------- Counter ---------------- #
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Sharded(1)
+
+    def inc(self, amount: float = 1.0):
+        self._shards.cell()[0] += amount
+
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+    def samples(self, name, labelnames, key):
+        return [f'{name}_total{_label_text(labelnames, key)} {_format_value(self.value())}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f'{self.name}_total {_format_value(self._function())}']
+            except Exception as e:
+                print(f'metric {self.name} failed: {e}')
+                return []
+        return super().samples()
+
+
+# ---------------- Gauge ---------------- #
+class _GaugeChild:
+    def __init__(self):
+        # set() writes the base; inc()/dec() add to per-thread deltas
+        self._base = 0.0
+        self._shards = _Sharded(1)
+
+    def set(self, value: float):
+        self._base = value - self._shards.totals()[0]
+
+    def inc(self, amount: float = 1.0):
+        self._shards.cell()[0] += amount
+
+    def dec(self, amount: float = 1.0):
+        self._shards.cell()[0] -= amount
+
+    def value(self) -> float:
+        return self._base + self._shards.totals()[0]
+
+    def samples(self, name, labelnames, key):
+        return [f'{name}{_label_text(labelnames, key)} {_format_value(self.value())}']
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+
+# ---------------- Histogram ---------------- #
+class _Timer:
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # per cell: one count per bucket, then +Inf, then the sum
+        self._shards = _Sharded(len(buckets) + 2)
+
+    def observe(self, value: float):
+        cell = self._shards.cell()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self) -> _Timer:
+        """
+        Context manager observing the elapsed wall time of its block.
+        """
+        return _Timer(self)
+
+    def samples(self, name, labelnames, key):
+        totals = self._shards.totals()
+        lines = []
+        cumulative = 0.0
+        for bound, count in zip(self.buckets + (math.inf,), totals[:-1]):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f'{name}_bucket{_label_text(labelnames, key, le)} {_format_value(cumulative)}')
+        lines.append(f'{name}_sum{_label_text(labelnames, key)} {_format_value(totals[-1])}')
+        lines.append(f'{name}_count{_label_text(labelnames, key)} {_format_value(cumulative)}')
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional['Registry'] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self) -> _Timer:
+        return self._default().time()
+
+
+# ---------------- Registry ---------------- #
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'metric {metric.name} already registered')
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+# ---------------- Page build time ---------------- #
+page_build_seconds = Histogram(
+    'page_build_seconds', 'Time to run a @ui.page handler for one client', labelnames=('page',)
+)
+
+
+def track_page(func):
+    """
+    Record the build time of a @ui.page handler; apply it under @ui.page.
+    The wrapper keeps the handler's signature, so NiceGUI still injects
+    path parameters, request and client. With PROFILE_PAGES set the handler
+    is also profiled (see profiling.py).
+    """
+    child = page_build_seconds.labels(func.__name__)
+    func = profile_page(func)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with child.time():
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with child.time():
+            return func(*args, **kwargs)
+    return wrapper
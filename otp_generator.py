@@ -1,5 +1,188 @@
+import hashlib
+import hmac
 import secrets
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
 
 def generate_otp(length=6):
-    otp = ''.join(str(secrets.randbelow(10)) for _ in range(length))
+    # one draw from the CSPRNG instead of one per digit
+    otp = str(secrets.randbelow(10 ** length)).zfill(length)
     return otp
+
+
+def derive_otp(secret: bytes, email: str, counter: int, length: int = 6) -> str:
+    """
+    HOTP-style code (RFC 4226 dynamic truncation) for email in time window counter.
+    """
+    msg = struct.pack('>Q', counter) + email.encode()
+    digest = hmac.new(secret, msg, hashlib.sha256).digest()
+    offset = digest[-1] & 0x0F
+    code = struct.unpack('>I', digest[offset:offset + 4])[0] & 0x7FFFFFFF
+    return str(code % 10 ** length).zfill(length)
+
+
+class TOTPGuard(ABC):
+    """
+    State kept for stateless codes: which (email, counter) pairs were already
+    used to log in, and failed attempts per email. Every process verifying
+    codes has to see the same guard (see otp_sqlite.SQLiteReplayGuard).
+    """
+
+    @abstractmethod
+    def mark(self, email: str, counter: int, expires_at: float) -> bool:
+        """
+        Record a use. Returns False if (email, counter) was already used.
+        """
+
+    @abstractmethod
+    def used(self, email: str, counter: int) -> bool:
+        ...
+
+    @abstractmethod
+    def fail(self, email: str, expires_at: float) -> int:
+        """
+        Count a failed attempt for email; the count is forgotten at expires_at
+        (unix seconds), which every further failure pushes back. Returns the count.
+        """
+
+    @abstractmethod
+    def failures(self, email: str) -> int:
+        ...
+
+    @abstractmethod
+    def clear_failures(self, email: str):
+        ...
+
+
+class ReplayGuard(TOTPGuard):
+    """
+    In-process TOTPGuard, for a single main.py. Entries expire with their
+    window and neither table ever holds more than max_entries.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._used = OrderedDict()  # (email, counter) -> expires_at, oldest first
+        self._failures = OrderedDict()  # email -> [failures, expires_at], least recently failed first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _expire(table: OrderedDict, now: float, expiry):
+        # insertion order is close to expiry order, so expired entries sit at the front
+        while table:
+            oldest_key, oldest = next(iter(table.items()))
+            if expiry(oldest) > now:
+                break
+            del table[oldest_key]
+
+    def mark(self, email: str, counter: int, expires_at: float) -> bool:
+        key = (email, counter)
+        with self._lock:
+            self._expire(self._used, time.time(), lambda expiry: expiry)
+            if key in self._used:
+                return False
+            self._used[key] = expires_at
+            while len(self._used) > self.max_entries:
+                self._used.popitem(last=False)
+            return True
+
+    def used(self, email: str, counter: int) -> bool:
+        with self._lock:
+            expires_at = self._used.get((email, counter))
+            return expires_at is not None and expires_at > time.time()
+
+    def fail(self, email: str, expires_at: float) -> int:
+        with self._lock:
+            self._expire(self._failures, time.time(), lambda entry: entry[1])
+            entry = self._failures.pop(email, None) or [0, 0.0]
+            entry[0] += 1
+            entry[1] = expires_at
+            self._failures[email] = entry
+            while len(self._failures) > self.max_entries:
+                self._failures.popitem(last=False)
+            return entry[0]
+
+    def failures(self, email: str) -> int:
+        with self._lock:
+            entry = self._failures.get(email)
+            return entry[0] if entry is not None and entry[1] > time.time() else 0
+
+    def clear_failures(self, email: str):
+        with self._lock:
+            self._failures.pop(email, None)
+
+    def __len__(self) -> int:
+        return len(self._used)
+
+
+class TOTPGenerator:
+    """
+    Stateless OTPs (RFC 6238-style): the code for an email is derived from a
+    server secret and the current time window, so verification is a pure
+    computation that gives the same answer in every process sharing the secret.
+
+    A code is accepted in its own window and the `drift` windows after it,
+    never in future windows. After max_attempts wrong codes an email is
+    locked out until every window those guesses could have hit has passed.
+    Once a window's code was used to log in, the same code would only be
+    refused as a replay, so none is sent again until the next window
+    (retry_after).
+    """
+
+    def __init__(self,
+                 secret: bytes,
+                 step: int = 60,
+                 drift: int = 1,
+                 length: int = 6,
+                 max_attempts: int = 5,
+                 replay_guard: Optional[TOTPGuard] = None):
+        self.secret = secret
+        self.step = step
+        self.drift = drift  # how many past windows are still accepted
+        self.length = length
+        self.max_attempts = max_attempts
+        self.replay_guard = replay_guard if replay_guard is not None else ReplayGuard()
+
+    def _counter(self, at: Optional[float] = None) -> int:
+        return int((time.time() if at is None else at) // self.step)
+
+    def generate(self, email: str, at: Optional[float] = None) -> str:
+        return derive_otp(self.secret, email.strip().lower(), self._counter(at), self.length)
+
+    def expires_at(self, at: Optional[float] = None) -> float:
+        """
+        When the code generate(at=at) returns stops being accepted (unix seconds).
+        """
+        return (self._counter(at) + self.drift + 1) * self.step
+
+    def retry_after(self, email: str, at: Optional[float] = None) -> float:
+        """
+        Seconds until a code worth sending can be generated for email: 0,
+        unless the current window's code was already used.
+        """
+        now = time.time() if at is None else at
+        counter = self._counter(now)
+        if not self.replay_guard.used(email.strip().lower(), counter):
+            return 0.0
+        return (counter + 1) * self.step - now
+
+    def verify(self, email: str, otp: str, at: Optional[float] = None) -> bool:
+        email = email.strip().lower()
+        if self.replay_guard.failures(email) >= self.max_attempts:
+            return False
+        now = self._counter(at)
+        if otp and len(otp) == self.length:
+            for counter in range(now, now - self.drift - 1, -1):
+                if hmac.compare_digest(derive_otp(self.secret, email, counter, self.length), otp):
+                    if not self.replay_guard.mark(email, counter, (counter + self.drift + 1) * self.step):
+                        return False
+                    self.replay_guard.clear_failures(email)
+                    return True
+        # the lockout lasts until the windows accepted right now have all passed
+        self.replay_guard.fail(email, (now + self.drift + 1) * self.step)
+        return False
@@ -0,0 +1,231 @@
+"""
+SQLite OTP backend shared by every main.py process on the same host, and
+the matching replay guard / attempt counter for stateless (TOTP) codes.
+
+- WAL journal so readers never block the single writer
+- one connection per thread; the SQL below is fixed text, so sqlite3's
+  statement cache keeps every query prepared
+- expired rows and rows over the size cap are removed in batched sweeps
+  (every sweep_every writes) instead of on each request
+"""
+
+import hmac
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from otp_generator import TOTPGuard
+from otp_store import OTPBackend
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS otp ('
+    ' email TEXT PRIMARY KEY,'
+    ' otp TEXT NOT NULL,'
+    ' issued_at REAL NOT NULL,'
+    ' expires_at REAL NOT NULL,'
+    ' attempts INTEGER NOT NULL DEFAULT 0'
+    ')',
+    'CREATE INDEX IF NOT EXISTS otp_expires_at ON otp (expires_at)',
+    'CREATE INDEX IF NOT EXISTS otp_issued_at ON otp (issued_at)',
+)
+
+_PUT = 'INSERT OR REPLACE INTO otp (email, otp, issued_at, expires_at, attempts) VALUES (?, ?, ?, ?, 0)'
+_SELECT = 'SELECT otp, expires_at, attempts FROM otp WHERE email = ?'
+_DELETE = 'DELETE FROM otp WHERE email = ?'
+_FAIL = 'UPDATE otp SET attempts = attempts + 1 WHERE email = ?'
+_SWEEP_EXPIRED = 'DELETE FROM otp WHERE rowid IN (SELECT rowid FROM otp WHERE expires_at <= ? LIMIT ?)'
+_COUNT = 'SELECT COUNT(*) FROM otp'
+_SWEEP_OLDEST = 'DELETE FROM otp WHERE rowid IN (SELECT rowid FROM otp ORDER BY issued_at LIMIT ?)'
+
+
+class _SQLiteFile:
+    """
+    Per-thread connections to one database file, with the schema created on open.
+    """
+
+    def __init__(self, path: str, schema):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._connections = []
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        for statement in schema:
+            conn.execute(statement)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._writes_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _wrote(self):
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % self.sweep_every == 0
+        if due:
+            self.purge_expired()
+
+    def close(self):
+        with self._writes_lock:
+            connections = list(self._connections)
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class SQLiteOTPStore(_SQLiteFile, OTPBackend):
+    def __init__(self,
+                 path: str = 'otp.sqlite3',
+                 ttl: float = 300.0,
+                 max_entries: int = 10000,
+                 max_attempts: int = 5,
+                 sweep_every: int = 256,
+                 sweep_batch: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_attempts = max_attempts
+        self.sweep_every = sweep_every
+        self.sweep_batch = sweep_batch
+        super().__init__(path, _SCHEMA)
+
+    def put(self, email: str, otp: str):
+        now = time.time()
+        self._conn().execute(_PUT, (email, otp, now, now + self.ttl))
+        self._wrote()
+
+    def verify(self, email: str, otp: str) -> bool:
+        if not otp:
+            return False
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(_SELECT, (email,)).fetchone()
+            if row is None:
+                ok = False
+            elif row[1] <= time.time():
+                conn.execute(_DELETE, (email,))
+                ok = False
+            elif hmac.compare_digest(row[0].encode(), otp.encode()):
+                conn.execute(_DELETE, (email,))
+                ok = True
+            elif row[2] + 1 >= self.max_attempts:
+                conn.execute(_DELETE, (email,))
+                ok = False
+            else:
+                conn.execute(_FAIL, (email,))
+                ok = False
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return ok
+
+    def peek(self, email: str) -> Optional[str]:
+        row = self._conn().execute(_SELECT, (email,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def discard(self, email: str):
+        self._conn().execute(_DELETE, (email,))
+
+    def purge_expired(self):
+        conn = self._conn()
+        now = time.time()
+        while conn.execute(_SWEEP_EXPIRED, (now, self.sweep_batch)).rowcount >= self.sweep_batch:
+            pass
+        excess = conn.execute(_COUNT).fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(_SWEEP_OLDEST, (excess,))
+
+    def stats(self) -> dict:
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'entries': self._conn().execute(_COUNT).fetchone()[0],
+            'max_entries': self.max_entries,
+        }
+
+
+_GUARD_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS totp_used ('
+    ' email TEXT NOT NULL,'
+    ' counter INTEGER NOT NULL,'
+    ' expires_at REAL NOT NULL,'
+    ' PRIMARY KEY (email, counter)'
+    ')',
+    'CREATE INDEX IF NOT EXISTS totp_used_expires_at ON totp_used (expires_at)',
+    'CREATE TABLE IF NOT EXISTS totp_failures ('
+    ' email TEXT PRIMARY KEY,'
+    ' failures INTEGER NOT NULL,'
+    ' expires_at REAL NOT NULL'
+    ')',
+    'CREATE INDEX IF NOT EXISTS totp_failures_expires_at ON totp_failures (expires_at)',
+)
+
+_MARK = 'INSERT OR IGNORE INTO totp_used (email, counter, expires_at) VALUES (?, ?, ?)'
+_USED = 'SELECT 1 FROM totp_used WHERE email = ? AND counter = ? AND expires_at > ?'
+# an expired count starts over instead of adding to the old one
+_FAIL_TOTP = ('INSERT INTO totp_failures (email, failures, expires_at) VALUES (?, 1, ?) '
+              'ON CONFLICT (email) DO UPDATE SET '
+              'failures = CASE WHEN totp_failures.expires_at > ? THEN totp_failures.failures + 1 ELSE 1 END, '
+              'expires_at = excluded.expires_at '
+              'RETURNING failures')
+_FAILURES = 'SELECT failures FROM totp_failures WHERE email = ? AND expires_at > ?'
+_CLEAR_FAILURES = 'DELETE FROM totp_failures WHERE email = ?'
+_SWEEP_USED = 'DELETE FROM totp_used WHERE rowid IN (SELECT rowid FROM totp_used WHERE expires_at <= ? LIMIT ?)'
+_SWEEP_FAILURES = ('DELETE FROM totp_failures WHERE rowid IN '
+                   '(SELECT rowid FROM totp_failures WHERE expires_at <= ? LIMIT ?)')
+
+
+class SQLiteReplayGuard(_SQLiteFile, TOTPGuard):
+    """
+    TOTPGuard in the OTP database, so a code used on one worker is rejected
+    on every other and failed attempts add up across workers.
+    """
+
+    def __init__(self, path: str = 'otp.sqlite3', sweep_every: int = 256, sweep_batch: int = 1000):
+        self.sweep_every = sweep_every
+        self.sweep_batch = sweep_batch
+        super().__init__(path, _GUARD_SCHEMA)
+
+    def mark(self, email: str, counter: int, expires_at: float) -> bool:
+        marked = self._conn().execute(_MARK, (email, counter, expires_at)).rowcount == 1
+        self._wrote()
+        return marked
+
+    def used(self, email: str, counter: int) -> bool:
+        return self._conn().execute(_USED, (email, counter, time.time())).fetchone() is not None
+
+    def fail(self, email: str, expires_at: float) -> int:
+        # fetchall steps the statement to completion, so the write is committed before returning
+        failures = self._conn().execute(_FAIL_TOTP, (email, expires_at, time.time())).fetchall()[0][0]
+        self._wrote()
+        return failures
+
+    def failures(self, email: str) -> int:
+        row = self._conn().execute(_FAILURES, (email, time.time())).fetchone()
+        return row[0] if row is not None else 0
+
+    def clear_failures(self, email: str):
+        self._conn().execute(_CLEAR_FAILURES, (email,))
+
+    def purge_expired(self):
+        conn = self._conn()
+        now = time.time()
+        for sweep in (_SWEEP_USED, _SWEEP_FAILURES):
+            while conn.execute(sweep, (now, self.sweep_batch)).rowcount >= self.sweep_batch:
+                pass
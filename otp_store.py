@@ -0,0 +1,163 @@
+"""
+OTP storage backends share the OTPBackend interface (see otp_sqlite for the
+multi-process one).
+
+In-memory OTP store with:
+- per-entry expiry, tracked in a min-heap so expired entries are evicted in O(log n)
+- a hard cap on entries, evicting the least recently issued OTP first
+- failed-attempt counters (an OTP is burned after max_attempts wrong guesses)
+- lock striping: emails hash onto independent stripes, each with its own lock
+"""
+
+import heapq
+import hmac
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+
+class OTPBackend(ABC):
+    """
+    Storage interface used by authentication_controller.send_otp / verify_otp.
+    """
+
+    @abstractmethod
+    def put(self, email: str, otp: str):
+        ...
+
+    @abstractmethod
+    def verify(self, email: str, otp: str) -> bool:
+        ...
+
+    @abstractmethod
+    def peek(self, email: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def discard(self, email: str):
+        ...
+
+    def purge_expired(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self):
+        pass
+
+
+class _Entry:
+    __slots__ = ('otp', 'expires_at', 'attempts')
+
+    def __init__(self, otp: str, expires_at: float):
+        self.otp = otp
+        self.expires_at = expires_at
+        self.attempts = 0
+
+
+class _Stripe:
+    __slots__ = ('lock', 'entries', 'expiry', 'evicted_lru', 'evicted_expired')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # email -> _Entry, least recently issued first
+        self.expiry = []  # heap of (expires_at, email); stale items are skipped lazily
+        # eviction counters are per stripe, so they only change under its lock; stats() sums them
+        self.evicted_lru = 0
+        self.evicted_expired = 0
+
+
+class OTPStore(OTPBackend):
+    def __init__(self, ttl: float = 300.0, max_entries: int = 10000, max_attempts: int = 5, stripes: int = 16):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self._stripes = [_Stripe() for _ in range(stripes)]
+        # the cap is enforced per stripe so eviction never needs more than one lock
+        self._stripe_cap = max(1, -(-max_entries // stripes))
+        self.max_entries = self._stripe_cap * stripes
+
+    def _stripe(self, email: str) -> _Stripe:
+        return self._stripes[hash(email) % len(self._stripes)]
+
+    def _expire(self, stripe: _Stripe, now: float):
+        # caller holds stripe.lock
+        heap = stripe.expiry
+        while heap and heap[0][0] <= now:
+            expires_at, email = heapq.heappop(heap)
+            entry = stripe.entries.get(email)
+            if entry is not None and entry.expires_at == expires_at:
+                del stripe.entries[email]
+                stripe.evicted_expired += 1
+        # overwritten / removed entries leave stale heap items behind; rebuild when they dominate
+        if len(heap) > 2 * len(stripe.entries) + 32:
+            stripe.expiry = [(e.expires_at, k) for k, e in stripe.entries.items()]
+            heapq.heapify(stripe.expiry)
+
+    def put(self, email: str, otp: str):
+        now = time.monotonic()
+        entry = _Entry(otp, now + self.ttl)
+        stripe = self._stripe(email)
+        with stripe.lock:
+            self._expire(stripe, now)
+            stripe.entries.pop(email, None)
+            stripe.entries[email] = entry
+            heapq.heappush(stripe.expiry, (entry.expires_at, email))
+            while len(stripe.entries) > self._stripe_cap:
+                stripe.entries.popitem(last=False)
+                stripe.evicted_lru += 1
+
+    def verify(self, email: str, otp: str) -> bool:
+        """
+        Check otp for email. A correct OTP is consumed; a wrong one counts
+        as a failed attempt and burns the OTP once max_attempts is reached.
+        """
+        if not otp:
+            return False
+        now = time.monotonic()
+        stripe = self._stripe(email)
+        with stripe.lock:
+            self._expire(stripe, now)
+            entry = stripe.entries.get(email)
+            if entry is None:
+                return False
+            if hmac.compare_digest(entry.otp.encode(), otp.encode()):
+                del stripe.entries[email]
+                return True
+            entry.attempts += 1
+            if entry.attempts >= self.max_attempts:
+                del stripe.entries[email]
+            return False
+
+    def peek(self, email: str) -> Optional[str]:
+        now = time.monotonic()
+        stripe = self._stripe(email)
+        with stripe.lock:
+            self._expire(stripe, now)
+            entry = stripe.entries.get(email)
+            return entry.otp if entry is not None else None
+
+    def discard(self, email: str):
+        stripe = self._stripe(email)
+        with stripe.lock:
+            stripe.entries.pop(email, None)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        for stripe in self._stripes:
+            with stripe.lock:
+                self._expire(stripe, now)
+
+    def __len__(self) -> int:
+        return sum(len(stripe.entries) for stripe in self._stripes)
+
+    def stats(self) -> dict:
+        return {
+            'backend': 'memory',
+            'entries': len(self),
+            'max_entries': self.max_entries,
+            'evicted_lru': sum(stripe.evicted_lru for stripe in self._stripes),
+            'evicted_expired': sum(stripe.evicted_expired for stripe in self._stripes),
+        }
@@ -0,0 +1,265 @@
+"""
+Durable outbox for OTP emails.
+
+send_otp writes the message to a local SQLite spool and returns straight
+away; DeliveryWorkers (asyncio tasks started with the app) drain it in the
+background. A message is only removed from the queue once it is sent or
+dead-lettered, so a crash mid-send just means the message is picked up
+again when its lease runs out.
+
+Message states: queued -> sending -> sent
+                              \\-> retrying (exponential backoff with full jitter) -> ... -> dead
+
+A message enqueued with expires_at (when its OTP stops being accepted) is
+dead-lettered instead of delivered once that has passed, so a retry never
+sends a code that can no longer be used.
+
+Settings (env vars):
+- OUTBOX_PATH (default outbox.sqlite3)
+- OUTBOX_WORKERS (default 2)
+- OUTBOX_MAX_ATTEMPTS (default 5) — attempts before a message is dead-lettered
+- OUTBOX_BACKOFF_BASE / OUTBOX_BACKOFF_MAX (default 1 / 60 seconds)
+- OUTBOX_RETENTION_SECONDS (default 86400) — how long sent/dead rows are kept for status polling
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+QUEUED = 'queued'
+SENDING = 'sending'
+SENT = 'sent'
+RETRYING = 'retrying'
+DEAD = 'dead'
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS outbox ('
+    ' id TEXT PRIMARY KEY,'
+    ' email TEXT NOT NULL,'
+    ' otp TEXT,'
+    ' status TEXT NOT NULL,'
+    ' attempts INTEGER NOT NULL DEFAULT 0,'
+    ' next_attempt_at REAL NOT NULL,'
+    ' created_at REAL NOT NULL,'
+    ' updated_at REAL NOT NULL,'
+    ' last_error TEXT,'
+    ' expires_at REAL'
+    ')',
+    'CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)',
+)
+
+_ENQUEUE = (
+    'INSERT INTO outbox (id, email, otp, status, attempts, next_attempt_at, created_at, updated_at, expires_at)'
+    " VALUES (?, ?, ?, 'queued', 0, ?, ?, ?, ?)"
+)
+_EXPIRE = (
+    "UPDATE outbox SET status = 'dead', otp = NULL, updated_at = ?, last_error = 'expired'"
+    " WHERE expires_at <= ? AND (status IN ('queued', 'retrying') OR (status = 'sending' AND updated_at <= ?))"
+)
+_NEXT_DUE = (
+    'SELECT id, email, otp, attempts, created_at FROM outbox'
+    " WHERE (status IN ('queued', 'retrying') AND next_attempt_at <= ?)"
+    " OR (status = 'sending' AND updated_at <= ?)"
+    ' ORDER BY next_attempt_at LIMIT 1'
+)
+_CLAIM = "UPDATE outbox SET status = 'sending', updated_at = ? WHERE id = ?"
+_SENT = "UPDATE outbox SET status = 'sent', otp = NULL, attempts = ?, updated_at = ?, last_error = NULL WHERE id = ?"
+_RETRY = "UPDATE outbox SET status = 'retrying', attempts = ?, next_attempt_at = ?, updated_at = ?, last_error = ? WHERE id = ?"
+_DEAD = "UPDATE outbox SET status = 'dead', otp = NULL, attempts = ?, updated_at = ?, last_error = ? WHERE id = ?"
+_STATUS = 'SELECT status, attempts, last_error, updated_at FROM outbox WHERE id = ?'
+_PURGE = "DELETE FROM outbox WHERE status IN ('sent', 'dead') AND updated_at <= ?"
+_COUNTS = 'SELECT status, COUNT(*) FROM outbox GROUP BY status'
+
+
+class Outbox:
+    def __init__(self,
+                 path: str = 'outbox.sqlite3',
+                 max_attempts: int = 5,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 60.0,
+                 lease_seconds: float = 60.0,
+                 retention_seconds: float = 86400.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+
+        self._local = threading.local()
+        self._listeners = []
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        if 'expires_at' not in {row[1] for row in conn.execute('PRAGMA table_info(outbox)')}:
+            # spools created before messages could expire
+            conn.execute('ALTER TABLE outbox ADD COLUMN expires_at REAL')
+        conn.execute('CREATE INDEX IF NOT EXISTS outbox_expires_at ON outbox (expires_at)')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # FULL: a message acknowledged to the user survives power loss
+            conn.execute('PRAGMA synchronous=FULL')
+            self._local.conn = conn
+        return conn
+
+    def add_listener(self, callback: Callable[[], None]):
+        """
+        callback runs (on the enqueuing thread) after every enqueue.
+        """
+        self._listeners.append(callback)
+
+    def enqueue(self, email: str, otp: str, expires_at: Optional[float] = None) -> str:
+        message_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(_ENQUEUE, (message_id, email, otp, now, now, now, expires_at))
+        for callback in self._listeners:
+            callback()
+        return message_id
+
+    def claim(self) -> Optional[tuple]:
+        """
+        Take the next due message (or one whose sender's lease expired),
+        dead-lettering expired ones first.
+        Returns (id, email, otp, attempts, created_at) or None.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(_EXPIRE, (now, now, now - self.lease_seconds))
+            row = conn.execute(_NEXT_DUE, (now, now - self.lease_seconds)).fetchone()
+            if row is not None:
+                conn.execute(_CLAIM, (now, row[0]))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return row
+
+    def backoff(self, attempts: int) -> float:
+        # full jitter: uniform over [0, min(max, base * 2^(attempts-1))]
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return random.uniform(0, ceiling)
+
+    def mark_sent(self, message_id: str, attempts: int):
+        self._conn().execute(_SENT, (attempts, time.time(), message_id))
+
+    def mark_failed(self, message_id: str, attempts: int, error: str) -> str:
+        now = time.time()
+        if attempts >= self.max_attempts:
+            self._conn().execute(_DEAD, (attempts, now, error, message_id))
+            return DEAD
+        self._conn().execute(_RETRY, (attempts, now + self.backoff(attempts), now, error, message_id))
+        return RETRYING
+
+    def status(self, message_id: str) -> Optional[dict]:
+        row = self._conn().execute(_STATUS, (message_id,)).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'attempts': row[1], 'last_error': row[2], 'updated_at': row[3]}
+
+    def purge(self) -> int:
+        return self._conn().execute(_PURGE, (time.time() - self.retention_seconds,)).rowcount
+
+    def counts(self) -> dict:
+        return dict(self._conn().execute(_COUNTS).fetchall())
+
+
+class DeliveryWorkers:
+    """
+    Pool of asyncio tasks draining an Outbox. deliver(email, otp) -> bool is
+    blocking and runs in a worker thread. on_result(state, created_at), if
+    given, is called after every attempt with the message's new state.
+    """
+
+    def __init__(self,
+                 outbox: Outbox,
+                 deliver: Callable[[str, str], bool],
+                 workers: int = 2,
+                 poll_seconds: float = 1.0,
+                 on_result: Optional[Callable[[str, float], None]] = None):
+        self.outbox = outbox
+        self.deliver = deliver
+        self.on_result = on_result
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._tasks = []
+        self._wakeup = None
+        self._loop = None
+        self._last_purge = 0.0
+        outbox.add_listener(self._notify)
+
+    def _notify(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            # clear before claiming so an enqueue that races the claim still wakes us
+            self._wakeup.clear()
+            try:
+                message = await asyncio.to_thread(self.outbox.claim)
+            except Exception as e:
+                print(f'Outbox claim failed: {e}')
+                message = None
+            if message is None:
+                await self._idle()
+                continue
+
+            message_id, email, otp, attempts, created_at = message
+            attempts += 1
+            try:
+                ok = await asyncio.to_thread(self.deliver, email, otp)
+                error = None if ok else 'delivery failed'
+            except Exception as e:
+                ok, error = False, str(e)
+            try:
+                if ok:
+                    await asyncio.to_thread(self.outbox.mark_sent, message_id, attempts)
+                    state = SENT
+                else:
+                    state = await asyncio.to_thread(self.outbox.mark_failed, message_id, attempts, error)
+                    if state == DEAD:
+                        print(f'Outbox: giving up on message {message_id} for {email} after {attempts} attempts')
+            except Exception as e:
+                # the lease expires and another worker retries the message
+                print(f'Outbox update failed for {message_id}: {e}')
+                continue
+            if self.on_result is not None:
+                self.on_result(state, created_at)
+
+    async def _idle(self):
+        now = time.monotonic()
+        if now - self._last_purge > 60:
+            self._last_purge = now
+            try:
+                await asyncio.to_thread(self.outbox.purge)
+            except Exception as e:
+                print(f'Outbox purge failed: {e}')
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+        except asyncio.TimeoutError:
+            pass
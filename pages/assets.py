@@ -0,0 +1,19 @@
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from nicegui import app
+from static_assets import URL_PREFIX, assets
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+# ---------------- FINGERPRINTED STATIC ASSETS ---------------- #
+@app.get(URL_PREFIX + '/{filename}')
+def static_asset(request: Request, filename: str):
+    resolved = assets.resolve(filename, request.headers.get('accept-encoding', ''))
+    if resolved is None:
+        return Response('Not found', status_code=404)
+    path, content_type, encoding = resolved
+    headers = {'Cache-Control': IMMUTABLE, 'Vary': 'Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return FileResponse(path, media_type=content_type, headers=headers)
@@ -1,99 +1,40 @@
-from typing import Optional, Callable, Dict
+import weakref
+from collections import deque
+from typing import Optional, Dict
 from nicegui import ui
-import urllib.parse
-
-# ---------------- NAV ROUTES ---------------- #
-NAV_ROUTES = {
-    'Campaigns': '/dashboard',
-    'Areas': '/areas',
-    'Campaign Schedules': '/schedules',
-    'Search': '/search'
-}
-
-# ---------------- Sidebar Component ---------------- #
-class Sidebar:
-    def __init__(self, on_nav: Callable[[str], None], active_nav: str = 'Campaigns', logo_src: Optional[str] = None):
-        self.on_nav = on_nav
-        self.active_nav = active_nav
-        self.logo_src = logo_src or self._default_logo_dataurl()
-        self.buttons = {}
-        self.root = None
+import time
+from campaign_repository import Campaign, campaigns
+from components.campaign_grid import CampaignGrid
+from timeseries import car_counts, svg_polyline_points
+from kpi_broadcast import KPIHub
+from media_cache import media_url
+from components.sidebar import make_sidebar_for_page
+from components.video_dialog import VideoDialog
+from components.search_box import SearchBox
+from components.area_map import AreaMap
+from components.schedule_calendar import ScheduleCalendar
+from search_index import campaign_search
+from spatial_index import camera_index
+from schedules import schedule_store
+from report_pipeline import Report, report_pipeline
+from metrics import track_page
 
-    def _default_logo_dataurl(self) -> str:
-        svg = (
-            '<svg xmlns="http://www.w3.org/2000/svg" width="120" height="32">'
-            '<rect width="100%" height="100%" fill="#000000" rx="4" />'
-            '<text x="10" y="22" font-family="Inter, Arial, sans-serif" font-size="14" fill="#FFFFFF">Novolab</text>'
-            '</svg>'
-        )
-        return 'data:image/svg+xml;utf8,' + urllib.parse.quote(svg)
-
-    def build(self):
-        # idempotent build inside page functions
-        if self.root is not None:
-            return
+# ---------------- CampaignCard (dashboard row) ---------------- #
+_CARD_OPEN = 'rounded-lg shadow-sm bg-white overflow-hidden transition-transform duration-200 hover:scale-105 hover:shadow-lg flex flex-col'
+_CARD_CLOSED = 'rounded-lg shadow-sm bg-white overflow-hidden flex flex-col opacity-70'
+_VIEW_OPEN = 'bg-green-600 hover:bg-green-700 text-white rounded-md px-3 py-2 mt-3'
+_VIEW_CLOSED = 'bg-gray-600 text-white rounded-md px-3 py-2 mt-3 opacity-60 cursor-not-allowed'
 
-        self.root = ui.column().classes(
-            'bg-black text-white h-screen w-64 m-0 p-0 gap-0 fixed left-0 top-0 flex flex-col justify-between items-stretch'
-        )
 
-        with self.root:
-            # Logo at very top-left (minimal padding)
-            with ui.row().classes('items-center justify-start p-1'):
-                ui.image(self.logo_src).classes('h-8 w-auto object-contain').style('display:block;')
-
-            # Management heading immediately under the logo (no vertical gap)
-            ui.label('Management').classes('font-semibold text-gray-400 text-sm pl-3').style('margin:0; padding:0;')
-
-            # Compact navigation buttons, directly under the Management heading
-            options = ['Campaigns', 'Areas', 'Campaign Schedules', 'Search']
-            with ui.column().classes('gap-0 w-full').style('margin:0; padding:0;'):
-                for opt in options:
-                    # Use icon prop to show a small circle; we'll switch icon for active later
-                    btn = ui.button(opt, on_click=lambda opt=opt: self.on_nav(opt))
-                    btn.props(f'icon=radio_button_unchecked')  # small circle on left
-                    btn.classes(
-                        'block text-left text-sm px-3 py-2 w-full rounded-none '
-                        'hover:bg-gray-800 transition-colors duration-150 flex items-center gap-2'
-                    )
-                    self.buttons[opt] = btn
-                    self._set_active(btn, opt == self.active_nav)
-
-        # Sign out at bottom (padded)
-        with self.root:
-            with ui.column().classes('w-full p-4'):
-                signout_btn = ui.button('Sign out', on_click=self._sign_out)
-                signout_btn.classes('w-full rounded-md px-4 py-2 bg-red-600 hover:bg-red-700 text-white font-semibold')
-
-    def _set_active(self, btn, active: bool):
-        # set full classes each time to avoid class accumulation
-        if active:
-            btn.props('icon=radio_button_checked')
-            btn.classes(
-                'block text-left text-sm px-3 py-2 w-full rounded-none '
-                'bg-blue-600 hover:bg-blue-700 transition-colors duration-150 '
-                'flex items-center gap-2 font-semibold text-white border-l-4 border-blue-800'
-            )
-        else:
-            btn.props('icon=radio_button_unchecked')
-            btn.classes(
-                'block text-left text-sm px-3 py-2 w-full rounded-none '
-                'bg-black hover:bg-gray-800 transition-colors duration-150 '
-                'flex items-center gap-2 font-normal text-white border-l-0'
-            )
+# shared by every card of every client; the button knows its card
+def _play_clicked(e):
+    e.sender.card.play()
 
-    def update_active(self, active: str):
-        self.active_nav = active
-        if self.root is None:
-            return
-        for name, btn in self.buttons.items():
-            self._set_active(btn, name == active)
 
-    def _sign_out(self):
-        ui.run_javascript("if (typeof navigate !== 'undefined' && navigate.to) { navigate.to('/'); } else { window.location.href = '/'; }")
+def _view_clicked(e):
+    e.sender.card.view()
 
 
-# ---------------- CampaignCard (dashboard row) ---------------- #
 class CampaignCard:
     def __init__(self,
                  campaign_id: str,
@@ -102,7 +43,8 @@ class CampaignCard:
                  reports: int,
                  image_src: str = '',
                  video_src: Optional[str] = None,
-                 disabled: bool = False):
+                 disabled: bool = False,
+                 video_dialog: Optional[VideoDialog] = None):
         self.campaign_id = campaign_id
         self.description = description
         self.cameras = cameras
@@ -110,65 +52,114 @@ class CampaignCard:
         self.image_src = image_src
         self.video_src = video_src
         self.disabled = disabled
+        self.video_dialog = video_dialog
         self.root = None
-
-    def build(self):
-        wrapper_classes = (
-            'rounded-lg shadow-sm bg-white overflow-hidden flex flex-col opacity-70'
-            if self.disabled else
-            'rounded-lg shadow-sm bg-white overflow-hidden transition-transform duration-200 hover:scale-105 hover:shadow-lg flex flex-col'
+        self._campaign = None
+        self._state = None
+
+    @classmethod
+    def from_campaign(cls, campaign: Campaign, video_dialog: Optional[VideoDialog] = None) -> 'CampaignCard':
+        return cls(
+            campaign_id=campaign.campaign_id,
+            description=campaign.description,
+            cameras=campaign.cameras,
+            reports=insight_reports(campaign),
+            image_src=campaign.image_src,
+            video_src=campaign.video_src,
+            disabled=not campaign.is_open,
+            video_dialog=video_dialog
         )
 
-        wrapper = ui.element('div').classes(wrapper_classes).style(
+    def build(self):
+        # every optional part (play button, CLOSED overlay) is always built and
+        # toggled by _apply, so the virtualized grid can rebind cards in place
+        self._state = (self.disabled, bool(self.video_src))
+        wrapper = ui.element('div').classes(_CARD_CLOSED if self.disabled else _CARD_OPEN).style(
             'flex: 0 0 calc((100% - 2rem)/3); max-width: calc((100% - 2rem)/3); position: relative;'
         )
 
         with wrapper:
             with ui.element('div').classes('relative flex-[3] w-full bg-gray-200'):
-                ui.image(self.image_src).classes('w-full h-full object-cover rounded-t-lg').style('display:block;')
-
-                if not self.disabled and self.video_src:
-                    def _play_internal():
-                        with ui.dialog() as d:
-                            try:
-                                ui.video(self.video_src).classes('w-full')
-                            except Exception:
-                                ui.html(
-                                    f'<video controls style="width:100%; height:auto;"><source src="{self.video_src}" type="video/mp4"></video>',
-                                    sanitize=False
-                                )
-                        d.open()
-
-                    ui.button('', on_click=_play_internal).props('icon=play_arrow').classes(
-                        'absolute z-20 bg-white/95 hover:bg-white text-black p-2 rounded-full'
-                    ).style('left: 50%; top: 50%; transform: translate(-50%, -50%); pointer-events: auto;')
+                self.image = ui.image(media_url(self.image_src, 480)).classes('w-full h-full object-cover rounded-t-lg').style('display:block;')
+
+                self.play_button = ui.button('', icon='play_arrow', on_click=_play_clicked).classes(
+                    'absolute z-20 bg-white/95 hover:bg-white text-black p-2 rounded-full'
+                ).style('left: 50%; top: 50%; transform: translate(-50%, -50%); pointer-events: auto;')
+                self.play_button.card = self
+                self.play_button.visible = not self.disabled and bool(self.video_src)
 
             with ui.element('div').classes('flex-[2] bg-black text-white p-4 flex flex-col justify-between'):
-                ui.label(self.description).classes('text-sm').style('margin: 0;')
+                self.description_label = ui.label(self.description).classes('text-sm').style('margin: 0;')
                 with ui.row().classes('items-center justify-between gap-2 mt-2'):
-                    ui.label(f'{self.cameras} cameras').classes('text-sm text-white/90')
-                    ui.label(f'{self.reports} insight reports').classes('text-sm text-white/90')
-                if self.disabled:
-                    ui.button('View campaign performance').classes(
-                        'bg-gray-600 text-white rounded-md px-3 py-2 mt-3 opacity-60 cursor-not-allowed'
-                    )
-                else:
-                    def _view_internal():
-                        target = f"/campaign/{self.campaign_id}"
-                        ui.run_javascript(
-                            f"if (typeof navigate !== 'undefined' && navigate.to) {{ navigate.to({repr(target)}); }} else {{ window.location.href = {repr(target)}; }}"
-                        )
-                    ui.button('View campaign performance', on_click=_view_internal).classes(
-                        'bg-green-600 hover:bg-green-700 text-white rounded-md px-3 py-2 mt-3'
-                    )
-
-            if self.disabled:
-                with ui.element('div').classes('absolute inset-0 bg-black/40 z-30 flex items-center justify-center pointer-events-auto'):
-                    ui.label('CLOSED').classes('text-white text-xl font-bold')
+                    self.cameras_label = ui.label(f'{self.cameras} cameras').classes('text-sm text-white/90')
+                    self.reports_label = ui.label(f'{self.reports} insight reports').classes('text-sm text-white/90')
+                self.view_button = ui.button('View campaign performance', on_click=_view_clicked).classes(
+                    _VIEW_CLOSED if self.disabled else _VIEW_OPEN
+                )
+                self.view_button.card = self
+
+            self.closed_overlay = ui.label('CLOSED').classes(
+                'absolute inset-0 bg-black/40 z-30 flex items-center justify-center pointer-events-auto '
+                'text-white text-xl font-bold'
+            )
+            self.closed_overlay.visible = self.disabled
 
         self.root = wrapper
         return wrapper
 
+    def _apply(self):
+        # restyle only when the open/closed state or the play button actually changes
+        state = (self.disabled, bool(self.video_src))
+        if state == self._state:
+            return
+        self._state = state
+        self.root.classes(replace=_CARD_CLOSED if self.disabled else _CARD_OPEN)
+        self.view_button.classes(replace=_VIEW_CLOSED if self.disabled else _VIEW_OPEN)
+        self.play_button.set_visibility(not self.disabled and bool(self.video_src))
+        self.closed_overlay.set_visibility(self.disabled)
+
+    def bind(self, campaign: Optional[Campaign]):
+        """
+        Show another campaign in this (already built) card; None hides the card.
+        """
+        self.root.set_visibility(campaign is not None)
+        if campaign is None or campaign is self._campaign:
+            return
+        previous = self._campaign
+        self._campaign = campaign
+        self.campaign_id = campaign.campaign_id
+        self.description = campaign.description
+        self.cameras = campaign.cameras
+        self.reports = insight_reports(campaign)
+        self.image_src = campaign.image_src
+        self.video_src = campaign.video_src
+        self.disabled = not campaign.is_open
+
+        # set_text/set_source push an update even for equal values, so skip unchanged fields
+        if previous is None or previous.image_src != self.image_src:
+            self.image.set_source(media_url(self.image_src, 480))
+        if self.description_label.text != self.description:
+            self.description_label.set_text(self.description)
+        if previous is None or previous.cameras != self.cameras:
+            self.cameras_label.set_text(f'{self.cameras} cameras')
+        reports_text = f'{self.reports} insight reports'
+        if self.reports_label.text != reports_text:
+            self.reports_label.set_text(reports_text)
+        self._apply()
+
+    def play(self):
+        if self.disabled or not self.video_src:
+            return
+        if self.video_dialog is None:
+            # cards built on their own still reuse one dialog across plays
+            self.video_dialog = VideoDialog()
+        self.video_dialog.show(media_url(self.video_src))
+
+    def view(self):
+        if self.disabled:
+            return
+        ui.navigate.to(f'/campaign/{self.campaign_id}')
+
 
 # ---------------- PerformanceLeftCard (40%) ---------------- #
 class PerformanceLeftCard:
@@ -184,7 +175,7 @@ class PerformanceLeftCard:
         card = ui.element('div').classes('rounded-lg shadow-sm bg-white overflow-hidden').style('flex: 0 0 40%; max-width: 40%;')
         with card:
             # fixed image height so both top cards match heights
-            ui.image(self.image_src).classes('w-full h-64 object-cover rounded-t-lg').style('display:block;')
+            ui.image(media_url(self.image_src, 640)).classes('w-full h-64 object-cover rounded-t-lg').style('display:block;')
             with ui.element('div').classes('bg-black text-white p-4'):
                 ui.label(self.date_text).classes('text-sm').style('margin:0;')
                 ui.element('div').classes('h-px bg-white/30 my-2')
@@ -196,121 +187,177 @@ class PerformanceLeftCard:
 
 
 # ---------------- CameraFeedCard (60%) ---------------- #
+# poster URLs already preloaded per client; entries go away with their client
+_preloaded_posters = weakref.WeakKeyDictionary()
+
+
 class CameraFeedCard:
-    def __init__(self, initial_camera: int, camera_sources: Dict[int, Dict[str, str]]):
+    """
+    One persistent <video> element; switching cameras only swaps its src and
+    poster, so nothing is rebuilt or re-sent over the websocket. The other
+    cameras' posters and video metadata are preloaded so a switch can start
+    quickly. Switch latency (set_camera until the browser reports
+    loadeddata) is recorded in switch_latencies_ms.
+    """
+
+    def __init__(self, initial_camera: int, camera_sources: Dict[int, Dict[str, str]], switch_budget_ms: float = 300.0):
         self.camera = initial_camera
         self.camera_sources = camera_sources
+        self.switch_budget_ms = switch_budget_ms
+        self.switch_latencies_ms = deque(maxlen=50)
         self.container = None
+        self.video = None
+        self._switch_started = None
 
     def build(self):
         # right card uses flex-basis 60%
         self.container = ui.element('div').classes('rounded-lg shadow-sm bg-white overflow-hidden').style('flex: 0 0 60%; max-width: 60%;')
-        self.render_media()
-        return self.container
-
-    def render_media(self):
-        self.container.clear()
         src = self.camera_sources.get(self.camera, {})
-        poster = src.get('poster', '')
-        video = src.get('video', '')
-
         with self.container:
-            # Render a single video element (use poster attribute if provided).
-            # Use ui.video if available; otherwise fall back to ui.html with sanitize=False.
-            video_html = f'<video controls playsinline style="width:100%; height:360px; object-fit:cover; border-radius:8px;"'
-            if poster:
-                video_html += f' poster="{poster}"'
-            video_html += f'>'
-            if video:
-                video_html += f'<source src="{video}" type="video/mp4">'
-            video_html += 'Your browser does not support the video element.</video>'
-
-            try:
-                # Prefer ui.video if present
-                ui.video(video).classes('w-full').style('height:360px; object-fit:cover; border-radius:8px;')
-            except Exception:
-                # fallback to raw HTML (handle NiceGUI versions that accept sanitize)
-                try:
-                    ui.html(video_html, sanitize=False)
-                except TypeError:
-                    ui.html(video_html)
+            self.video = ui.video(media_url(src.get('video', ''))).classes('w-full').style(
+                'height:360px; object-fit:cover; border-radius:8px;'
+            ).props('playsinline preload=auto')
+            self.video.on('loadeddata', self._on_loaded)
+            self._set_poster(src.get('poster', ''))
+            self._preload_others()
+        return self.container
+
+    def _set_poster(self, poster: str):
+        if poster:
+            self.video.props(f'poster="{media_url(poster, 960)}"')
+        else:
+            self.video.props(remove='poster')
+
+    def _preload_others(self):
+        # posters via <link rel=preload>, added to a client's head only once;
+        # video metadata only via hidden muted players (preload=auto would fetch whole files)
+        preloaded = _preloaded_posters.setdefault(ui.context.client, set())
+        for camera_id, src in self.camera_sources.items():
+            if camera_id == self.camera:
+                continue
+            poster = media_url(src['poster'], 960) if src.get('poster') else None
+            if poster and poster not in preloaded:
+                preloaded.add(poster)
+                ui.add_head_html(f'<link rel="preload" as="image" href="{poster}">')
+            if src.get('video'):
+                ui.element('video').props(f'src="{media_url(src["video"])}" preload=metadata muted playsinline').style('display:none;')
+
+    def _on_loaded(self, _e=None):
+        if self._switch_started is None:
+            return
+        elapsed = (time.perf_counter() - self._switch_started) * 1000
+        self._switch_started = None
+        self.switch_latencies_ms.append(elapsed)
+        if elapsed > self.switch_budget_ms:
+            print(f'Camera switch to {self.camera} took {elapsed:.0f} ms (budget {self.switch_budget_ms:.0f} ms)')
 
     def set_camera(self, camera_id: int):
-        if camera_id not in self.camera_sources:
+        if camera_id not in self.camera_sources or camera_id == self.camera:
             return
         self.camera = camera_id
-        self.render_media()
-
-
-# ---------------- Helper: create & build sidebar per page ---------------- #
-def make_sidebar_for_page(active_nav: str):
-    def on_nav(nav_name: str):
-        sidebar.update_active(nav_name)
-        route = NAV_ROUTES.get(nav_name, '/dashboard')
-        ui.run_javascript(
-            f"if (typeof navigate !== 'undefined' && navigate.to) {{ navigate.to({repr(route)}); }} else {{ window.location.href = {repr(route)}; }}"
-        )
-
-    sidebar = Sidebar(on_nav=on_nav, active_nav=active_nav)
-    sidebar.build()
-    sidebar.update_active(active_nav)
-    return sidebar
+        src = self.camera_sources[camera_id]
+        self._switch_started = time.perf_counter()
+        self.video.set_source(media_url(src.get('video', '')))
+        self._set_poster(src.get('poster', ''))
 
 
 # ---------------- DASHBOARD PAGE ---------------- #
 @ui.page('/dashboard')
+@track_page
 def dashboard_page():
     sidebar = make_sidebar_for_page('Campaigns')
 
+
     container = ui.column().classes('ml-64 h-screen w-[calc(100%-16rem)] m-0 p-6 gap-6 bg-white overflow-auto')
     with container:
         ui.label('Dashboard').classes('text-4xl font-bold').style('margin:0;')
         ui.label('Your sightline insights for July 2025').classes('text-base text-gray-600 mt-1 mb-4')
 
-        with ui.row().classes('w-full gap-4 items-start').style('flex-wrap: nowrap; align-items:flex-start;'):
-            cars_image = 'https://images.pexels.com/photos/170811/pexels-photo-170811.jpeg'
-            sample_video = 'https://interactive-examples.mdn.mozilla.net/media/cc0-videos/flower.mp4'
-
-            c1 = CampaignCard(
-                campaign_id='n1-western-bypass',
-                description="The N1 Western Bypass between Rivonia Road and William Mooi Road",
-                cameras=2,
-                reports=27,
-                image_src=cars_image,
-                video_src=sample_video,
-                disabled=False
-            )
-            c1.build()
-
-            c2 = CampaignCard(
-                campaign_id='m1-corridor',
-                description="The M1 corridor around Johannesburg CBD",
-                cameras=3,
-                reports=30,
-                image_src=cars_image,
-                video_src=sample_video,
-                disabled=True
-            )
-            c2.build()
-
-            c3 = CampaignCard(
-                campaign_id='r21-highway',
-                description="The R21 highway near O.R. Tambo International Airport",
-                cameras=4,
-                reports=36,
-                image_src=cars_image,
-                video_src=sample_video,
-                disabled=True
-            )
-            c3.build()
+        # only the cards near the viewport exist; scrolling rebinds them
+        video_dialog = VideoDialog()
+        grid = CampaignGrid(
+            count=campaigns.count,
+            fetch=campaigns.page,
+            card_factory=lambda: CampaignCard(campaign_id='', description='', cameras=0, reports=0, disabled=True,
+                                              video_dialog=video_dialog)
+        )
+        grid.build()
+
+
+# ---------------- Car-count chart ---------------- #
+SAMPLE_CHART_POINTS = '20,120 80,90 140,100 200,80 260,95 320,110 380,100 440,105 500,95'
+
+
+def chart_points(campaign: Campaign, width: int = 300) -> str:
+    # server-side rollups + LTTB keep the polyline at most `width` points for any range
+    x, y = car_counts.query(campaign.camera_ids, width=width)
+    if len(x) < 2:
+        return SAMPLE_CHART_POINTS
+    return svg_polyline_points(x, y, width=600, height=180)
+
+
+# ---------------- Live KPIs ---------------- #
+NO_REPORT_KPIS = {
+    'pr_value': '—',
+    'highest_difference_name': 'No camera data yet',
+    'highest_difference': '—',
+    'sales_variance': '—',
+}
+
+
+def short_number(value: float) -> str:
+    for divisor, suffix in ((1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+        if abs(value) >= divisor:
+            return f'{value / divisor:.1f}'.rstrip('0').rstrip('.') + suffix
+    return f'{value:.0f}'
+
+
+def insight_reports(campaign: Campaign) -> int:
+    # reports on file plus one per camera-day the report pipeline has seen
+    report = report_pipeline.latest(campaign.campaign_id)
+    return campaign.reports + (report.daily_reports if report is not None else 0)
+
+
+def report_kpis(report: Report) -> Dict[str, str]:
+    kpis = dict(NO_REPORT_KPIS, pr_value=short_number(report.pr_value))
+    if report.top_camera is not None:
+        camera = camera_index.cameras.get(report.top_camera)
+        kpis['highest_difference_name'] = camera.label if camera is not None else report.top_camera
+        kpis['highest_difference'] = short_number(report.top_camera_variance)
+    else:
+        kpis['highest_difference_name'] = 'Baseline after a week of counts'
+    if report.variance_7d is not None and report.baseline_7d:
+        percent = report.variance_7d / report.baseline_7d * 100
+        kpis['sales_variance'] = f'{short_number(report.variance_7d)} ({percent:.0f}%)'
+    return kpis
+
+
+def campaign_kpis(campaign_id: str) -> Dict[str, str]:
+    # reports are precomputed in the process pool; this is a lookup
+    report = report_pipeline.latest(campaign_id)
+    return report_kpis(report) if report is not None else dict(NO_REPORT_KPIS)
+
+
+kpi_hub = KPIHub(compute=campaign_kpis, interval=5.0)
+# a new report reaches open campaign pages without waiting for the next poll
+report_pipeline.add_listener(lambda report: kpi_hub.publish(report.campaign_id, report_kpis(report)))
 
 
 # ---------------- CAMPAIGN PERFORMANCE PAGE (final) ---------------- #
 @ui.page('/campaign/{campaign_id}')
+@track_page
 def campaign_performance_page(campaign_id: str):
     # build sidebar and set active
     sidebar = make_sidebar_for_page('Campaigns')
 
+
+    campaign = campaigns.get(campaign_id)
+    if campaign is None:
+        with ui.column().classes('ml-64 p-6 bg-white min-h-screen gap-6'):
+            ui.label('Campaign not found').classes('text-3xl font-bold')
+            ui.label(f'There is no campaign with id {campaign_id!r}.').classes('text-sm text-gray-600')
+        return
+
     page = ui.column().classes('ml-64 p-6 bg-white min-h-screen gap-6')
 
     # header row: back + title at left, camera toggles at right
@@ -322,25 +369,6 @@ def campaign_performance_page(campaign_id: str):
                 )
                 ui.label(f'Campaign — {campaign_id}').classes('text-xl font-semibold')
 
-            with ui.row().classes('items-center gap-2'):
-                btn_cam1 = ui.button('Camera 1')
-                btn_cam2 = ui.button('Camera 2')
-                # black with white text as requested
-                btn_cam1.classes('rounded-md px-3 py-1 bg-black text-white')
-                btn_cam2.classes('rounded-md px-3 py-1 bg-black text-white')
-
-    # top content row: left info 40% and right video 60% (top-aligned)
-    with page:
-        with ui.row().classes('w-full gap-4').style('align-items:flex-start;'):
-            left_card = PerformanceLeftCard(
-                image_src='https://images.pexels.com/photos/170811/pexels-photo-170811.jpeg',
-                date_text='Your sightline insights for October 1, 2025',
-                cameras=2,
-                reports=27,
-                location_text='The N1 western bypass between Rivonia Road and William Nicole Road'
-            )
-            left_card.build()
-
             camera_sources = {
                 1: {
                     'video': 'https://interactive-examples.mdn.mozilla.net/media/cc0-videos/flower.mp4',
@@ -351,6 +379,27 @@ def campaign_performance_page(campaign_id: str):
                     'poster': 'https://images.pexels.com/photos/340923/pexels-photo-340923.jpeg'
                 }
             }
+
+            camera_buttons = {}
+            with ui.row().classes('items-center gap-2'):
+                for cam_id in camera_sources:
+                    # black with white text as requested
+                    btn = ui.button(f'Camera {cam_id}').classes('rounded-md px-3 py-1 bg-black text-white')
+                    btn.on('click', lambda e, cam_id=cam_id: select_camera(cam_id))
+                    camera_buttons[cam_id] = btn
+
+    # top content row: left info 40% and right video 60% (top-aligned)
+    with page:
+        with ui.row().classes('w-full gap-4').style('align-items:flex-start;'):
+            left_card = PerformanceLeftCard(
+                image_src=campaign.image_src,
+                date_text='Your sightline insights for October 1, 2025',
+                cameras=campaign.cameras,
+                reports=insight_reports(campaign),
+                location_text=campaign.description
+            )
+            left_card.build()
+
             camera_card = CameraFeedCard(initial_camera=1, camera_sources=camera_sources)
             camera_card.build()
 
@@ -361,79 +410,109 @@ def campaign_performance_page(campaign_id: str):
                 # chart left (70%)
                 chart_card = ui.element('div').classes('rounded-lg bg-white p-4 shadow-sm').style('flex: 0 0 70%; max-width:70%;')
                 with chart_card:
-                    ui.label('Number of Cars Passing N1 Western Bypass').classes('text-sm font-semibold')
-                    ui.html('''
+                    ui.label(f'Number of Cars Passing {campaign.area}').classes('text-sm font-semibold')
+                    ui.html(f'''
                         <svg width="100%" height="180" viewBox="0 0 600 180" xmlns="http://www.w3.org/2000/svg">
                           <rect width="100%" height="100%" fill="#ffffff" rx="8"/>
-                          <polyline fill="none" stroke="#2563EB" stroke-width="2" points="20,120 80,90 140,100 200,80 260,95 320,110 380,100 440,105 500,95"/>
+                          <polyline fill="none" stroke="#2563EB" stroke-width="2" points="{chart_points(campaign)}"/>
                         </svg>
                     ''', sanitize=False)
 
                 # KPI column (30%)
                 with ui.column().classes('gap-4').style('flex: 0 0 30%; max-width:30%;'):
+                    kpi_labels = {}
                     with ui.card().classes('p-4 rounded-lg shadow-sm'):
-                        ui.label('235M').classes('text-2xl font-bold')
+                        kpi_labels['pr_value'] = ui.label('').classes('text-2xl font-bold')
                         ui.label('PR Value Generated').classes('text-sm text-gray-600')
                     with ui.card().classes('p-4 rounded-lg shadow-sm'):
                         ui.label('Highest Difference').classes('text-sm font-semibold')
-                        ui.label('MTN B Campaign').classes('text-sm text-gray-600')
-                        ui.label('-7.1M').classes('text-xl font-bold text-red-600')
+                        kpi_labels['highest_difference_name'] = ui.label('').classes('text-sm text-gray-600')
+                        kpi_labels['highest_difference'] = ui.label('').classes('text-xl font-bold text-red-600')
                     with ui.card().classes('p-4 rounded-lg shadow-sm'):
                         ui.label('Sales Volume Variance').classes('text-sm font-semibold')
-                        ui.label('-11M (-10%)').classes('text-sm text-red-600')
+                        kpi_labels['sales_variance'] = ui.label('').classes('text-sm text-red-600')
+
+    # live KPIs: one shared computation per campaign, only changed values are pushed
+    def apply_kpis(delta: dict):
+        for name, value in delta.items():
+            label = kpi_labels.get(name)
+            if label is not None:
+                label.set_text(value)
+
+    apply_kpis(campaign_kpis(campaign.campaign_id))
+    kpi_hub.subscribe(campaign.campaign_id, ui.context.client, apply_kpis)
 
     # camera toggle logic
     def select_camera(cam_id: int):
         camera_card.set_camera(cam_id)
         # show active marker on selected button (keep black bg, add blue ring)
-        if cam_id == 1:
-            btn_cam1.classes('rounded-md px-3 py-1 bg-black text-white ring-2 ring-blue-500')
-            btn_cam2.classes('rounded-md px-3 py-1 bg-black text-white ring-0')
-        else:
-            btn_cam1.classes('rounded-md px-3 py-1 bg-black text-white ring-0')
-            btn_cam2.classes('rounded-md px-3 py-1 bg-black text-white ring-2 ring-blue-500')
-
-    btn_cam1.on('click', lambda e: select_camera(1))
-    btn_cam2.on('click', lambda e: select_camera(2))
+        for other_id, btn in camera_buttons.items():
+            if other_id == cam_id:
+                btn.classes(replace='rounded-md px-3 py-1 bg-black text-white ring-2 ring-blue-500')
+            else:
+                btn.classes(replace='rounded-md px-3 py-1 bg-black text-white ring-0')
 
     select_camera(1)
 
 
-# ---------------- Placeholder pages ---------------- #
+# ---------------- AREAS PAGE ---------------- #
 @ui.page('/areas')
+@track_page
 def areas_page():
     sidebar = make_sidebar_for_page('Areas')
     container = ui.column().classes('ml-64 h-screen w-[calc(100%-16rem)] m-0 p-6 gap-6 bg-white overflow-auto')
     with container:
         ui.label('Areas').classes('text-3xl font-bold')
-        ui.label('Placeholder content for Areas.').classes('text-sm text-gray-600')
-
-
+        with ui.row().classes('w-full gap-6 flex-nowrap items-start'):
+            with ui.column().classes('flex-grow gap-1 min-w-0'):
+                area_map = AreaMap(camera_index)
+                area_map.build()
+            with ui.card().classes('w-72 shrink-0 gap-1'):
+                ui.label('Nearest camera').classes('text-sm font-semibold')
+                nearest_label = ui.label('Click the map to find the closest camera.').classes('text-sm text-gray-600')
+                nearest_road = ui.label('').classes('text-xs text-gray-500')
+                nearest_link = ui.link('Open campaign', '#').classes('text-sm')
+                nearest_link.set_visibility(False)
+
+        def show_nearest(distance: float, camera):
+            nearest_label.set_text(f'{camera.label} ({distance:,.0f} m away)')
+            nearest_road.set_text(camera.road)
+            nearest_link.props(f'href=/campaign/{camera.campaign_id}')
+            nearest_link.set_visibility(True)
+
+        area_map.on_select = show_nearest
+
+
+# ---------------- SCHEDULES PAGE ---------------- #
 @ui.page('/schedules')
+@track_page
 def schedules_page():
     sidebar = make_sidebar_for_page('Campaign Schedules')
     container = ui.column().classes('ml-64 h-screen w-[calc(100%-16rem)] m-0 p-6 gap-6 bg-white overflow-auto')
     with container:
         ui.label('Campaign Schedules').classes('text-3xl font-bold')
-        ui.label('Placeholder content for Campaign Schedules.').classes('text-sm text-gray-600')
+        ScheduleCalendar(schedule_store).build()
 
 
+# ---------------- SEARCH PAGE ---------------- #
 @ui.page('/search')
+@track_page
 def search_page():
     sidebar = make_sidebar_for_page('Search')
     container = ui.column().classes('ml-64 h-screen w-[calc(100%-16rem)] m-0 p-6 gap-6 bg-white overflow-auto')
+    # index (or catch up with) the campaigns before the first keystroke
+    campaign_search.sync_in_background()
     with container:
         ui.label('Search').classes('text-3xl font-bold')
-        ui.label('Placeholder search page.').classes('text-sm text-gray-600')
-
-
-# ---------------- Root redirect ---------------- #
-@ui.page('/')
-def index_page():
-    ui.run_javascript("navigate.to('/dashboard')")
+        SearchBox(search=lambda query, k, kinds: campaign_search.search(query, k=k, kinds=kinds)).build()
 
 
 # ---------------- Run ---------------- #
 if __name__ == '__main__':
-    ui.run(port=8001)
+    # standalone only: under main.py '/' is the login page, and this module may
+    # be imported lazily after it, which would otherwise replace that route
+    @ui.page('/')
+    def index_page():
+        ui.run_javascript("navigate.to('/dashboard')")
 
+    ui.run(port=8001)
@@ -0,0 +1,53 @@
+import gc
+import os
+import resource
+from collections import Counter
+from nicegui import Client, app
+
+# Off by default: the endpoint lists every connected client.
+DEBUG_FOOTPRINT = os.getenv('DEBUG_FOOTPRINT', 'false').lower() in ('1', 'true', 'yes')
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size of this process (peak RSS where /proc is unavailable).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def footprint() -> dict:
+    clients = list(Client.instances.values())
+    per_page = Counter()
+    elements_per_page = Counter()
+    for client in clients:
+        path = client.page.path if client.page else '?'
+        per_page[path] += 1
+        elements_per_page[path] += len(client.elements)
+    return {
+        'rss_bytes': rss_bytes(),
+        'gc_objects': len(gc.get_objects()),
+        'clients': len(clients),
+        'elements': sum(elements_per_page.values()),
+        'pages': {
+            path: {'clients': count, 'elements_per_client': elements_per_page[path] / count}
+            for path, count in per_page.items()
+        },
+    }
+
+
+# ---------------- FOOTPRINT ENDPOINT ---------------- #
+if DEBUG_FOOTPRINT:
+    @app.get('/_debug/footprint')
+    def debug_footprint(collect: bool = False):
+        """
+        Process RSS plus client and element counts, used by
+        benchmarks/bench_client_footprint.py to enforce a per-client budget.
+        """
+        if collect:
+            gc.collect()
+        return footprint()
@@ -0,0 +1,78 @@
+import hmac
+import json
+import os
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from nicegui import app, run
+from campaign_repository import campaigns
+from ingestion import count_ingester
+
+INGEST_TOKEN = os.getenv('INGEST_TOKEN')
+MAX_EVENTS_PER_REQUEST = int(os.getenv('INGEST_MAX_EVENTS', 100_000))
+# only cameras of known campaigns are accepted unless this is set
+INGEST_UNKNOWN_CAMERAS = os.getenv('INGEST_UNKNOWN_CAMERAS', 'false').lower() in ('1', 'true', 'yes')
+
+# counts flushed before the last restart are replayed on startup (see main.py)
+app.on_shutdown(count_ingester.stop)
+
+
+class IngestError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _ingest(body: bytes) -> int:
+    """
+    Parse, check and buffer a whole request (in a worker thread): either
+    every batch is accepted or none is.
+    """
+    try:
+        batches = json.loads(body)['batches']
+        if not isinstance(batches, list):
+            raise TypeError('batches must be a list')
+        parsed = [(b.get('camera_id'), b['timestamps'], b.get('counts')) for b in batches]
+        if not all(isinstance(camera_id, str) for camera_id, _, _ in parsed):
+            raise TypeError('camera_id must be a string')
+        total = sum(len(timestamps) for _, timestamps, _ in parsed)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise IngestError(f'malformed batch: {e}')
+    if total > MAX_EVENTS_PER_REQUEST:
+        raise IngestError(f'at most {MAX_EVENTS_PER_REQUEST} events per request', status_code=413)
+    if not INGEST_UNKNOWN_CAMERAS:
+        known = campaigns.snapshot().camera_ids
+        unknown = sorted({camera_id for camera_id, _, _ in parsed if camera_id not in known})
+        if unknown:
+            raise IngestError(f'unknown camera_id: {", ".join(unknown[:10])}', status_code=422)
+    try:
+        return count_ingester.ingest_many(parsed)
+    except ValueError as e:
+        raise IngestError(f'malformed batch: {e}')
+
+
+# ---------------- CAR-COUNT INGESTION ---------------- #
+@app.post('/api/ingest')
+async def ingest(request: Request):
+    """
+    Batched car counts from cameras:
+        {"batches": [{"camera_id": "m1-corridor-cam1", "timestamps": [...], "counts": [...]}, ...]}
+    Timestamps are unix seconds. With INGEST_TOKEN set the request must
+    carry "Authorization: Bearer <token>". A request is accepted whole or
+    not at all, so a rejected one can be fixed and resent.
+    """
+    if INGEST_TOKEN is not None:
+        supplied = request.headers.get('authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), INGEST_TOKEN.encode()):
+            return JSONResponse({'error': 'unauthorized'}, status_code=401)
+    body = await request.body()
+    try:
+        # parsing and buffering (which waits for a flush when a ring is full) stay off the event loop
+        accepted = await run.io_bound(_ingest, body)
+    except IngestError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+    return {'accepted': accepted}
+
+
+@app.get('/api/ingest/stats')
+def ingest_stats():
+    return count_ingester.stats()
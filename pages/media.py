@@ -0,0 +1,51 @@
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from nicegui import app
+from media_cache import MediaError, media_cache
+
+
+# ---------------- MEDIA PROXY ---------------- #
+@app.get('/media')
+def media(request: Request, src: str, w: Optional[int] = None):
+    """
+    Serve a cached copy of src (resized to width w for images).
+    FileResponse answers Range requests and sends the file zero-copy when the
+    server supports it; conditional requests are answered with 304 here.
+    """
+    for attempt in range(2):
+        try:
+            path, meta = media_cache.thumbnail(src, w) if w else media_cache.get(src)
+            st = os.stat(path)
+            break
+        except MediaError as e:
+            return Response(str(e), status_code=e.status_code)
+        except FileNotFoundError:
+            # evicted between lookup and use; fetch it again once
+            media_cache.forget(src)
+            if attempt:
+                return Response('media unavailable', status_code=503)
+
+    etag = f'"{os.path.basename(path)[:16]}-{st.st_size}"'
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': last_modified,
+        'Cache-Control': 'public, max-age=86400',
+    }
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if etag in (t.strip() for t in if_none_match.split(',')) or if_none_match.strip() == '*':
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get('if-modified-since'):
+        try:
+            since = parsedate_to_datetime(request.headers['if-modified-since']).timestamp()
+        except (TypeError, ValueError):
+            since = None
+        if since is not None and int(st.st_mtime) <= since:
+            return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, media_type=meta.get('content_type'), headers=headers, stat_result=st)
@@ -0,0 +1,25 @@
+from fastapi.responses import Response
+from nicegui import Client, app
+from metrics import REGISTRY, Gauge
+from profiling import profiler
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+connected_clients = Gauge('nicegui_connected_clients', 'Browser tabs with an open websocket')
+Gauge('nicegui_clients', 'Page clients held in memory (connected or not yet pruned)').set_function(
+    lambda: len(Client.instances))
+
+app.on_connect(lambda: connected_clients.inc())
+app.on_disconnect(lambda: connected_clients.dec())
+
+
+# ---------------- PROMETHEUS ENDPOINT ---------------- #
+@app.get('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+# ---------------- PAGE PROFILER ---------------- #
+if profiler is not None:
+    # uvicorn may exit without running atexit handlers; write the profiles on shutdown too
+    app.on_shutdown(profiler.flush)
@@ -0,0 +1,259 @@
+"""
+Opt-in per-route profiling of NiceGUI page handlers.
+
+With PROFILE_PAGES=true every handler wrapped by metrics.track_page is also
+profiled: a background thread samples the rendering thread's stack every
+PROFILE_INTERVAL_MS (default 1) while the handler runs, and each render's
+wall time, number of elements created and serialized element payload (the
+JSON the browser receives to build the page) are recorded.
+
+PROFILE_DIR (default profiles/) receives:
+- <page>.folded — collapsed stacks ("a;b;c count"), usable with
+  flamegraph.pl or speedscope
+- summary.txt / summary.json — per-page totals and the slowest renders
+
+Files are rewritten at most every PROFILE_FLUSH_SECONDS (default 5) and at
+exit. When PROFILE_PAGES is off nothing is wrapped, so there is no cost.
+"""
+
+import atexit
+import functools
+import heapq
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+PROFILE_PAGES = os.getenv('PROFILE_PAGES', 'false').lower() in ('1', 'true', 'yes')
+
+
+class Render:
+    __slots__ = ('page', 'thread_id', 'started', 'wall', 'elements', 'payload_bytes', 'samples', 'args', 'stop_code')
+
+    def __init__(self, page: str, thread_id: int, args: str, stop_code):
+        self.page = page
+        self.thread_id = thread_id
+        self.args = args
+        self.stop_code = stop_code
+        self.started = time.perf_counter()
+        self.wall = 0.0
+        self.elements = 0
+        self.payload_bytes = 0
+        self.samples = 0
+
+    def as_dict(self) -> dict:
+        return {
+            'page': self.page,
+            'args': self.args,
+            'wall_ms': round(self.wall * 1000, 3),
+            'elements': self.elements,
+            'payload_bytes': self.payload_bytes,
+            'samples': self.samples,
+        }
+
+
+class PageStats:
+    def __init__(self):
+        self.renders = 0
+        self.wall = 0.0
+        self.max_wall = 0.0
+        self.elements = 0
+        self.payload_bytes = 0
+        self.stacks = Counter()
+
+
+class PageProfiler:
+    def __init__(self, out_dir: str, interval: float = 0.001, flush_seconds: float = 5.0, keep_slowest: int = 20):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.flush_seconds = flush_seconds
+        self.keep_slowest = keep_slowest
+
+        self.pages: Dict[str, PageStats] = {}
+        self._slowest: List[tuple] = []  # min-heap of (wall, seq, render dict)
+        self._seq = 0
+        self._active: Dict[int, List[Render]] = {}  # thread id -> renders in progress (innermost last)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._sampler = None
+        self._flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    # ---------------- sampling ---------------- #
+    def start(self) -> 'PageProfiler':
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample_loop, name='page-profiler', daemon=True)
+            self._sampler.start()
+        return self
+
+    def _sample_loop(self):
+        while True:
+            if not self._active:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, renders in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None or not renders:
+                        continue
+                    render = renders[-1]
+                    render.samples += 1
+                    self.pages[render.page].stacks[self._fold(frame, render.stop_code)] += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _fold(frame, stop_code) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            if code is stop_code:
+                break
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    # ---------------- renders ---------------- #
+    def begin(self, page: str, args: str, stop_code) -> Render:
+        render = Render(page, threading.get_ident(), args, stop_code)
+        with self._lock:
+            self.pages.setdefault(page, PageStats())
+            self._active.setdefault(render.thread_id, []).append(render)
+        self._wakeup.set()
+        return render
+
+    def end(self, render: Render, client=None):
+        render.wall = time.perf_counter() - render.started
+        if client is not None:
+            render.elements, render.payload_bytes = _client_size(client)
+        with self._lock:
+            renders = self._active.get(render.thread_id, [])
+            if render in renders:
+                renders.remove(render)
+            if not renders:
+                self._active.pop(render.thread_id, None)
+            stats = self.pages[render.page]
+            stats.renders += 1
+            stats.wall += render.wall
+            stats.max_wall = max(stats.max_wall, render.wall)
+            stats.elements += render.elements
+            stats.payload_bytes += render.payload_bytes
+            self._seq += 1
+            entry = (render.wall, self._seq, render.as_dict())
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heappushpop(self._slowest, entry)
+        if time.monotonic() - self._flushed_at >= self.flush_seconds:
+            self.flush()
+
+    # ---------------- output ---------------- #
+    def summary(self) -> dict:
+        with self._lock:
+            pages = {
+                page: {
+                    'renders': s.renders,
+                    'mean_ms': round(s.wall / s.renders * 1000, 3) if s.renders else 0.0,
+                    'max_ms': round(s.max_wall * 1000, 3),
+                    'mean_elements': round(s.elements / s.renders, 1) if s.renders else 0.0,
+                    'mean_payload_bytes': round(s.payload_bytes / s.renders) if s.renders else 0,
+                    'samples': sum(s.stacks.values()),
+                }
+                for page, s in self.pages.items()
+            }
+            slowest = [entry[2] for entry in sorted(self._slowest, reverse=True)]
+        return {'interval_ms': self.interval * 1000, 'pages': pages, 'slowest': slowest}
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        if not self.pages:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        with self._lock:
+            stacks = {page: dict(s.stacks) for page, s in self.pages.items()}
+        for page, folded in stacks.items():
+            with open(os.path.join(self.out_dir, f'{page}.folded'), 'w', encoding='utf-8') as f:
+                for stack, count in sorted(folded.items()):
+                    f.write(f'{stack} {count}\n')
+
+        summary = self.summary()
+        with open(os.path.join(self.out_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        lines = [f'{"page":<32} {"renders":>8} {"mean ms":>9} {"max ms":>9} {"elements":>9} {"payload B":>10}']
+        for page, s in sorted(summary['pages'].items(), key=lambda item: -item[1]['mean_ms']):
+            lines.append(f'{page:<32} {s["renders"]:>8} {s["mean_ms"]:>9.1f} {s["max_ms"]:>9.1f} '
+                         f'{s["mean_elements"]:>9.1f} {s["mean_payload_bytes"]:>10}')
+        lines.append('')
+        lines.append('slowest renders:')
+        for r in summary['slowest']:
+            lines.append(f'  {r["wall_ms"]:>9.1f} ms  {r["page"]}{r["args"]}  '
+                         f'{r["elements"]} elements, {r["payload_bytes"]} B, {r["samples"]} samples')
+        with open(os.path.join(self.out_dir, 'summary.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+def _client_size(client) -> tuple:
+    from nicegui import json as nicegui_json
+    elements = client.elements
+    payload = nicegui_json.dumps({
+        id: element._to_dict() for id, element in elements.items()  # same serialization as the page response
+    })
+    return len(elements), len(payload.encode())
+
+
+def _current_client():
+    try:
+        from nicegui import context
+        return context.client
+    except Exception:
+        return None
+
+
+def _format_args(args, kwargs) -> str:
+    # path parameters only; request/client objects are left out
+    shown = [repr(a) for a in args if isinstance(a, (str, int, float))]
+    shown += [f'{k}={v!r}' for k, v in kwargs.items() if isinstance(v, (str, int, float))]
+    return f'({", ".join(shown)})'
+
+
+profiler: Optional[PageProfiler] = None
+if PROFILE_PAGES:
+    profiler = PageProfiler(
+        out_dir=os.getenv('PROFILE_DIR', 'profiles'),
+        interval=float(os.getenv('PROFILE_INTERVAL_MS', 1)) / 1000,
+        flush_seconds=float(os.getenv('PROFILE_FLUSH_SECONDS', 5)),
+    ).start()
+
+
+def profile_page(func, name: Optional[str] = None):
+    """
+    Wrap a page handler with the profiler; returns func unchanged when
+    PROFILE_PAGES is off.
+    """
+    if profiler is None:
+        return func
+    name = name or func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            render = profiler.begin(name, _format_args(args, kwargs), async_wrapper.__code__)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                profiler.end(render, _current_client())
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        render = profiler.begin(name, _format_args(args, kwargs), wrapper.__code__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.end(render, _current_client())
+    return wrapper
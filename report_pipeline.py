@@ -0,0 +1,386 @@
+"""
+Insight reports per campaign, computed in a process pool.
+
+Every REPORT_INTERVAL_SECONDS the pipeline looks at the hourly car counts
+of each campaign's cameras and sends the campaigns whose counts changed to
+a ProcessPoolExecutor, so report computation never runs on the event loop
+(or competes for the server process's GIL). The workers start from
+report_worker.py (forkserver by default, REPORT_START_METHOD), not from
+main.py. main.py starts the pipeline once car counts have been recovered.
+Runs are incremental:
+- each camera's watermark is the latest hour already reported; only the
+  hours from LATE_HOURS before it onwards are shipped to the worker, so
+  late counts for the last few hours are still picked up;
+- the worker also gets the camera's CameraState from the previous run: the
+  trailing RECENT_HOURS of hourly counts (which the shipped hours replace)
+  and per hour-of-week baseline sums, into which older hours are folded
+  exactly once.
+So a run costs the new data plus a week of hours per camera, whatever the
+campaign's history.
+
+Reports are cached under (campaign id, REPORT_SCHEMA). Bump REPORT_SCHEMA
+when the computation changes, and reports of the old shape are neither
+served from memory nor loaded from REPORT_CACHE_DIR, where the latest
+report of each campaign is written together with its CameraStates. Every
+process runs its own pipeline (over the same counts, see ingestion.py) and
+caches into its own subdirectory (WORKER_INDEX under launcher.py): pages
+have numbers straight after a restart, and the first run after it only
+ships the hours since the cached watermark. Report.version counts the runs
+of a campaign.
+
+Pages only ever call latest(), a dict lookup.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from campaign_repository import Campaign, CampaignRepository, campaigns
+from report_worker import worker_context
+from timeseries import HOUR, DAY, TimeSeriesStore, car_counts
+
+REPORT_SCHEMA = 2
+WEEK_HOURS = 7 * 24
+RECENT_HOURS = 8 * 24  # trailing hours kept per camera: the report week plus slack
+LATE_HOURS = 2
+# the unix epoch is a Thursday; hour of week counts from Monday 00:00
+_EPOCH_HOUR_OF_WEEK = 3 * 24
+# media value of one car passing a campaign site
+PR_VALUE_PER_CAR = float(os.getenv('REPORT_PR_VALUE_PER_CAR', 4.5))
+
+
+class CameraState(NamedTuple):
+    hours: np.ndarray  # trailing hourly buckets (unix seconds), sorted
+    counts: np.ndarray
+    baseline_sum: np.ndarray  # cars per hour of week, over folded hours
+    baseline_hours: np.ndarray  # folded hours per hour of week
+    folded_total: int
+    folded_days: int  # distinct days among the folded hours
+    last_folded_day: int
+
+
+def empty_state() -> CameraState:
+    return CameraState(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                       np.zeros(WEEK_HOURS), np.zeros(WEEK_HOURS, dtype=np.int64), 0, 0, -1)
+
+
+class Report(NamedTuple):
+    campaign_id: str
+    version: int
+    generated_at: float
+    watermark: int  # latest hour included
+    volume_total: int
+    volume_7d: int
+    baseline_7d: Optional[float]  # expected cars over the hours of the last week that have a baseline
+    variance_7d: Optional[float]  # actual minus expected over those hours
+    pr_value: float
+    daily_reports: int  # camera-days with counts
+    top_camera: Optional[str]  # camera furthest from its baseline
+    top_camera_variance: Optional[float]
+
+
+class ReportJob(NamedTuple):
+    campaign_id: str
+    version: int
+    states: Dict[str, CameraState]
+    new: Dict[str, Tuple[int, np.ndarray, np.ndarray]]  # camera -> (since, hours, counts)
+
+
+# ---------------- Computation (runs in the pool) ---------------- #
+def _hour_of_week(hours: np.ndarray) -> np.ndarray:
+    return (hours // HOUR + _EPOCH_HOUR_OF_WEEK) % WEEK_HOURS
+
+
+def update_camera(state: CameraState, since: int, hours: np.ndarray, counts: np.ndarray) -> CameraState:
+    """
+    Replace the trailing hours from `since` on with (hours, counts) and fold
+    hours older than RECENT_HOURS before the latest one into the baseline.
+    """
+    keep = np.searchsorted(state.hours, since, side='left')
+    hours = np.concatenate([state.hours[:keep], hours])
+    counts = np.concatenate([state.counts[:keep], counts])
+    if len(hours) == 0:
+        return state
+    fold = np.searchsorted(hours, hours[-1] - RECENT_HOURS * HOUR, side='left')
+    if fold == 0:
+        return state._replace(hours=hours, counts=counts)
+
+    folded_hours, folded_counts = hours[:fold], counts[:fold]
+    slots = _hour_of_week(folded_hours)
+    days = np.unique(folded_hours // DAY)
+    new_days = days[days > state.last_folded_day]
+    return CameraState(
+        hours=hours[fold:],
+        counts=counts[fold:],
+        baseline_sum=state.baseline_sum + np.bincount(slots, weights=folded_counts, minlength=WEEK_HOURS),
+        baseline_hours=state.baseline_hours + np.bincount(slots, minlength=WEEK_HOURS),
+        folded_total=state.folded_total + int(folded_counts.sum()),
+        folded_days=state.folded_days + len(new_days),
+        last_folded_day=max(state.last_folded_day, int(days[-1])),
+    )
+
+
+def _camera_week(state: CameraState, watermark: int) -> Tuple[int, Optional[float], Optional[float]]:
+    """
+    (cars in the week up to watermark, expected cars, actual minus expected),
+    the last two over the hours that have a baseline.
+    """
+    start = np.searchsorted(state.hours, watermark - WEEK_HOURS * HOUR, side='right')
+    hours, counts = state.hours[start:], state.counts[start:]
+    slots = _hour_of_week(hours)
+    known = state.baseline_hours[slots] > 0
+    if not known.any():
+        return int(counts.sum()), None, None
+    expected = float((state.baseline_sum[slots][known] / state.baseline_hours[slots][known]).sum())
+    return int(counts.sum()), expected, float(counts[known].sum()) - expected
+
+
+def _camera_days(state: CameraState) -> int:
+    days = np.unique(state.hours // DAY)
+    overlap = 1 if len(days) and days[0] == state.last_folded_day else 0
+    return state.folded_days + len(days) - overlap
+
+
+def compute_report(job: ReportJob) -> Tuple[Dict[str, CameraState], Report]:
+    states = {}
+    for camera_id, (since, hours, counts) in job.new.items():
+        states[camera_id] = update_camera(job.states.get(camera_id) or empty_state(), since, hours, counts)
+
+    watermark = max((int(s.hours[-1]) for s in states.values() if len(s.hours)), default=0)
+    volume_total = volume_7d = daily_reports = 0
+    baseline_7d = variance_7d = None
+    top_camera, top_variance = None, None
+    for camera_id, state in states.items():
+        volume, expected, variance = _camera_week(state, watermark)
+        volume_total += state.folded_total + int(state.counts.sum())
+        volume_7d += volume
+        daily_reports += _camera_days(state)
+        if expected is not None:
+            baseline_7d = (baseline_7d or 0.0) + expected
+            variance_7d = (variance_7d or 0.0) + variance
+            if top_variance is None or abs(variance) > abs(top_variance):
+                top_camera, top_variance = camera_id, variance
+
+    return states, Report(
+        campaign_id=job.campaign_id,
+        version=job.version,
+        generated_at=time.time(),
+        watermark=watermark,
+        volume_total=volume_total,
+        volume_7d=volume_7d,
+        baseline_7d=baseline_7d,
+        variance_7d=variance_7d,
+        pr_value=volume_total * PR_VALUE_PER_CAR,
+        daily_reports=daily_reports,
+        top_camera=top_camera,
+        top_camera_variance=top_variance,
+    )
+
+
+def compute_reports(jobs: List[ReportJob]) -> List[Tuple[Dict[str, CameraState], Report]]:
+    return [compute_report(job) for job in jobs]
+
+
+# ---------------- ReportPipeline ---------------- #
+class ReportPipeline:
+    def __init__(self,
+                 repository: CampaignRepository,
+                 store: TimeSeriesStore,
+                 workers: int = 2,
+                 interval: float = 30.0,
+                 cache_dir: Optional[str] = None,
+                 start_method: str = 'forkserver'):
+        self.repository = repository
+        self.store = store
+        self.workers = workers
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self.start_method = start_method
+        self.runs = 0
+        self._reports: Dict[Tuple[str, int], Report] = {}  # (campaign id, REPORT_SCHEMA) -> latest report
+        self._states: Dict[str, Dict[str, CameraState]] = {}  # campaign id -> camera id -> state
+        self._fingerprints: Dict[str, tuple] = {}
+        self._listeners: List[Callable[[Report], None]] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._task = None
+        if cache_dir:
+            self._load()
+
+    def latest(self, campaign_id: str) -> Optional[Report]:
+        return self._reports.get((campaign_id, REPORT_SCHEMA))
+
+    def add_listener(self, callback: Callable[[Report], None]):
+        """
+        callback(report) runs on the event loop for every new report.
+        """
+        self._listeners.append(callback)
+
+    # ---------------- scheduling ---------------- #
+    def start(self):
+        if self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'Report run failed: {e}')
+            await asyncio.sleep(self.interval)
+
+    def _new_data(self, campaign: Campaign) -> Dict[str, Tuple[int, np.ndarray, np.ndarray]]:
+        states = self._states.get(campaign.campaign_id, {})
+        new = {}
+        for camera_id in campaign.camera_ids:
+            state = states.get(camera_id)
+            since = int(state.hours[-1]) - LATE_HOURS * HOUR if state is not None and len(state.hours) else 0
+            hours, counts = self.store.range(camera_id, HOUR, since)
+            if len(hours) or state is not None:
+                new[camera_id] = (since, hours, counts)
+        return new
+
+    @staticmethod
+    def _fingerprint(new: Dict[str, Tuple[int, np.ndarray, np.ndarray]]) -> tuple:
+        return tuple((camera_id, since, len(hours), int(counts.sum())) for camera_id, (since, hours, counts) in new.items())
+
+    def _job(self, campaign: Campaign) -> Optional[ReportJob]:
+        new = self._new_data(campaign)
+        if not new or self._fingerprints.get(campaign.campaign_id) == self._fingerprint(new):
+            return None
+        previous = self.latest(campaign.campaign_id)
+        return ReportJob(campaign_id=campaign.campaign_id,
+                         version=previous.version + 1 if previous is not None else 1,
+                         states=self._states.get(campaign.campaign_id, {}),
+                         new=new)
+
+    async def run_once(self) -> int:
+        """
+        Report every campaign whose counts changed; returns reports made.
+        """
+        jobs = [job for job in map(self._job, self.repository.list()) if job is not None]
+        if not jobs:
+            return 0
+        if self._executor is None:
+            self._executor = await asyncio.to_thread(self._start_pool)
+        # a few chunks per worker: fewer round trips than one task per campaign, still balanced
+        size = -(-len(jobs) // (self.workers * 4))
+        chunks = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(loop.run_in_executor(self._executor, compute_reports, chunk) for chunk in chunks),
+                                       return_exceptions=True)
+        reports = []
+        for chunk, chunk_results in zip(chunks, results):
+            if isinstance(chunk_results, BaseException):
+                print(f'Reports for {", ".join(job.campaign_id for job in chunk)} failed: {chunk_results!r}')
+                if isinstance(chunk_results, BrokenProcessPool):
+                    self._executor = None  # a worker died; start a new pool next run
+                continue
+            for job, (states, report) in zip(chunk, chunk_results):
+                self._store(job, states, report)
+                reports.append(report)
+        self.runs += 1
+        if self.cache_dir and reports:
+            await asyncio.to_thread(self._save, [(report, self._states[report.campaign_id]) for report in reports])
+        return len(reports)
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=worker_context(self.start_method))
+        # spawn/forkserver workers start on submit; start them all here rather than on the event loop
+        for future in [executor.submit(int) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _store(self, job: ReportJob, states: Dict[str, CameraState], report: Report):
+        self._states[job.campaign_id] = states
+        self._reports[(job.campaign_id, REPORT_SCHEMA)] = report
+        # what the next run will see if nothing new arrives
+        campaign = self.repository.get(job.campaign_id)
+        if campaign is not None:
+            self._fingerprints[job.campaign_id] = self._fingerprint(self._new_data(campaign))
+        for listener in self._listeners:
+            try:
+                listener(report)
+            except Exception as e:
+                print(f'Report listener failed for {job.campaign_id}: {e}')
+
+    # ---------------- persisted cache ---------------- #
+    def _path(self, campaign_id: str) -> str:
+        return os.path.join(self.cache_dir, f'{quote(campaign_id, safe="")}.v{REPORT_SCHEMA}.json')
+
+    def _save(self, reports: List[Tuple[Report, Dict[str, CameraState]]]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for report, states in reports:
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'report': report._asdict(),
+                               'states': {camera_id: _state_to_json(state) for camera_id, state in states.items()}}, f)
+                os.replace(tmp, self._path(report.campaign_id))
+            except Exception:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+
+    def _load(self):
+        for path in glob.glob(os.path.join(self.cache_dir, f'*.v{REPORT_SCHEMA}.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    cached = json.load(f)
+                report = Report(**cached['report'])
+                states = {camera_id: _state_from_json(state) for camera_id, state in cached['states'].items()}
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                print(f'Ignoring cached report {path}: {e}')
+                continue
+            self._reports[(report.campaign_id, REPORT_SCHEMA)] = report
+            self._states[report.campaign_id] = states
+
+
+def _state_to_json(state: CameraState) -> dict:
+    return {field: value.tolist() if isinstance(value, np.ndarray) else value
+            for field, value in state._asdict().items()}
+
+
+def _state_from_json(data: dict) -> CameraState:
+    return CameraState(
+        hours=np.asarray(data['hours'], dtype=np.int64),
+        counts=np.asarray(data['counts'], dtype=np.int64),
+        baseline_sum=np.asarray(data['baseline_sum'], dtype=np.float64),
+        baseline_hours=np.asarray(data['baseline_hours'], dtype=np.int64),
+        folded_total=int(data['folded_total']),
+        folded_days=int(data['folded_days']),
+        last_folded_day=int(data['last_folded_day']),
+    )
+
+
+# shared by every campaign page client; started and stopped with the app (see main.py)
+report_pipeline = ReportPipeline(
+    repository=campaigns,
+    store=car_counts,
+    workers=int(os.getenv('REPORT_WORKERS', 2)),
+    interval=float(os.getenv('REPORT_INTERVAL_SECONDS', 30)),
+    cache_dir=os.path.join(os.getenv('REPORT_CACHE_DIR', 'reports'), os.getenv('WORKER_INDEX', '0')),
+    start_method=os.getenv('REPORT_START_METHOD', 'forkserver'),
+)
@@ -0,0 +1,66 @@
+"""
+Entry module of the report pool workers (see report_pipeline.py).
+
+A spawn or forkserver child re-runs its parent's __main__ before it
+unpickles any work; for the server that is main.py, which builds the whole
+app. worker_context() starts the children with this module as their main
+instead, so a worker only imports what compute_reports needs (numpy,
+timeseries, campaign_repository). With forkserver those are imported once,
+by the fork server, and every worker forks from it ready to go.
+"""
+
+import multiprocessing
+import sys
+import threading
+from multiprocessing.context import ForkServerContext, ForkServerProcess, SpawnContext, SpawnProcess
+
+# modules the fork server imports before forking workers
+PRELOAD = ['report_pipeline']
+
+_main_lock = threading.Lock()
+
+
+def _launch(popen, process_obj):
+    # the child is told which main to run when it is launched, from sys.modules['__main__']
+    with _main_lock:
+        main = sys.modules['__main__']
+        sys.modules['__main__'] = sys.modules[__name__]
+        try:
+            return popen(process_obj)
+        finally:
+            sys.modules['__main__'] = main
+
+
+class SpawnWorker(SpawnProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        return _launch(SpawnProcess._Popen, process_obj)
+
+
+class ForkServerWorker(ForkServerProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        return _launch(ForkServerProcess._Popen, process_obj)
+
+
+class SpawnWorkerContext(SpawnContext):
+    Process = SpawnWorker
+
+
+class ForkServerWorkerContext(ForkServerContext):
+    Process = ForkServerWorker
+
+
+def worker_context(method: str = 'forkserver'):
+    """
+    multiprocessing context for a ProcessPoolExecutor whose children start
+    from this module rather than the parent's __main__. 'fork' children copy
+    the parent instead and get the plain context.
+    """
+    if method == 'spawn':
+        return SpawnWorkerContext()
+    if method == 'forkserver':
+        context = ForkServerWorkerContext()
+        context.set_forkserver_preload(PRELOAD)
+        return context
+    return multiprocessing.get_context(method)
@@ -0,0 +1,227 @@
+"""
+Campaign schedules: which campaign has which camera (or billboard) when.
+
+Slots are kept in one IntervalTree per resource, so checking a new slot for
+conflicts, or drawing a week of the calendar, queries only the resources
+involved and only the slots overlapping that time window. Times are
+wall-clock seconds since the epoch (naive times in the CSV are read as
+UTC and shown as UTC, so no timezone shifts happen on the way).
+
+The store is loaded from SCHEDULES_PATH (default data/schedules.csv) with a
+bulk import; slots added or removed from the /schedules page live in memory
+until the next import.
+"""
+
+import calendar
+import csv
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from interval_tree import IntervalTree
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class Slot(NamedTuple):
+    slot_id: str
+    resource: str  # camera or billboard id
+    area: str
+    campaign_id: str
+    start: int
+    end: int
+    label: str = ''
+
+
+class ScheduleConflict(Exception):
+    def __init__(self, slot: Slot, conflicts: List[Slot]):
+        self.slot = slot
+        self.conflicts = conflicts
+        ids = ', '.join(c.slot_id for c in conflicts)
+        super().__init__(f'{slot.slot_id} overlaps {ids} on {slot.resource}')
+
+
+def to_seconds(value: datetime) -> int:
+    return calendar.timegm(value.timetuple())
+
+
+def from_seconds(seconds: int) -> datetime:
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+# ---------------- ScheduleStore ---------------- #
+class ScheduleStore:
+    def __init__(self):
+        self.slots: Dict[str, Slot] = {}
+        self._trees: Dict[str, IntervalTree] = {}  # resource -> slots
+        self._areas: Dict[str, Dict[str, int]] = {}  # area -> resource -> its slots in that area
+        self._added: Dict[str, Dict[str, Slot]] = {}  # resource -> slot id -> slot, in insertion order
+        self._owners: Dict[str, Tuple[str, str]] = {}  # resource -> (area, campaign id) of its latest slot
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    # ---------------- updates ---------------- #
+    def bulk_import(self, slots: Iterable[Slot]) -> List[Tuple[Slot, Slot]]:
+        """
+        Replace every slot; each resource's tree is built in one pass.
+        Conflicting slots are kept (they are already booked) and returned
+        as pairs so the import can report them.
+        """
+        by_resource: Dict[str, List[Slot]] = {}
+        imported: Dict[str, Slot] = {}
+        for slot in slots:
+            if slot.slot_id in imported:
+                raise ValueError(f'duplicate slot id {slot.slot_id!r}')
+            imported[slot.slot_id] = slot
+            by_resource.setdefault(slot.resource, []).append(slot)
+
+        trees, areas, added, owners, conflicts = {}, {}, {}, {}, []
+        for resource, resource_slots in by_resource.items():
+            tree = IntervalTree((s.start, s.end, s.slot_id, s) for s in resource_slots)
+            trees[resource] = tree
+            conflicts.extend((a.value, b.value) for a, b in tree.overlapping_pairs())
+            for s in resource_slots:
+                in_area = areas.setdefault(s.area, {})
+                in_area[resource] = in_area.get(resource, 0) + 1
+            added[resource] = {s.slot_id: s for s in resource_slots}
+            owners[resource] = (resource_slots[-1].area, resource_slots[-1].campaign_id)
+
+        with self._lock:
+            self.slots, self._trees, self._areas = imported, trees, areas
+            self._added, self._owners = added, owners
+        return conflicts
+
+    def add(self, slot: Slot, allow_conflicts: bool = False):
+        """
+        Insert a slot; raises ScheduleConflict if it overlaps another slot of
+        the same resource, unless allow_conflicts.
+        """
+        with self._lock:
+            if slot.slot_id in self.slots:
+                raise ValueError(f'duplicate slot id {slot.slot_id!r}')
+            tree = self._trees.get(slot.resource)
+            if tree is None:
+                tree = self._trees[slot.resource] = IntervalTree()
+            if not allow_conflicts:
+                conflicts = [i.value for i in tree.overlap(slot.start, slot.end)]
+                if conflicts:
+                    raise ScheduleConflict(slot, conflicts)
+            tree.insert(slot.start, slot.end, slot.slot_id, slot)
+            self.slots[slot.slot_id] = slot
+            in_area = self._areas.setdefault(slot.area, {})
+            in_area[slot.resource] = in_area.get(slot.resource, 0) + 1
+            self._added.setdefault(slot.resource, {})[slot.slot_id] = slot
+            self._owners[slot.resource] = (slot.area, slot.campaign_id)
+
+    def remove(self, slot_id: str) -> Optional[Slot]:
+        """
+        Delete a slot. A resource without slots left disappears from the
+        store, and from an area once none of its slots there remain.
+        """
+        with self._lock:
+            slot = self.slots.pop(slot_id, None)
+            if slot is None:
+                return None
+            tree = self._trees[slot.resource]
+            tree.remove(slot.start, slot_id)
+            in_area = self._areas[slot.area]
+            in_area[slot.resource] -= 1
+            if not in_area[slot.resource]:
+                del in_area[slot.resource]
+                if not in_area:
+                    del self._areas[slot.area]
+            added = self._added[slot.resource]
+            del added[slot_id]
+            if not tree:
+                del self._trees[slot.resource]
+                del self._added[slot.resource]
+                del self._owners[slot.resource]
+            else:
+                # the owner falls back to the latest slot added that remains
+                latest = added[next(reversed(added))]
+                self._owners[slot.resource] = (latest.area, latest.campaign_id)
+            return slot
+
+    # ---------------- queries ---------------- #
+    def areas(self) -> List[str]:
+        return sorted(self._areas)
+
+    def resources(self, area: Optional[str] = None) -> List[str]:
+        if area is None:
+            return sorted(self._trees)
+        return sorted(self._areas.get(area, ()))
+
+    def owner(self, resource: str) -> Optional[Tuple[str, str]]:
+        """
+        (area, campaign id) a resource was last scheduled for.
+        """
+        return self._owners.get(resource)
+
+    def conflicts(self, resource: str, start: int, end: int, exclude: Optional[str] = None) -> List[Slot]:
+        """
+        Slots of resource overlapping [start, end), except slot `exclude`.
+        """
+        with self._lock:
+            tree = self._trees.get(resource)
+            found = tree.overlap(start, end) if tree is not None else []
+        return [i.value for i in found if i.item_id != exclude]
+
+    def window(self, start: int, end: int, area: Optional[str] = None) -> Dict[str, List[Slot]]:
+        """
+        Slots overlapping [start, end) per resource (of `area`, or all), in
+        start order. Only the trees of those resources are queried.
+        """
+        with self._lock:
+            resources = self._areas.get(area, ()) if area is not None else self._trees
+            return {r: [i.value for i in self._trees[r].overlap(start, end)] for r in resources}
+
+    def resource_window(self, resource: str, start: int, end: int) -> List[Slot]:
+        """
+        Slots of one resource overlapping [start, end), in start order.
+        """
+        with self._lock:
+            tree = self._trees.get(resource)
+            return [i.value for i in tree.overlap(start, end)] if tree is not None else []
+
+    def in_area(self, resource: str, area: Optional[str]) -> bool:
+        """
+        Whether resource has slots (in `area`, or at all).
+        """
+        return resource in (self._trees if area is None else self._areas.get(area, ()))
+
+
+# ---------------- Schedule data ---------------- #
+def _parse_time(value: str) -> int:
+    return to_seconds(datetime.fromisoformat(value.strip()))
+
+
+def load_slots(path: str) -> Tuple[Slot, ...]:
+    with open(path, newline='', encoding='utf-8') as f:
+        return tuple(
+            Slot(
+                slot_id=row['slot_id'].strip(),
+                resource=row['resource'].strip(),
+                area=row.get('area') or '',
+                campaign_id=row['campaign_id'].strip(),
+                start=_parse_time(row['start']),
+                end=_parse_time(row['end']),
+                label=row.get('label') or '',
+            )
+            for row in csv.DictReader(f)
+        )
+
+
+_DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'schedules.csv')
+
+# shared by every schedules page client
+schedule_store = ScheduleStore()
+try:
+    _conflicts = schedule_store.bulk_import(load_slots(os.getenv('SCHEDULES_PATH', _DEFAULT_PATH)))
+    if _conflicts:
+        print(f'Schedules: {len(_conflicts)} conflicting slot pairs, e.g. '
+              f'{_conflicts[0][0].slot_id} / {_conflicts[0][1].slot_id}')
+except (OSError, ValueError) as e:
+    print(f'Failed to load schedules: {e}')
@@ -0,0 +1,482 @@
+"""
+In-memory typeahead search over campaigns, areas and camera locations.
+
+SearchIndex keeps two structures, both updated incrementally:
+- an inverted index, token -> {document: weighted term frequency}, with
+  the title counted TITLE_WEIGHT times, scored with BM25;
+- a trigram index over the vocabulary, trigram -> tokens, with the token
+  padded as "$$token" so a prefix's trigrams select the tokens starting
+  with it ("ri" -> "$$r", "$ri"), and shared trigrams give fuzzy
+  candidates for misspelt terms ("rivnia" -> "rivonia").
+
+Every query term must match: the last term as a prefix (the user is still
+typing it), the others exactly, each falling back to fuzzy matches when it
+matches nothing. Prefix expansions are capped at max_expansions tokens
+(most frequent first) so one-letter prefixes stay cheap. Top-k selection
+uses heaps throughout; see search() for how the candidates are found.
+
+campaign_search mirrors the campaign repository: sync() diffs the current
+campaign snapshot against the indexed one and only re-indexes campaigns
+whose fields changed. Searches never wait for it: once the index exists, a
+changed snapshot is re-indexed in a background thread while queries keep
+using the current index.
+"""
+
+import bisect
+import heapq
+import math
+import operator
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from campaign_repository import COLUMNS, Campaign, CampaignRepository, campaigns
+
+TITLE_WEIGHT = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+FUZZY_MIN_SIMILARITY = 0.4
+FUZZY_EXPANSIONS = 4  # a misspelling stands for one or two words, not a family of them
+NARROW_EXPANSIONS = 4  # terms with up to this many tokens are intersected; wider ones are checked per document
+SCORE_ALL_LIMIT = 20000  # candidate sets up to this size are scored outright, larger ones by _threshold_walk
+MAX_CACHED_PREFIXES = 4096
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f'$${token}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Document(NamedTuple):
+    doc_id: str
+    kind: str  # campaign | area | camera
+    title: str
+    text: str
+    url: str
+
+
+class Hit(NamedTuple):
+    score: float
+    doc: Document
+
+
+def _scaled(ordered: List[tuple], mult: float):
+    for neg, num in ordered:
+        yield neg * mult, num
+
+
+class SearchIndex:
+    """
+    Documents are numbered internally (ints hash and compare far faster than
+    the string ids in the posting dicts); doc_id -> number is kept in _nums.
+    """
+
+    def __init__(self, max_expansions: int = 16):
+        self.max_expansions = max_expansions
+        self._nums: Dict[str, int] = {}  # doc id -> document number
+        self._docs: Dict[int, Document] = {}
+        self._next_num = 0
+        self._postings: Dict[str, Dict[int, int]] = {}  # token -> document -> weighted tf
+        self._impacts: Dict[str, tuple] = {}  # token -> (avg length, ordered, by_doc); see _token_impacts
+        self._doc_tokens: Dict[int, Tuple[str, ...]] = {}  # document -> its tokens (for removal)
+        self._doc_length: Dict[int, int] = {}
+        self._total_length = 0
+        self._trigrams: Dict[str, Set[str]] = {}  # trigram -> tokens
+        self._prefixes: Dict[str, List[str]] = {}  # prefix -> expansions; reset when the vocabulary changes
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        num = self._nums.get(doc_id)
+        return None if num is None else self._docs[num]
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._postings)
+
+    # ---------------- updates ---------------- #
+    def add(self, doc: Document):
+        """
+        Index doc, replacing any document with the same id.
+        """
+        tf = Counter(tokenize(doc.title))
+        for token in tf:
+            tf[token] *= TITLE_WEIGHT
+        tf.update(tokenize(doc.text))
+        with self._lock:
+            self._remove(doc.doc_id)
+            num = self._next_num
+            self._next_num += 1
+            self._nums[doc.doc_id] = num
+            self._docs[num] = doc
+            self._doc_tokens[num] = tuple(tf)
+            length = sum(tf.values())
+            self._doc_length[num] = length
+            self._total_length += length
+            for token, count in tf.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    self._prefixes.clear()
+                    for gram in trigrams(token):
+                        self._trigrams.setdefault(gram, set()).add(token)
+                postings[num] = count
+                cached = self._impacts.get(token)
+                if cached is not None:
+                    avg_length, ordered, by_doc = cached
+                    impact = by_doc[num] = self._impact(count, num, avg_length)
+                    bisect.insort(ordered, (-impact, num))
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        num = self._nums.pop(doc_id, None)
+        if num is None:
+            return
+        del self._docs[num]
+        self._total_length -= self._doc_length.pop(num)
+        for token in self._doc_tokens.pop(num):
+            postings = self._postings[token]
+            del postings[num]
+            cached = self._impacts.get(token)
+            if cached is not None:
+                _, ordered, by_doc = cached
+                del ordered[bisect.bisect_left(ordered, (-by_doc.pop(num), num))]
+            if not postings:
+                del self._postings[token]
+                self._impacts.pop(token, None)
+                self._prefixes.clear()
+                for gram in trigrams(token):
+                    grams = self._trigrams[gram]
+                    grams.discard(token)
+                    if not grams:
+                        del self._trigrams[gram]
+
+    # ---------------- impacts ---------------- #
+    def _impact(self, tf: int, num: int, avg_length: float) -> float:
+        return tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * self._doc_length[num] / avg_length))
+
+    def _token_impacts(self, token: str) -> tuple:
+        """
+        (ordered, by_doc) for token: the BM25 term-frequency component of
+        each of its postings, as a list of (-impact, document) sorted best
+        first (to walk) and as document -> impact (to look up).
+
+        Built on first use with the average document length of that moment,
+        then kept up to date by add/remove with bisect instead of rebuilt.
+        """
+        cached = self._impacts.get(token)
+        if cached is None:
+            avg_length = self._total_length / len(self._docs)
+            by_doc = {num: self._impact(tf, num, avg_length) for num, tf in self._postings[token].items()}
+            ordered = sorted((-impact, num) for num, impact in by_doc.items())
+            cached = self._impacts[token] = (avg_length, ordered, by_doc)
+        return cached[1], cached[2]
+
+    def warm(self):
+        """
+        Build the impact lists of every token, so no query pays for it.
+        """
+        with self._lock:
+            if self._docs:
+                for token in self._postings:
+                    self._token_impacts(token)
+
+    # ---------------- term expansion ---------------- #
+    def _most_frequent(self, tokens: Iterable[str]) -> List[str]:
+        return heapq.nlargest(self.max_expansions, tokens, key=lambda t: len(self._postings[t]))
+
+    def _prefix_tokens(self, prefix: str) -> List[str]:
+        cached = self._prefixes.get(prefix)
+        if cached is not None:
+            return cached
+        grams = sorted((self._trigrams.get(g, ()) for g in trigrams(prefix)), key=len)
+        if not grams[0]:
+            return []
+        # intersect from the smallest set; startswith drops tokens that only contain the trigrams elsewhere
+        candidates = (t for t in grams[0] if t.startswith(prefix) and all(t in g for g in grams[1:]))
+        expansions = self._most_frequent(candidates)
+        if len(self._prefixes) >= MAX_CACHED_PREFIXES:
+            self._prefixes.clear()
+        self._prefixes[prefix] = expansions
+        return expansions
+
+    def _fuzzy_tokens(self, term: str) -> List[Tuple[str, float]]:
+        query = trigrams(term)
+        shared = Counter()
+        for gram in query:
+            shared.update(self._trigrams.get(gram, ()))
+        scored = []
+        for token, overlap in shared.items():
+            similarity = overlap / (len(query) + len(token) - overlap)  # Jaccard: a token has len(token) trigrams
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((similarity, token))
+        return [(token, similarity) for similarity, token in heapq.nlargest(FUZZY_EXPANSIONS, scored)]
+
+    def _expand(self, term: str, prefix: bool) -> List[Tuple[str, float]]:
+        """
+        Index tokens a query term matches, with their weight.
+        """
+        expanded = {}
+        if term in self._postings:
+            expanded[term] = 1.0
+        if prefix:
+            for token in self._prefix_tokens(term):
+                expanded.setdefault(token, PREFIX_WEIGHT)
+        if not expanded and len(term) >= 3:
+            for token, similarity in self._fuzzy_tokens(term):
+                expanded[token] = FUZZY_WEIGHT * similarity
+        return list(expanded.items())
+
+    # ---------------- queries ---------------- #
+    def search(self, query: str, k: int = 10, kinds: Optional[Set[str]] = None) -> List[Hit]:
+        """
+        Top k documents matching every term of query.
+
+        A term's score in a document is the best weight * idf * impact over
+        the tokens it expands to. Multi-term queries whose most selective
+        narrow term (exact word, fuzzy match, short prefix expansion) has at
+        most SCORE_ALL_LIMIT postings are scored outright by _score_all.
+        Single terms, very common words and queries made only of wide
+        prefixes go through _threshold_walk, which stops as soon as the top
+        k are settled.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            terms = []  # per term: token -> (multiplier, document -> impact, impact-ordered postings)
+            for term in dict.fromkeys(tokens):
+                lookup = {}
+                for token, weight in self._expand(term, prefix=(term == tokens[-1])):
+                    df = len(self._postings[token])
+                    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                    ordered, by_doc = self._token_impacts(token)
+                    lookup[token] = (weight * idf, by_doc, ordered)
+                if not lookup:
+                    return []
+                terms.append(lookup)
+            terms.sort(key=lambda lookup: sum(len(by_doc) for _, by_doc, _ in lookup.values()))
+
+            docs = self._docs
+            narrow = [lookup for lookup in terms if len(lookup) <= NARROW_EXPANSIONS]
+            size = sum(len(by_doc) for _, by_doc, _ in narrow[0].values()) if narrow else n
+            if len(terms) == 1 or size > SCORE_ALL_LIMIT:
+                top = self._threshold_walk(terms, k, kinds)
+            else:
+                totals = self._score_all(terms)
+                if kinds is not None:
+                    totals = {num: score for num, score in totals.items() if docs[num].kind in kinds}
+                top = heapq.nlargest(k, zip(totals.values(), totals.keys()))
+            return [Hit(score, docs[num]) for score, num in top]
+
+    @staticmethod
+    def _score_all(terms: List[dict]) -> Dict[int, float]:
+        """
+        Scores of every document matching all terms, given at least one
+        narrow term. Narrow terms are scored smallest first, each restricted
+        to the documents matching the previous ones; wide prefix terms then
+        only filter (constant score, as Lucene rewrites prefix queries). The
+        per-document work stays in set operations and map/zip.
+        """
+        totals = None
+        for lookup in terms:
+            if len(lookup) > NARROW_EXPANSIONS:
+                continue
+            scores = None
+            for mult, by_doc, _ in lookup.values():
+                keys = by_doc.keys() if totals is None else by_doc.keys() & totals.keys()
+                token_scores = dict(zip(keys, map(mult.__mul__, map(by_doc.__getitem__, keys))))
+                if scores is None:
+                    scores = token_scores
+                    continue
+                for num, score in token_scores.items():
+                    if score > scores.get(num, 0.0):
+                        scores[num] = score
+            if totals is not None:
+                scores = dict(zip(scores, map(operator.add, map(totals.__getitem__, scores), scores.values())))
+            totals = scores
+            if not totals:
+                return totals
+        for lookup in terms:
+            if len(lookup) > NARROW_EXPANSIONS:
+                matched = set().union(*(by_doc.keys() & totals.keys() for _, by_doc, _ in lookup.values()))
+                totals = {num: totals[num] for num in matched}
+        return totals
+
+    def _term_score(self, lookup: Dict[str, tuple], num: int) -> float:
+        best = 0.0
+        if len(lookup) <= NARROW_EXPANSIONS:
+            for mult, by_doc, _ in lookup.values():
+                impact = by_doc.get(num)
+                if impact is not None and impact * mult > best:
+                    best = impact * mult
+            return best
+        # wide prefix: the document has fewer tokens than the term has expansions
+        for token in self._doc_tokens[num]:
+            entry = lookup.get(token)
+            if entry is not None and entry[1][num] * entry[0] > best:
+                best = entry[1][num] * entry[0]
+        return best
+
+    def _threshold_walk(self, terms: List[dict], k: int, kinds: Optional[Set[str]]) -> List[tuple]:
+        """
+        Fagin's threshold algorithm: each term's postings are walked best
+        first (merged across its tokens) in turn, every newly seen document
+        is scored in full, and the walk stops once the k-th best total
+        reaches the sum of the scores the walks are currently at (no unseen
+        document can do better), or when any term runs out (every document
+        matching it has been seen).
+        """
+        walks = [heapq.merge(*(_scaled(ordered, mult) for mult, _, ordered in lookup.values())) for lookup in terms]
+        frontier = [max(-ordered[0][0] * mult for mult, _, ordered in lookup.values()) for lookup in terms]
+        docs = self._docs
+        top: List[tuple] = []  # min-heap of (score, document)
+        seen = set()
+        while True:
+            for i, walk in enumerate(walks):
+                item = next(walk, None)
+                if item is None:
+                    return sorted(top, reverse=True)
+                frontier[i] = -item[0]
+                num = item[1]
+                if num in seen:
+                    continue
+                seen.add(num)
+                if kinds is not None and docs[num].kind not in kinds:
+                    continue
+                total = 0.0
+                for lookup in terms:
+                    score = self._term_score(lookup, num)
+                    if not score:
+                        break
+                    total += score
+                else:
+                    if len(top) < k:
+                        heapq.heappush(top, (total, num))
+                    elif total > top[0][0]:
+                        heapq.heapreplace(top, (total, num))
+            if len(top) == k and top[0][0] >= sum(frontier):
+                return sorted(top, reverse=True)
+
+
+# ---------------- Campaign documents ---------------- #
+def campaign_documents(campaign: Campaign) -> List[Document]:
+    url = f'/campaign/{campaign.campaign_id}'
+    docs = [Document(f'campaign:{campaign.campaign_id}', 'campaign', campaign.area or campaign.campaign_id,
+                     f'{campaign.description} {campaign.status}', url)]
+    for n, camera_id in enumerate(campaign.camera_ids, start=1):
+        docs.append(Document(f'camera:{camera_id}', 'camera', f'{campaign.area} camera {n}',
+                             f'{camera_id} {campaign.description}', url))
+    return docs
+
+
+def _fields(campaign: Campaign) -> tuple:
+    return tuple(getattr(campaign, column) for column in COLUMNS)
+
+
+class CampaignSearch:
+    """
+    A SearchIndex kept in step with a CampaignRepository.
+    """
+
+    def __init__(self, repository: CampaignRepository, index: Optional[SearchIndex] = None):
+        self.repository = repository
+        self.index = index or SearchIndex()
+        self._snapshot = None
+        self._indexed: Dict[str, tuple] = {}  # campaign id -> fields as indexed
+        self._doc_ids: Dict[str, Tuple[str, ...]] = {}  # campaign id -> its document ids
+        self._areas: Counter = Counter()  # area -> campaigns in it
+        self._sync_lock = threading.Lock()
+
+    def sync(self) -> int:
+        """
+        Re-index campaigns changed since the last sync; returns how many.
+        """
+        snapshot = self.repository.snapshot()
+        if snapshot is self._snapshot:
+            return 0
+        with self._sync_lock:
+            if snapshot is self._snapshot:
+                return 0
+            start = time.perf_counter()
+            changed = 0
+            for campaign_id in set(self._indexed) - set(snapshot.by_id):
+                self._drop(campaign_id)
+                changed += 1
+            for campaign in snapshot.campaigns:
+                fields = _fields(campaign)
+                if self._indexed.get(campaign.campaign_id) == fields:
+                    continue
+                self._drop(campaign.campaign_id)
+                docs = campaign_documents(campaign)
+                for doc in docs:
+                    self.index.add(doc)
+                self._doc_ids[campaign.campaign_id] = tuple(doc.doc_id for doc in docs)
+                self._indexed[campaign.campaign_id] = fields
+                self._add_area(campaign.area)
+                changed += 1
+            self._snapshot = snapshot
+            if changed:
+                self.index.warm()
+                print(f'Search index: {changed} campaigns re-indexed in {(time.perf_counter() - start) * 1000:.0f} ms '
+                      f'({len(self.index)} documents)')
+            return changed
+
+    def _drop(self, campaign_id: str):
+        fields = self._indexed.pop(campaign_id, None)
+        if fields is None:
+            return
+        for doc_id in self._doc_ids.pop(campaign_id, ()):
+            self.index.remove(doc_id)
+        self._remove_area(fields[COLUMNS.index('area')])
+
+    def _add_area(self, area: str):
+        if not area:
+            return
+        self._areas[area] += 1
+        if self._areas[area] == 1:
+            self.index.add(Document(f'area:{area.lower()}', 'area', area, area, '/areas'))
+
+    def _remove_area(self, area: str):
+        if not area:
+            return
+        self._areas[area] -= 1
+        if self._areas[area] <= 0:
+            del self._areas[area]
+            self.index.remove(f'area:{area.lower()}')
+
+    def sync_in_background(self):
+        """
+        Start sync() on a thread unless one is already running.
+        """
+        if not self._sync_lock.locked():
+            threading.Thread(target=self.sync, name='search-sync', daemon=True).start()
+
+    def search(self, query: str, k: int = 10, kinds: Optional[Set[str]] = None) -> List[Hit]:
+        if self._snapshot is None:
+            self.sync()  # first query: there is nothing to search yet
+        elif self.repository.snapshot() is not self._snapshot:
+            self.sync_in_background()
+        return self.index.search(query, k=k, kinds=kinds)
+
+
+# shared by every search page client
+campaign_search = CampaignSearch(campaigns)
@@ -0,0 +1,321 @@
+"""
+Spatial index over camera locations, for the /areas map.
+
+Positions are projected to Web Mercator (x, y in [0, 1), the projection
+Leaflet draws with) and bucketed in a uniform grid. One grid per zoom level
+0..BASE_ZOOM, each with CELL_PX-pixel cells at its zoom, so the level for
+zoom z has 2 ** z * 256 / CELL_PX cells per side:
+- the BASE_ZOOM level holds the cameras of each cell;
+- the coarser levels hold (count, sum of x, sum of y) per cell, which is
+  the marker cluster for that cell at that zoom.
+
+Together the levels form an implicit quadtree (cell (i, j) at level z has
+children (2i..2i+1, 2j..2j+1) at z+1), which bbox and nearest queries
+descend. view() answers "what to draw" for a viewport: at zoom <= BASE_ZOOM
+one marker per non-empty cell (the camera itself when it is alone), so a
+viewport never has more markers than cells; above BASE_ZOOM the cameras in
+view, capped at max_markers.
+
+Inserts and removals update every level in O(BASE_ZOOM).
+"""
+
+import csv
+import heapq
+import math
+import os
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+BASE_ZOOM = 14
+CELL_PX = 64
+TILE_PX = 256
+EARTH_RADIUS_M = 6371008.8
+MAX_LATITUDE = 85.05112878
+
+
+class Camera(NamedTuple):
+    camera_id: str
+    campaign_id: str
+    road: str
+    label: str
+    lat: float
+    lon: float
+
+
+class Marker(NamedTuple):
+    key: str  # stable while the marker is unchanged, for diffing
+    lat: float
+    lon: float
+    count: int  # 1 for a single camera
+    camera: Optional[Camera]
+
+
+# ---------------- Projection ---------------- #
+def project(lat: float, lon: float) -> Tuple[float, float]:
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    siny = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - math.log((1 + siny) / (1 - siny)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+
+def unproject(x: float, y: float) -> Tuple[float, float]:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y)))), x * 360.0 - 180.0
+
+
+def view_rect(center: Tuple[float, float], zoom: float, width: float, height: float) -> Tuple[float, float, float, float]:
+    """
+    Projected (x0, y0, x1, y1) shown by a map of width x height pixels.
+    """
+    world = TILE_PX * 2 ** zoom
+    cx, cy = project(*center)
+    return cx - width / 2 / world, cy - height / 2 / world, cx + width / 2 / world, cy + height / 2 / world
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def _cells(zoom: int) -> int:
+    return 2 ** zoom * TILE_PX // CELL_PX
+
+
+_BASE_CELLS = _cells(BASE_ZOOM)
+_LEVEL_BITS = [(BASE_ZOOM - zoom, _cells(zoom).bit_length() - 1) for zoom in range(BASE_ZOOM + 1)]
+
+
+def _base_cell(x: float, y: float) -> Tuple[int, int]:
+    return int(x * _BASE_CELLS), int(y * _BASE_CELLS)
+
+
+def _key(bi: int, bj: int, zoom: int) -> int:
+    # cell (i, j) at zoom has key i * _cells(zoom) + j; coarser cells are the base cell shifted
+    shift, bits = _LEVEL_BITS[zoom]
+    return ((bi >> shift) << bits) | (bj >> shift)
+
+
+# ---------------- Index ---------------- #
+class SpatialIndex:
+    def __init__(self, max_markers: int = 500):
+        self.max_markers = max_markers
+        self.cameras: Dict[str, Camera] = {}
+        self._points: Dict[str, Tuple[float, float, int, int]] = {}  # camera id -> projected (x, y), base cell
+        self._base: Dict[int, List[Camera]] = {}  # BASE_ZOOM cell -> cameras
+        self._levels: List[Dict[int, list]] = [{} for _ in range(BASE_ZOOM)]  # zoom -> cell -> [count, sum x, sum y]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.cameras)
+
+    # ---------------- updates ---------------- #
+    def insert(self, camera: Camera):
+        with self._lock:
+            self._remove(camera.camera_id)
+            x, y = project(camera.lat, camera.lon)
+            bi, bj = _base_cell(x, y)
+            self.cameras[camera.camera_id] = camera
+            self._points[camera.camera_id] = (x, y, bi, bj)
+            self._base.setdefault(_key(bi, bj, BASE_ZOOM), []).append(camera)
+            for zoom, level in enumerate(self._levels):
+                key = _key(bi, bj, zoom)
+                cell = level.get(key)
+                if cell is None:
+                    level[key] = [1, x, y]
+                else:
+                    cell[0] += 1
+                    cell[1] += x
+                    cell[2] += y
+
+    def remove(self, camera_id: str):
+        with self._lock:
+            self._remove(camera_id)
+
+    def _remove(self, camera_id: str):
+        camera = self.cameras.pop(camera_id, None)
+        if camera is None:
+            return
+        x, y, bi, bj = self._points.pop(camera_id)
+        key = _key(bi, bj, BASE_ZOOM)
+        members = self._base[key]
+        members.remove(camera)
+        if not members:
+            del self._base[key]
+        for zoom, level in enumerate(self._levels):
+            key = _key(bi, bj, zoom)
+            cell = level[key]
+            if cell[0] == 1:
+                del level[key]
+            else:
+                cell[0] -= 1
+                cell[1] -= x
+                cell[2] -= y
+
+    # ---------------- quadtree helpers ---------------- #
+    def _count(self, zoom: int, i: int, j: int) -> int:
+        if zoom == BASE_ZOOM:
+            return len(self._base.get(i * _cells(zoom) + j, ()))
+        cell = self._levels[zoom].get(i * _cells(zoom) + j)
+        return cell[0] if cell else 0
+
+    def _children(self, zoom: int, i: int, j: int) -> Iterator[Tuple[int, int]]:
+        for ci in (2 * i, 2 * i + 1):
+            for cj in (2 * j, 2 * j + 1):
+                if self._count(zoom + 1, ci, cj):
+                    yield ci, cj
+
+    def _any_camera(self, zoom: int, i: int, j: int) -> Camera:
+        # follow non-empty children down to the base grid
+        while zoom < BASE_ZOOM:
+            i, j = next(self._children(zoom, i, j))
+            zoom += 1
+        return self._base[i * _cells(zoom) + j][0]
+
+    # ---------------- queries ---------------- #
+    def bbox(self, south: float, west: float, north: float, east: float, limit: Optional[int] = None) -> List[Camera]:
+        """
+        Cameras inside the latitude/longitude box (west > east crosses the antimeridian).
+        """
+        if west > east:
+            return (self.bbox(south, west, north, 180.0, limit)
+                    + self.bbox(south, -180.0, north, east, limit))[:limit]
+        x0, y1 = project(south, west)
+        x1, y0 = project(north, east)
+        with self._lock:
+            return list(self._in_rect(x0, y0, x1, y1, limit))
+
+    def _in_rect(self, x0: float, y0: float, x1: float, y1: float, limit: Optional[int] = None) -> Iterator[Camera]:
+        found = 0
+        stack = [(0, i, j) for i in range(_cells(0)) for j in range(_cells(0)) if self._count(0, i, j)]
+        while stack:
+            zoom, i, j = stack.pop()
+            n = _cells(zoom)
+            if (i + 1) / n <= x0 or i / n > x1 or (j + 1) / n <= y0 or j / n > y1:
+                continue
+            if zoom < BASE_ZOOM:
+                stack.extend((zoom + 1, ci, cj) for ci, cj in self._children(zoom, i, j))
+                continue
+            for camera in self._base[i * n + j]:
+                x, y = self._points[camera.camera_id][:2]
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    yield camera
+                    found += 1
+                    if limit is not None and found >= limit:
+                        return
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[float, Camera]]:
+        """
+        The k cameras closest to (lat, lon) as (metres, camera), closest first.
+
+        Best-first search over the quadtree by projected distance, which is
+        proportional to ground distance at city scale (Mercator is conformal).
+        x distances wrap around the antimeridian.
+        """
+        qx, qy = project(lat, lon)
+        with self._lock:
+            heap = []
+            for i in range(_cells(0)):
+                for j in range(_cells(0)):
+                    if self._count(0, i, j):
+                        heap.append((self._cell_distance(qx, qy, 0, i, j), 0, i, j, None))
+            heapq.heapify(heap)
+            found = []
+            while heap and len(found) < k:
+                dist, zoom, i, j, camera = heapq.heappop(heap)
+                if camera is not None:
+                    found.append(camera)
+                elif zoom < BASE_ZOOM:
+                    for ci, cj in self._children(zoom, i, j):
+                        heapq.heappush(heap, (self._cell_distance(qx, qy, zoom + 1, ci, cj), zoom + 1, ci, cj, None))
+                else:
+                    for member in self._base[i * _cells(zoom) + j]:
+                        x, y = self._points[member.camera_id][:2]
+                        dx = abs(x - qx)
+                        dist = math.hypot(min(dx, 1.0 - dx), y - qy)
+                        # a unique tie-breaker keeps cameras from being compared
+                        heapq.heappush(heap, (dist, BASE_ZOOM + 1, id(member), 0, member))
+        return [(distance_m(lat, lon, c.lat, c.lon), c) for c in found]
+
+    @staticmethod
+    def _cell_distance(qx: float, qy: float, zoom: int, i: int, j: int) -> float:
+        n = _cells(zoom)
+        # the cell as seen from qx and from its copies one world to either side
+        dx = min(max(i / n - x, 0.0, x - (i + 1) / n) for x in (qx - 1.0, qx, qx + 1.0))
+        dy = max(j / n - qy, 0.0, qy - (j + 1) / n)
+        return math.hypot(dx, dy)
+
+    def view(self, center: Tuple[float, float], zoom: float, width: float, height: float) -> List[Marker]:
+        """
+        Markers to draw for a map viewport: one per non-empty grid cell up to
+        BASE_ZOOM (clusters, or the camera itself when alone in its cell),
+        individual cameras above it.
+        """
+        zoom = max(0, int(round(zoom)))
+        x0, y0, x1, y1 = view_rect(center, zoom, width, height)
+        markers = []
+        with self._lock:
+            if zoom > BASE_ZOOM:
+                for camera in self._in_rect(x0, y0, x1, y1, self.max_markers):
+                    markers.append(Marker(f'cam:{camera.camera_id}', camera.lat, camera.lon, 1, camera))
+                return markers
+            n = _cells(zoom)
+            cells = self._base if zoom == BASE_ZOOM else self._levels[zoom]
+            for i in range(max(0, int(x0 * n)), min(n - 1, int(x1 * n)) + 1):
+                for j in range(max(0, int(y0 * n)), min(n - 1, int(y1 * n)) + 1):
+                    cell = cells.get(i * n + j)
+                    if cell is None:
+                        continue
+                    if zoom == BASE_ZOOM:
+                        count = len(cell)
+                        if count == 1:
+                            camera = cell[0]
+                        else:
+                            sx = sy = 0.0
+                            for member in cell:
+                                x, y = self._points[member.camera_id][:2]
+                                sx += x
+                                sy += y
+                            cell = (count, sx, sy)
+                    else:
+                        count = cell[0]
+                        camera = self._any_camera(zoom, i, j) if count == 1 else None
+                    if count == 1:
+                        markers.append(Marker(f'cam:{camera.camera_id}', camera.lat, camera.lon, 1, camera))
+                    else:
+                        lat, lon = unproject(cell[1] / count, cell[2] / count)
+                        markers.append(Marker(f'cluster:{zoom}:{i * n + j}:{count}', lat, lon, count, None))
+        return markers
+
+
+# ---------------- Camera data ---------------- #
+def load_cameras(path: str) -> Tuple[Camera, ...]:
+    with open(path, newline='', encoding='utf-8') as f:
+        return tuple(
+            Camera(
+                camera_id=row['camera_id'].strip(),
+                campaign_id=row['campaign_id'].strip(),
+                road=row.get('road') or '',
+                label=row.get('label') or row['camera_id'],
+                lat=float(row['lat']),
+                lon=float(row['lon']),
+            )
+            for row in csv.DictReader(f)
+        )
+
+
+def build_index(cameras) -> SpatialIndex:
+    index = SpatialIndex(max_markers=int(os.getenv('AREAS_MAX_MARKERS', 500)))
+    for camera in cameras:
+        index.insert(camera)
+    return index
+
+
+_DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cameras.csv')
+
+# shared by every areas page client
+try:
+    camera_index = build_index(load_cameras(os.getenv('CAMERAS_PATH', _DEFAULT_PATH)))
+except OSError as e:
+    print(f'Failed to load cameras: {e}')
+    camera_index = SpatialIndex()
@@ -0,0 +1,95 @@
+"""
+Build-once static asset pipeline.
+
+Every file in assets/ is copied once per process start to STATIC_BUILD_DIR
+under a content-hashed name (login.css -> login.3f2a9c1b7d4e.css) together
+with gzip and, when the brotli package is installed, brotli precompressed
+variants. Because a file's URL changes whenever its content does, the
+files are served with immutable, year-long cache headers (see
+pages/assets.py) and repeat page loads only fetch the HTML.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import tempfile
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always produced
+    brotli = None
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+URL_PREFIX = '/assets'
+
+# Accept-Encoding token -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class AssetPipeline:
+    def __init__(self, source_dir: str, build_dir: str):
+        self.source_dir = source_dir
+        self.build_dir = build_dir
+        self.manifest: Dict[str, str] = {}  # logical name -> hashed file name
+        self.content_types: Dict[str, str] = {}  # hashed file name -> content type
+
+    def build(self):
+        os.makedirs(self.build_dir, exist_ok=True)
+        for name in sorted(os.listdir(self.source_dir)):
+            source = os.path.join(self.source_dir, name)
+            if not os.path.isfile(source):
+                continue
+            with open(source, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            stem, ext = os.path.splitext(name)
+            hashed = f'{stem}.{digest}{ext}'
+            target = os.path.join(self.build_dir, hashed)
+            if not os.path.exists(target):
+                self._write(target, data)
+                self._write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    self._write(target + '.br', brotli.compress(data, quality=11))
+            self.manifest[name] = hashed
+            self.content_types[hashed] = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        return self
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def url(self, name: str) -> str:
+        return f'{URL_PREFIX}/{self.manifest[name]}'
+
+    def resolve(self, hashed: str, accept_encoding: str = '') -> Optional[tuple]:
+        """
+        (path, content_type, content_encoding) of the best variant for the
+        client, or None for unknown files.
+        """
+        content_type = self.content_types.get(hashed)
+        if content_type is None:
+            return None
+        path = os.path.join(self.build_dir, hashed)
+        accepted = {token.split(';')[0].strip() for token in accept_encoding.lower().split(',')}
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and os.path.exists(path + suffix):
+                return path + suffix, content_type, encoding
+        return path, content_type, None
+
+
+assets = AssetPipeline(
+    SOURCE_DIR,
+    os.getenv('STATIC_BUILD_DIR', os.path.join(tempfile.gettempdir(), 'novolab-assets')),
+).build()
+
+
+def asset_url(name: str) -> str:
+    """
+    Fingerprinted URL of assets/<name>.
+    """
+    return assets.url(name)
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+import pytest
+
+from admission import AdmissionController, BoundedExecutor, KeyedRateLimiter, RejectedError, client_address
+
+
+def test_client_address_ignores_forwarded_without_trusted_proxies():
+    assert client_address('10.0.0.1', '1.2.3.4', trusted_hops=0) == '10.0.0.1'
+
+
+def test_client_address_takes_the_entry_added_by_the_trusted_proxy():
+    # the client sent "1.2.3.4"; the proxy appended the address it saw
+    assert client_address('127.0.0.1', '1.2.3.4, 203.0.113.7', trusted_hops=1) == '203.0.113.7'
+    assert client_address('127.0.0.1', '1.2.3.4, 203.0.113.7, 10.0.0.2', trusted_hops=2) == '203.0.113.7'
+
+
+def test_client_address_falls_back_to_peer_on_short_header():
+    assert client_address('127.0.0.1', None, trusted_hops=1) == '127.0.0.1'
+    assert client_address('127.0.0.1', '203.0.113.7', trusted_hops=2) == '127.0.0.1'
+
+
+def test_ip_bucket_is_checked_before_email_bucket():
+    controller = AdmissionController(
+        per_email=KeyedRateLimiter(rate_per_minute=0, burst=1),
+        per_ip=KeyedRateLimiter(rate_per_minute=0, burst=2),
+        executor=BoundedExecutor(max_workers=1, max_queue=0),
+    )
+    assert controller.check('a@x', '1.2.3.4')
+    assert not controller.check('a@x', '1.2.3.4')
+    assert controller.check('b@x', '5.6.7.8')
+    # the IP bucket is empty now, so c@x's bucket is never touched
+    assert not controller.check('c@x', '1.2.3.4')
+    assert controller.per_email.allow('c@x')
+    assert controller.throttled == 2
+
+
+def test_bounded_executor_rejects_when_full():
+    executor = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+    futures = [executor.submit(release.wait), executor.submit(release.wait)]
+    with pytest.raises(RejectedError):
+        executor.submit(release.wait)
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    assert asyncio.run(executor.run(lambda: 42)) == 42
+    executor.shutdown()
@@ -0,0 +1,85 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_stays_closed_until_min_calls_are_in_the_window(clock):
+    breaker = CircuitBreaker('test', min_calls=5, failure_rate=0.5)
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_failure_rate_below_the_threshold_keeps_it_closed(clock):
+    breaker = CircuitBreaker('test', window=10, min_calls=5, failure_rate=0.5)
+    for i in range(20):
+        if i % 3 == 0:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_open_it_even_when_they_succeed(clock):
+    breaker = CircuitBreaker('test', min_calls=4, slow_call_seconds=2.0, slow_call_rate=0.5)
+    breaker.record_success(latency=0.1)
+    breaker.record_success(latency=0.1)
+    breaker.record_success(latency=2.5)
+    assert breaker.state == CLOSED
+    breaker.record_success(latency=3.0)
+    assert breaker.state == OPEN
+    assert breaker.stats()['times_opened'] == 1
+
+
+def test_half_open_lets_through_only_the_trial_calls(clock):
+    breaker = CircuitBreaker('test', min_calls=1, open_seconds=30, half_open_calls=2)
+    breaker.record_failure()
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.state == HALF_OPEN
+    assert [breaker.allow() for _ in range(3)] == [True, True, False]
+
+
+def test_a_good_trial_resets_it_to_closed(clock):
+    breaker = CircuitBreaker('test', min_calls=2, open_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_success(latency=0.1)
+    assert breaker.state == CLOSED
+    # the window starts over: one failure is below min_calls again
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.stats()['window_calls'] == 1
+
+
+@pytest.mark.parametrize('ok, latency', [(False, 0.1), (True, 5.0)])
+def test_a_failed_or_slow_trial_reopens_it(clock, ok, latency):
+    breaker = CircuitBreaker('test', min_calls=1, open_seconds=30, slow_call_seconds=2.0)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    if ok:
+        breaker.record_success(latency)
+    else:
+        breaker.record_failure(latency)
+    assert breaker.state == OPEN
+    assert breaker.stats()['times_opened'] == 2
+    # and stays open for another full open_seconds
+    clock[0] += 29
+    assert not breaker.allow()
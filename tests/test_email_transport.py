@@ -0,0 +1,135 @@
+import socket
+import time
+from email.message import EmailMessage
+from smtplib import SMTPDataError
+
+import pytest
+import requests
+
+from benchmarks.fake_services import FakeSendGrid, FakeSMTPServer, Inbox
+from email_transport import SendGridTransport, SMTPConnectionPool
+
+
+def message(to: str, otp: str = '123456') -> EmailMessage:
+    msg = EmailMessage()
+    msg['From'] = 'noreply@novolab.test'
+    msg['To'] = to
+    msg['Subject'] = 'Your OTP'
+    msg.set_content(f'Your OTP is {otp}')
+    return msg
+
+
+@pytest.fixture
+def inbox():
+    return Inbox()
+
+
+@pytest.fixture
+def smtp(inbox):
+    server = FakeSMTPServer(inbox).start()
+    yield server
+    server.stop()
+
+
+def make_pool(port: int, **kwargs) -> SMTPConnectionPool:
+    kwargs.setdefault('acquire_timeout', 1.0)
+    return SMTPConnectionPool('127.0.0.1', port, 'user', 'secret', use_ssl=False, **kwargs)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_connections_are_reused(smtp, inbox):
+    pool = make_pool(smtp.port)
+    for i in range(3):
+        pool.send_message(message('a@example.com', f'00000{i}'))
+        assert inbox.wait_for('a@example.com', timeout=5) == f'00000{i}'
+    stats = pool.stats()
+    assert (stats['created'], stats['reused'], stats['idle'], stats['in_use']) == (1, 2, 1, 0)
+    assert smtp.connections == 1
+    pool.close()
+
+
+def test_a_stale_idle_connection_is_replaced_before_use(smtp, inbox):
+    pool = make_pool(smtp.port, keepalive_interval=0)
+    pool.send_message(message('a@example.com'))
+    smtp.drop_connections()
+    # the NOOP probe finds the dropped connection, which is discarded for a fresh one
+    pool.send_message(message('b@example.com'))
+    assert inbox.wait_for('b@example.com', timeout=5) == '123456'
+    stats = pool.stats()
+    assert (stats['created'], stats['discarded'], stats['reconnects']) == (2, 1, 0)
+    pool.close()
+
+
+def test_a_connection_dropped_mid_send_is_reconnected_once(smtp, inbox):
+    pool = make_pool(smtp.port, keepalive_interval=3600)
+    pool.send_message(message('a@example.com'))
+    smtp.drop_connections()
+    # trusted without a probe, so the send itself hits the dropped connection
+    pool.send_message(message('b@example.com'))
+    assert inbox.wait_for('b@example.com', timeout=5) == '123456'
+    stats = pool.stats()
+    assert (stats['created'], stats['reconnects'], stats['idle'], stats['in_use']) == (2, 1, 1, 0)
+    pool.close()
+
+
+def test_a_connection_that_errors_is_discarded_and_its_slot_released(inbox):
+    smtp = FakeSMTPServer(inbox, error_rate=1.0).start()
+    try:
+        pool = make_pool(smtp.port, max_size=1)
+        for _ in range(2):
+            # with one slot, a leaked slot would make the second send time out instead
+            with pytest.raises(SMTPDataError):
+                pool.send_message(message('a@example.com'))
+        stats = pool.stats()
+        assert (stats['created'], stats['discarded'], stats['idle'], stats['in_use']) == (2, 2, 0, 0)
+        assert inbox.failed == 2
+    finally:
+        smtp.stop()
+
+
+def test_a_failed_connect_releases_its_slot():
+    pool = make_pool(free_port(), max_size=1)
+    for _ in range(2):
+        with pytest.raises(ConnectionRefusedError):
+            pool.send_message(message('a@example.com'))
+    assert pool.stats()['in_use'] == 0
+
+
+def test_an_exhausted_pool_times_out(smtp):
+    pool = make_pool(smtp.port, max_size=1, acquire_timeout=0.2)
+    server = pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    assert time.monotonic() - start >= 0.2
+    pool.release(server)
+    pool.release(pool.acquire())
+    pool.close()
+
+
+def test_sendgrid_delivers_and_counts_errors(inbox):
+    data = {
+        'personalizations': [{'to': [{'email': 'a@example.com'}]}],
+        'content': [{'type': 'text/plain', 'value': 'Your OTP is 654321'}],
+    }
+    stub = FakeSendGrid(inbox).start()
+    try:
+        transport = SendGridTransport(url=stub.url, timeout=5)
+        assert transport.post('key', data).status_code == 202
+        assert inbox.wait_for('a@example.com', timeout=5) == '654321'
+        stub.error_rate = 1.0
+        assert transport.post('key', data).status_code == 503
+        assert transport.stats()['requests'] == 2 and transport.stats()['errors'] == 1
+        transport.close()
+    finally:
+        stub.stop()
+
+    transport = SendGridTransport(url=f'http://127.0.0.1:{free_port()}/v3/mail/send', timeout=5)
+    with pytest.raises(requests.ConnectionError):
+        transport.post('key', data)
+    assert transport.stats()['errors'] == 1
@@ -0,0 +1,179 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from ingestion import CountIngester, RingBuffer, SegmentLog
+from timeseries import TimeSeriesStore
+
+T0 = 1_700_000_000
+
+
+def total(store: TimeSeriesStore, camera_id: str) -> int:
+    return int(store.query([camera_id], width=10 ** 6)[1].sum())
+
+
+def test_ring_buffer_wraps_and_refuses_to_overwrite_unflushed_events():
+    ring = RingBuffer(4)
+    assert ring.append(np.arange(3), np.ones(3, dtype=np.uint32))
+    assert not ring.append(np.arange(2), np.ones(2, dtype=np.uint32))
+    ring.mark_flushed(3)
+    assert ring.append(np.array([10, 11, 12]), np.array([1, 2, 3], dtype=np.uint32))
+    timestamps, counts = ring.unflushed()
+    assert timestamps.tolist() == [10, 11, 12]
+    assert counts.tolist() == [1, 2, 3]
+
+
+def test_flushed_counts_are_recovered_after_a_restart(tmp_path):
+    sink = TimeSeriesStore()
+    ingester = CountIngester(str(tmp_path), capacity=8, segment_records=16, sink=sink)
+    # larger than the ring and the segment: split into ring-sized parts over several segment files
+    ingester.ingest('cam-1', T0 + np.arange(40), np.full(40, 2))
+    ingester.ingest('cam-2', [T0], [7])
+    ingester.stop()
+    assert total(sink, 'cam-1') == 80
+    assert len(list((tmp_path / '0').glob('segment-*.log'))) > 1
+
+    restored = TimeSeriesStore()
+    assert CountIngester(str(tmp_path), sink=restored).recover() == 41
+    assert total(restored, 'cam-1') == 80
+    assert total(restored, 'cam-2') == 7
+
+
+def test_replay_ignores_records_that_were_never_committed(tmp_path):
+    log = SegmentLog(str(tmp_path), segment_records=16)
+    records = np.zeros(3, dtype=[('camera', '<u4'), ('count', '<u4'), ('timestamp', '<i8')])
+    records['camera'] = log.camera_numbers(['cam-1'] * 3)
+    records['count'] = 1
+    log.append(records)
+    # written past the committed count, as if the process died before updating the header
+    log._records[3] = (0, 99, T0)
+    log._records.flush()
+    (camera_id, timestamps, counts), = SegmentLog.replay(str(tmp_path))
+    assert camera_id == 'cam-1' and counts.tolist() == [1, 1, 1]
+
+
+@pytest.mark.parametrize('batches', [
+    [('cam-2', [T0, T0 + 1], [1])],
+    [('cam-2', [T0], [2 ** 63])],
+    [('cam-2', [T0], [-1])],
+    [('cam-2', ['x'], [1])],
+    [('', [T0], [1])],
+    [(None, [T0], [1])],
+])
+def test_a_bad_batch_rejects_the_whole_request(tmp_path, batches):
+    ingester = CountIngester(str(tmp_path), sink=None)
+    with pytest.raises(ValueError):
+        ingester.ingest_many([('cam-1', [T0], [1])] + batches)
+    assert ingester.stats()['events'] == 0
+    assert ingester.stats()['pending'] == 0
+
+
+def test_camera_cap_rejects_requests_that_would_exceed_it(tmp_path):
+    ingester = CountIngester(str(tmp_path), max_cameras=2, sink=None)
+    ingester.ingest_many([('cam-1', [T0], [1]), ('cam-2', [T0], [1])])
+    with pytest.raises(ValueError):
+        ingester.ingest_many([('cam-1', [T0], [1]), ('cam-3', [T0], [1])])
+    assert ingester.stats()['cameras'] == 2
+    assert ingester.stats()['events'] == 2
+    ingester.stop()
+
+
+def test_flushes_wait_for_recovery(tmp_path):
+    first = CountIngester(str(tmp_path), sink=None)
+    first.ingest('cam-1', [T0], [5])
+    first.stop()
+
+    sink = TimeSeriesStore()
+    ingester = CountIngester(str(tmp_path), sink=sink)
+    replaying = threading.Event()
+    resume = threading.Event()
+    add = sink.add
+
+    def slow_add(*args):
+        replaying.set()
+        resume.wait(5)
+        add(*args)
+
+    sink.add = slow_add
+    recovery = threading.Thread(target=ingester.recover)
+    recovery.start()
+    replaying.wait(5)
+    # buffered during recovery and appended to the same log it is replaying
+    ingester.ingest('cam-1', [T0 + 1], [3])
+    flush = threading.Thread(target=ingester.flush)
+    flush.start()
+    resume.set()
+    recovery.join(5)
+    flush.join(5)
+    sink.add = add
+    ingester.stop()
+    assert total(sink, 'cam-1') == 8
+
+
+@pytest.mark.parametrize('camera_id', [['cam-1'], {'id': 'cam-1'}, 7, None])
+def test_the_route_rejects_camera_ids_that_are_not_strings(camera_id):
+    from pages.ingest import IngestError, _ingest
+    body = json.dumps({'batches': [{'camera_id': camera_id, 'timestamps': [T0], 'counts': [1]}]}).encode()
+    with pytest.raises(IngestError) as e:
+        _ingest(body)
+    assert e.value.status_code == 400
+
+
+def test_each_writer_sees_what_the_others_committed_once(tmp_path):
+    sinks = [TimeSeriesStore(), TimeSeriesStore()]
+    workers = [CountIngester(str(tmp_path), writer=str(i), sink=sinks[i]) for i in range(2)]
+    workers[0].ingest('cam-1', [T0], [2])
+    workers[1].ingest('cam-1', [T0 + 60], [3])
+    for worker in workers:
+        worker.flush()
+    for _ in range(2):
+        for worker in workers:
+            worker.recover()
+    assert [total(sink, 'cam-1') for sink in sinks] == [5, 5]
+
+    workers[1].ingest('cam-2', [T0], [4])
+    workers[1].flush()
+    assert workers[0].recover() == 1
+    assert total(sinks[0], 'cam-2') == 4
+    for worker in workers:
+        worker.stop()
+
+
+def compacted_log(tmp_path, timestamps, counts, now, retention=None):
+    ingester = CountIngester(str(tmp_path), capacity=1 << 16, segment_records=len(timestamps) // 2 + 1, sink=None,
+                             **({'retention': retention} if retention else {}))
+    ingester.ingest('cam-1', timestamps, counts)
+    ingester.stop()
+    return ingester, ingester.compact(now=now)
+
+
+def test_compaction_keeps_the_rollups_a_replay_builds(tmp_path):
+    rng = np.random.default_rng(3)
+    timestamps = np.sort(rng.integers(T0, T0 + 40 * 86400, 5000))
+    counts = rng.integers(0, 50, 5000)
+    now = T0 + 40 * 86400
+    ingester, removed = compacted_log(tmp_path, timestamps, counts, now)
+    assert removed > 0
+    # recompacting straight away finds nothing to do
+    assert ingester.compact(now=now) == 0
+
+    expected, replayed = TimeSeriesStore(), TimeSeriesStore()
+    expected.add('cam-1', timestamps, counts)
+    for camera_id, ts, cs in SegmentLog.replay(str(tmp_path / '0')):
+        replayed.add(camera_id, ts, cs)
+    for resolution in (3600, 86400):
+        a, b = expected.range('cam-1', resolution), replayed.range('cam-1', resolution)
+        assert np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1])
+    # events within the minute rollup's retention stay as recorded
+    (_, ts, _), = SegmentLog.replay(str(tmp_path / '0'))
+    assert (ts[ts >= now - 14 * 86400] % 60).any()
+
+
+def test_compaction_deletes_segments_no_rollup_keeps(tmp_path):
+    timestamps = T0 + np.arange(100) * 60
+    retention = {60: 86400, 3600: 86400, 86400: 86400}
+    ingester, removed = compacted_log(tmp_path, timestamps, np.ones(100), T0 + 10 * 86400, retention)
+    assert removed == 51
+    assert len(list((tmp_path / '0').glob('segment-*.log'))) == 1
@@ -0,0 +1,182 @@
+import asyncio
+import json
+
+from launcher import COOKIE_NAME, STATS_PATH, Balancer, Worker, _header, _set_header
+
+
+class FakeProcess:
+    pid = 1
+    returncode = None
+
+    def poll(self):
+        return self.returncode
+
+
+def make_workers(ports):
+    workers = [Worker(i, port, {}) for i, port in enumerate(ports)]
+    for worker in workers:
+        worker.process = FakeProcess()
+    return workers
+
+
+async def fake_worker(index: int, seen: list):
+    """
+    A worker that answers every request with its index and closes, as
+    uvicorn does for a request sent with Connection: close.
+    """
+    async def handle(reader, writer):
+        head = await reader.readuntil(b'\r\n\r\n')
+        seen.append((index, head))
+        body = str(index).encode()
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: ' + str(len(body)).encode()
+                     + b'\r\nConnection: close\r\n\r\n' + body)
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+async def request(port: int, head: bytes) -> bytes:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(head)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def run_balanced(scenario):
+    async def main():
+        seen = []
+        servers = [await fake_worker(i, seen) for i in range(3)]
+        workers = make_workers([s.sockets[0].getsockname()[1] for s in servers])
+        balancer = Balancer(workers)
+        server = await asyncio.start_server(balancer.handle, '127.0.0.1', 0)
+        try:
+            return await scenario(server.sockets[0].getsockname()[1], seen)
+        finally:
+            server.close()
+            for s in servers:
+                s.close()
+    return asyncio.run(main())
+
+
+def test_set_header_replaces_every_copy():
+    head = b'GET / HTTP/1.1\r\nX-Forwarded-For: 1.2.3.4\r\nHost: a\r\nx-forwarded-for: 5.6.7.8\r\n\r\n'
+    head = _set_header(head, b'X-Forwarded-For', b'10.0.0.1')
+    assert head.count(b'orwarded') == 1
+    assert _header(head, b'x-forwarded-for') == b'10.0.0.1'
+    assert _header(head, b'host') == b'a' and head.endswith(b'\r\n\r\n')
+
+
+def test_pick_prefers_cookie_and_falls_back_to_ip_hash():
+    workers = make_workers([1, 2, 3])
+    balancer = Balancer(workers)
+    head = f'GET / HTTP/1.1\r\nCookie: a=b; {COOKIE_NAME}=2\r\n\r\n'.encode()
+    assert balancer.pick(head, '1.2.3.4') == (workers[2], False)
+    worker, set_cookie = balancer.pick(b'GET / HTTP/1.1\r\n\r\n', '1.2.3.4')
+    assert set_cookie and balancer.pick(b'GET / HTTP/1.1\r\n\r\n', '1.2.3.4')[0] is worker
+    # a cookie naming an unknown worker is ignored
+    head = f'GET / HTTP/1.1\r\nCookie: {COOKIE_NAME}=9\r\n\r\n'.encode()
+    assert balancer.pick(head, '1.2.3.4') == (worker, True)
+
+
+def test_every_request_is_routed_and_forwarded_for_is_replaced():
+    async def scenario(port, seen):
+        first = await request(port, b'GET / HTTP/1.1\r\nHost: a\r\nX-Forwarded-For: 6.6.6.6\r\n'
+                                    b'Connection: keep-alive\r\n\r\n')
+        sticky = await request(port, f'GET / HTTP/1.1\r\nHost: a\r\nCookie: {COOKIE_NAME}=1\r\n\r\n'.encode())
+        return first, sticky
+
+    first, sticky = run_balanced(scenario)
+    assert f'Set-Cookie: {COOKIE_NAME}='.encode() in first
+    assert sticky.endswith(b'\r\n\r\n1') and b'Set-Cookie' not in sticky
+
+
+def test_upstream_sees_peer_address_and_connection_close():
+    async def scenario(port, seen):
+        await request(port, b'GET / HTTP/1.1\r\nHost: a\r\nX-Forwarded-For: 6.6.6.6\r\n'
+                            b'Connection: keep-alive\r\n\r\n')
+        return seen
+
+    (_, head), = run_balanced(scenario)
+    assert _header(head, b'x-forwarded-for') == b'127.0.0.1'
+    assert _header(head, b'connection') == b'close'
+
+
+def test_keep_alive_requests_are_not_piped_past_routing():
+    async def scenario(port, seen):
+        # two requests on one connection; only the first is forwarded
+        both = (b'GET /a HTTP/1.1\r\nHost: a\r\n\r\n'
+                + f'GET /b HTTP/1.1\r\nHost: a\r\nCookie: {COOKIE_NAME}=2\r\n\r\n'.encode())
+        response = await request(port, both)
+        return response, seen
+
+    response, seen = run_balanced(scenario)
+    assert response.count(b'HTTP/1.1 200') == 1
+    assert [head.split(b' ')[1] for _, head in seen] == [b'/a']
+
+
+def test_the_public_port_does_not_serve_launcher_stats():
+    async def scenario(port, seen):
+        response = await request(port, f'GET {STATS_PATH} HTTP/1.1\r\nHost: a\r\n\r\n'.encode())
+        return response, seen
+
+    response, seen = run_balanced(scenario)
+    # proxied to a worker like any other path
+    assert b'"workers"' not in response
+    assert [head.split(b' ')[1] for _, head in seen] == [STATS_PATH.encode()]
+
+
+def test_stats_listener_reports_workers():
+    async def main():
+        balancer = Balancer(make_workers([8101, 8102]))
+        server = await asyncio.start_server(balancer.handle_stats, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            stats = await request(port, f'GET {STATS_PATH} HTTP/1.1\r\n\r\n'.encode())
+            other = await request(port, b'GET / HTTP/1.1\r\n\r\n')
+        finally:
+            server.close()
+        return stats, other
+
+    stats, other = asyncio.run(main())
+    assert [w['port'] for w in json.loads(stats.split(b'\r\n\r\n', 1)[1])['workers']] == [8101, 8102]
+    assert other.startswith(b'HTTP/1.1 404')
+
+
+class CrashingWorker(Worker):
+    def start(self):
+        self.process = FakeProcess()
+        self.started_at = self.clock
+
+
+def test_restarts_back_off_exponentially_up_to_the_cap():
+    worker = CrashingWorker(0, 8100, {})
+    worker.clock = 0.0
+    worker.start()
+    balancer = Balancer([worker], restart_delay=1.0, max_restart_delay=8.0)
+    restarted_at = []
+    for tick in range(60):
+        worker.clock = float(tick)
+        if worker.process.returncode is None and tick - worker.started_at >= 0.5:
+            worker.process.returncode = 1  # crashes right after starting
+        restarts = worker.restarts
+        balancer.restart_exited(worker.clock)
+        if worker.restarts > restarts:
+            restarted_at.append(tick)
+    gaps = [b - a for a, b in zip(restarted_at, restarted_at[1:])]
+    # each gap is the tick it takes to notice the exit plus a delay of 2, 4, 8, then 8 (capped) s
+    assert gaps[:4] == [3, 5, 9, 9]
+    assert max(gaps) == 9
+
+
+def test_a_worker_that_stayed_up_restarts_quickly_again():
+    worker = CrashingWorker(0, 8100, {})
+    worker.clock = 0.0
+    worker.start()
+    worker.crashes = 5
+    balancer = Balancer([worker], restart_delay=1.0, max_restart_delay=8.0)
+    worker.process.returncode = 1
+    balancer.restart_exited(100.0)
+    assert worker.restart_at == 101.0 and worker.crashes == 1
@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from media_cache import MediaCache, MediaError
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, content_type: str = 'video/mp4', status_code: int = 200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {'Content-Type': content_type, **(headers or {})}
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeSession:
+    def __init__(self, responses=None):
+        self.fetches = []
+        self.responses = responses or {}
+
+    def get(self, url, stream, timeout, allow_redirects=True):
+        assert not allow_redirects
+        self.fetches.append(url)
+        return self.responses.get(url) or FakeResponse(url.encode() * 100)
+
+
+def make_cache(tmp_path, **kwargs) -> MediaCache:
+    return MediaCache(str(tmp_path), allowed_hosts=('media.test',), session=FakeSession(), **kwargs)
+
+
+def test_fetches_once_and_rejects_other_hosts(tmp_path):
+    cache = make_cache(tmp_path)
+    path, meta = cache.get('https://media.test/a.mp4')
+    assert cache.get('https://media.test/a.mp4')[0] == path
+    assert meta['content_type'] == 'video/mp4'
+    assert cache.session.fetches == ['https://media.test/a.mp4']
+    with pytest.raises(MediaError) as e:
+        cache.get('https://elsewhere.test/a.mp4')
+    assert e.value.status_code == 403
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=5000)
+    a, _ = cache.get('https://media.test/a.mp4')
+    b, _ = cache.get('https://media.test/b.mp4')
+    cache.get('https://media.test/a.mp4')
+    cache.get('https://media.test/c.mp4')
+    assert os.path.exists(a) and not os.path.exists(b)
+    assert cache.stats()['bytes'] <= 5000
+
+
+def test_forget_refetches_a_missing_file(tmp_path):
+    cache = make_cache(tmp_path)
+    path, _ = cache.get('https://media.test/a.mp4')
+    os.remove(path)
+    cache.forget('https://media.test/a.mp4')
+    assert os.path.exists(cache.get('https://media.test/a.mp4')[0])
+    assert len(cache.session.fetches) == 2
+
+
+def redirect(location: str) -> FakeResponse:
+    return FakeResponse(b'', status_code=302, headers={'Location': location})
+
+
+def test_redirects_are_followed_only_to_allowed_hosts(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.session.responses = {
+        'https://media.test/moved.mp4': redirect('/a.mp4'),
+        'https://media.test/away.mp4': redirect('http://169.254.169.254/latest/meta-data'),
+    }
+    path, _ = cache.get('https://media.test/moved.mp4')
+    with open(path, 'rb') as f:
+        assert f.read() == b'https://media.test/a.mp4' * 100
+    with pytest.raises(MediaError) as e:
+        cache.get('https://media.test/away.mp4')
+    assert e.value.status_code == 403
+    assert cache.session.fetches == ['https://media.test/moved.mp4', 'https://media.test/a.mp4',
+                                     'https://media.test/away.mp4']
+
+
+def test_redirect_loops_are_cut_short(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.session.responses = {'https://media.test/loop.mp4': redirect('/loop.mp4')}
+    with pytest.raises(MediaError):
+        cache.get('https://media.test/loop.mp4')
+
+
+@pytest.mark.parametrize('headers', [{}, {'Content-Length': '1000'}, {'Content-Length': '10'}])
+def test_downloads_past_the_size_cap_are_abandoned(tmp_path, headers):
+    cache = make_cache(tmp_path, max_download_bytes=100)
+    response = FakeResponse(b'x' * 1000, headers=headers)
+    cache.session.responses = {'https://media.test/big.mp4': response}
+    with pytest.raises(MediaError):
+        cache.get('https://media.test/big.mp4')
+    assert response.closed
+    assert os.listdir(tmp_path) == []
+    assert cache.stats()['files'] == 0
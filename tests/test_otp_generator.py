@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from otp_generator import ReplayGuard, TOTPGenerator
+from otp_sqlite import SQLiteReplayGuard
+
+SECRET = b'test-secret'
+
+
+def wrong(code: str) -> str:
+    return str((int(code) + 1) % 10 ** len(code)).zfill(len(code))
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def guard(request, tmp_path):
+    if request.param == 'memory':
+        yield ReplayGuard()
+    else:
+        guard = SQLiteReplayGuard(path=str(tmp_path / 'otp.sqlite3'))
+        yield guard
+        guard.close()
+
+
+def test_accepts_current_and_past_windows_only(guard):
+    totp = TOTPGenerator(SECRET, step=60, drift=1, replay_guard=guard)
+    now = time.time()
+    assert totp.verify('a@x', totp.generate('a@x', at=now - 60), at=now)
+    assert not totp.verify('b@x', totp.generate('b@x', at=now - 120), at=now)
+    assert not totp.verify('c@x', totp.generate('c@x', at=now + 60), at=now)
+    assert totp.verify('d@x', totp.generate('d@x', at=now), at=now)
+
+
+def test_code_is_single_use(guard):
+    totp = TOTPGenerator(SECRET, replay_guard=guard)
+    code = totp.generate('a@x')
+    assert totp.verify('a@x', code)
+    assert not totp.verify('a@x', code)
+    assert not totp.verify(' A@X ', code)
+
+
+def test_lockout_after_max_attempts(guard):
+    totp = TOTPGenerator(SECRET, max_attempts=3, replay_guard=guard)
+    code = totp.generate('a@x')
+    for _ in range(3):
+        assert not totp.verify('a@x', wrong(code))
+    assert guard.failures('a@x') == 3
+    # even the right code is refused while locked out
+    assert not totp.verify('a@x', code)
+    # other emails are unaffected
+    assert totp.verify('b@x', totp.generate('b@x'))
+
+
+def test_success_clears_failures(guard):
+    totp = TOTPGenerator(SECRET, max_attempts=3, replay_guard=guard)
+    assert not totp.verify('a@x', wrong(totp.generate('a@x')))
+    assert totp.verify('a@x', totp.generate('a@x'))
+    assert guard.failures('a@x') == 0
+
+
+def test_failures_expire(guard):
+    guard.fail('a@x', time.time() - 1)
+    assert guard.failures('a@x') == 0
+    assert guard.fail('a@x', time.time() + 60) == 1
+
+
+def test_sqlite_guard_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'otp.sqlite3')
+    workers = [TOTPGenerator(SECRET, max_attempts=2, replay_guard=SQLiteReplayGuard(path=path)) for _ in range(2)]
+    code = workers[0].generate('a@x')
+    assert workers[0].verify('a@x', code)
+    assert not workers[1].verify('a@x', code)
+
+    code = workers[0].generate('b@x')
+    assert not workers[0].verify('b@x', wrong(code))
+    assert not workers[1].verify('b@x', wrong(code))
+    assert not workers[0].verify('b@x', code)
+    for worker in workers:
+        worker.replay_guard.close()
+
+
+def test_no_code_is_resent_in_a_window_whose_code_was_used(guard):
+    totp = TOTPGenerator(SECRET, step=60, drift=1, replay_guard=guard)
+    now = time.time()
+    assert totp.retry_after('a@x', at=now) == 0
+    assert totp.expires_at(at=now) == (now // 60 + 2) * 60
+    assert totp.verify('a@x', totp.generate('a@x', at=now), at=now)
+    # the same code would come out again and be refused as a replay
+    assert totp.retry_after(' A@X', at=now) == pytest.approx((now // 60 + 1) * 60 - now)
+    assert totp.retry_after('b@x', at=now) == 0
@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from otp_store import OTPBackend, OTPStore
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        OTPBackend()
+
+
+def test_verify_consumes_and_burns():
+    store = OTPStore(max_attempts=3)
+    store.put('a@x', '123456')
+    assert store.verify('a@x', '123456')
+    assert not store.verify('a@x', '123456')
+
+    store.put('b@x', '123456')
+    assert not store.verify('b@x', '000000')
+    assert not store.verify('b@x', '000001')
+    assert not store.verify('b@x', '000002')
+    assert store.peek('b@x') is None
+
+
+def test_expired_entries_are_evicted():
+    store = OTPStore(ttl=-1)
+    store.put('a@x', '123456')
+    assert store.peek('a@x') is None
+    assert store.stats()['evicted_expired'] == 1
+
+
+def test_eviction_counters_under_concurrency():
+    store = OTPStore(max_entries=16, stripes=4)
+
+    def put_many(worker):
+        for i in range(2000):
+            store.put(f'{worker}-{i}@x', '123456')
+
+    threads = [threading.Thread(target=put_many, args=(w,)) for w in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = store.stats()
+    assert stats['entries'] == len(store) <= store.max_entries
+    assert stats['evicted_lru'] == 8 * 2000 - stats['entries']
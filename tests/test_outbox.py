@@ -0,0 +1,113 @@
+import asyncio
+import sqlite3
+import time
+
+from outbox import DEAD, QUEUED, RETRYING, SENDING, SENT, DeliveryWorkers, Outbox
+
+
+def make_outbox(tmp_path, **kwargs) -> Outbox:
+    return Outbox(path=str(tmp_path / 'outbox.sqlite3'), **kwargs)
+
+
+def test_claim_leases_a_message_once(tmp_path):
+    outbox = make_outbox(tmp_path)
+    message_id = outbox.enqueue('a@x', '123456')
+    assert outbox.status(message_id)['status'] == QUEUED
+    row = outbox.claim()
+    assert row[:4] == (message_id, 'a@x', '123456', 0)
+    assert outbox.status(message_id)['status'] == SENDING
+    assert outbox.claim() is None
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    outbox = make_outbox(tmp_path, lease_seconds=0.05)
+    message_id = outbox.enqueue('a@x', '123456')
+    assert outbox.claim()[0] == message_id
+    time.sleep(0.1)
+    # the first sender is presumed dead; another worker picks the message up
+    assert outbox.claim()[0] == message_id
+
+
+def test_retry_backoff_and_dead_letter(tmp_path):
+    outbox = make_outbox(tmp_path, max_attempts=2, backoff_base=60, backoff_max=60)
+    message_id = outbox.enqueue('a@x', '123456')
+    outbox.claim()
+    assert outbox.mark_failed(message_id, 1, 'smtp down') == RETRYING
+    status = outbox.status(message_id)
+    assert (status['status'], status['attempts'], status['last_error']) == (RETRYING, 1, 'smtp down')
+    assert outbox.mark_failed(message_id, 2, 'smtp down') == DEAD
+    assert outbox.claim() is None
+
+
+def test_backoff_is_capped(tmp_path):
+    outbox = make_outbox(tmp_path, backoff_base=1, backoff_max=5)
+    assert all(0 <= outbox.backoff(attempts) <= 5 for attempts in range(1, 20))
+
+
+def test_sent_messages_drop_the_code_and_are_purged(tmp_path):
+    outbox = make_outbox(tmp_path, retention_seconds=0)
+    message_id = outbox.enqueue('a@x', '123456')
+    outbox.claim()
+    outbox.mark_sent(message_id, 1)
+    assert outbox.status(message_id)['status'] == SENT
+    assert outbox.purge() == 1
+    assert outbox.status(message_id) is None
+
+
+def test_delivery_workers_drain_the_queue(tmp_path):
+    outbox = make_outbox(tmp_path, backoff_base=0.01, backoff_max=0.01)
+    delivered, results = [], []
+
+    def deliver(email, otp):
+        delivered.append(email)
+        # the first attempt for b@x fails and is retried
+        return not (email == 'b@x' and delivered.count('b@x') == 1)
+
+    async def run():
+        workers = DeliveryWorkers(outbox, deliver, workers=2, poll_seconds=0.01,
+                                  on_result=lambda state, _: results.append(state))
+        workers.start()
+        ids = [outbox.enqueue(email, '123456') for email in ('a@x', 'b@x', 'c@x')]
+        for _ in range(200):
+            # a message is SENT in the outbox just before its worker reports it
+            if all(outbox.status(i)['status'] == SENT for i in ids) and results.count(SENT) == 3:
+                break
+            await asyncio.sleep(0.01)
+        await workers.stop()
+        return ids
+
+    ids = asyncio.run(run())
+    assert [outbox.status(i)['status'] for i in ids] == [SENT] * 3
+    assert sorted(delivered) == ['a@x', 'b@x', 'b@x', 'c@x']
+    assert results.count(RETRYING) == 1 and results.count(SENT) == 3
+
+
+def test_expired_messages_are_dead_lettered_not_delivered(tmp_path):
+    outbox = make_outbox(tmp_path, backoff_base=0.01, backoff_max=0.01)
+    expired = outbox.enqueue('a@x', '123456', expires_at=time.time() - 1)
+    live = outbox.enqueue('b@x', '654321', expires_at=time.time() + 60)
+    assert outbox.claim()[0] == live
+    assert outbox.claim() is None
+    status = outbox.status(expired)
+    assert (status['status'], status['last_error']) == (DEAD, 'expired')
+
+    # a retry that comes due after the code expired is not sent either
+    retried = outbox.enqueue('c@x', '111111', expires_at=time.time() + 0.05)
+    outbox.claim()
+    outbox.mark_failed(retried, 1, 'smtp down')
+    time.sleep(0.1)
+    assert outbox.claim() is None
+    assert outbox.status(retried)['status'] == DEAD
+
+
+def test_spools_without_an_expiry_column_are_migrated(tmp_path):
+    path = tmp_path / 'outbox.sqlite3'
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE outbox (id TEXT PRIMARY KEY, email TEXT NOT NULL, otp TEXT, status TEXT NOT NULL,'
+                 ' attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, created_at REAL NOT NULL,'
+                 ' updated_at REAL NOT NULL, last_error TEXT)')
+    conn.execute("INSERT INTO outbox VALUES ('old', 'a@x', '123456', 'queued', 0, 0, 0, 0, NULL)")
+    conn.commit()
+    conn.close()
+    outbox = Outbox(path=str(path))
+    assert outbox.claim()[0] == 'old'
@@ -0,0 +1,96 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from campaign_repository import CampaignRepository
+from report_pipeline import DAY, HOUR, RECENT_HOURS, ReportJob, ReportPipeline, compute_report, empty_state, update_camera
+from timeseries import TimeSeriesStore
+
+T0 = 1_700_000_000 // DAY * DAY
+
+
+def hourly(hours: int, start: int = T0, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    buckets = start + np.arange(hours, dtype=np.int64) * HOUR
+    return buckets, rng.poisson(40, hours).astype(np.int64)
+
+
+def test_incremental_folding_matches_one_update_with_the_whole_history():
+    hours, counts = hourly(30 * 24)
+    state = empty_state()
+    for lo in range(0, len(hours), 50):
+        # each update resends the last two hours, as a run does for late counts
+        since = int(state.hours[-1]) - 2 * HOUR if len(state.hours) else 0
+        start = np.searchsorted(hours, since) if since else 0
+        state = update_camera(state, since, hours[start:lo + 50], counts[start:lo + 50])
+    full = update_camera(empty_state(), 0, hours, counts)
+
+    assert np.array_equal(state.hours, full.hours)
+    assert len(state.hours) <= RECENT_HOURS + 1
+    assert np.allclose(state.baseline_sum, full.baseline_sum)
+    assert np.array_equal(state.baseline_hours, full.baseline_hours)
+    assert (state.folded_total, state.folded_days, state.last_folded_day) == \
+           (full.folded_total, full.folded_days, full.last_folded_day)
+    assert state.folded_total + state.counts.sum() == counts.sum()
+
+
+def test_late_counts_replace_the_trailing_hours():
+    hours, counts = hourly(10)
+    state = update_camera(empty_state(), 0, hours, counts)
+    state = update_camera(state, int(hours[-2]), hours[-2:], np.array([0, 1000]))
+    assert state.counts[-2:].tolist() == [0, 1000]
+    assert state.counts.sum() == counts[:-2].sum() + 1000
+
+
+def test_report_totals():
+    hours, counts = hourly(20 * 24)
+    _, report = compute_report(ReportJob('c1', 1, {}, {'c1-cam1': (0, hours, counts), 'c1-cam2': (0, hours, counts)}))
+    assert report.volume_total == 2 * counts.sum()
+    assert report.volume_7d == 2 * counts[-7 * 24:].sum()
+    assert report.daily_reports == 2 * 20
+    assert report.watermark == hours[-1]
+    assert report.baseline_7d is not None
+
+
+@pytest.fixture
+def pipeline_parts(tmp_path):
+    path = tmp_path / 'campaigns.csv'
+    path.write_text('campaign_id,description,area,status,cameras,reports\nc1,One,Area,open,2,0\n')
+    store = TimeSeriesStore()
+    hours, counts = hourly(30 * 24)
+    for camera_id in ('c1-cam1', 'c1-cam2'):
+        store.add(camera_id, hours, counts)
+    return CampaignRepository(str(path)), store, str(tmp_path / 'reports')
+
+
+def test_cached_states_let_the_first_run_after_a_restart_stay_incremental(pipeline_parts):
+    repository, store, cache_dir = pipeline_parts
+    pipeline = ReportPipeline(repository, store, workers=1, cache_dir=cache_dir, start_method='spawn')
+    try:
+        assert asyncio.run(pipeline.run_once()) == 1
+    finally:
+        asyncio.run(pipeline.stop())
+    before = pipeline.latest('c1')
+
+    restarted = ReportPipeline(repository, store, workers=1, cache_dir=cache_dir)
+    assert restarted.latest('c1') == before
+    job = restarted._job(repository.get('c1'))
+    # only the hours from just before the cached watermark are shipped again
+    assert all(since == before.watermark - 2 * HOUR and len(hours) == 3 for since, hours, _ in job.new.values())
+    states, report = compute_report(job)
+    assert report.volume_total == before.volume_total
+    assert report.variance_7d == pytest.approx(before.variance_7d)
+
+
+def test_concurrent_saves_never_share_a_temporary_file(pipeline_parts):
+    repository, store, cache_dir = pipeline_parts
+    pipeline = ReportPipeline(repository, store, cache_dir=cache_dir)
+    hours, counts = hourly(24)
+    states, report = compute_report(ReportJob('c1', 1, {}, {'c1-cam1': (0, hours, counts)}))
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda _: pipeline._save([(report, states)]), range(32)))
+    assert sorted(os.listdir(cache_dir)) == ['c1.v2.json']
+    assert ReportPipeline(repository, store, cache_dir=cache_dir).latest('c1') == report
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from interval_tree import IntervalTree
+from schedules import ScheduleConflict, ScheduleStore, Slot
+
+
+def slot(slot_id, resource, start, end, area='A', campaign_id='c1'):
+    return Slot(slot_id, resource, area, campaign_id, start, end)
+
+
+def test_interval_tree_overlap_matches_brute_force():
+    rng = random.Random(1)
+    intervals = []
+    for n in range(500):
+        start = rng.randrange(0, 10000)
+        intervals.append((start, start + rng.randrange(1, 300), n, None))
+    tree = IntervalTree(intervals, seed=1)
+    for n in range(0, 500, 3):
+        tree.remove(intervals[n][0], n)
+    alive = [iv for iv in intervals if iv[2] % 3]
+    for _ in range(200):
+        start = rng.randrange(0, 10000)
+        end = start + rng.randrange(1, 500)
+        expected = sorted(iv[2] for iv in alive if iv[0] < end and start < iv[1])
+        assert sorted(i.item_id for i in tree.overlap(start, end)) == expected
+    pairs = {tuple(sorted((a.item_id, b.item_id))) for a, b in tree.overlapping_pairs()}
+    expected = {(a[2], b[2]) for a in alive for b in alive if a[2] < b[2] and a[0] < b[1] and b[0] < a[1]}
+    assert pairs == expected
+
+
+def test_add_rejects_conflicts_unless_allowed():
+    store = ScheduleStore()
+    store.add(slot('a', 'cam', 0, 100))
+    with pytest.raises(ScheduleConflict) as e:
+        store.add(slot('b', 'cam', 50, 150))
+    assert [c.slot_id for c in e.value.conflicts] == ['a']
+    store.add(slot('b', 'cam', 50, 150), allow_conflicts=True)
+    assert [s.slot_id for s in store.conflicts('cam', 50, 150, exclude='b')] == ['a']
+
+
+def test_remove_cleans_up_areas_owners_and_trees():
+    store = ScheduleStore()
+    store.bulk_import([slot('a', 'cam-1', 0, 100, area='North', campaign_id='c1'),
+                       slot('b', 'cam-1', 200, 300, area='South', campaign_id='c2'),
+                       slot('c', 'cam-2', 0, 100, area='North', campaign_id='c3')])
+    assert store.resources('South') == ['cam-1'] and store.owner('cam-1') == ('South', 'c2')
+
+    store.remove('b')
+    assert store.areas() == ['North']
+    assert store.owner('cam-1') == ('North', 'c1')
+    assert not store.in_area('cam-1', 'South') and store.in_area('cam-1', 'North')
+
+    store.remove('a')
+    assert store.resources() == ['cam-2'] and store.owner('cam-1') is None
+    assert store.window(0, 1000) == {'cam-2': [store.slots['c']]}
+    assert store.remove('a') is None
+
+
+def test_window_and_resource_window():
+    store = ScheduleStore()
+    store.bulk_import([slot('a', 'cam-1', 0, 100), slot('b', 'cam-1', 500, 600),
+                       slot('c', 'cam-2', 50, 80, area='B')])
+    assert {r: [s.slot_id for s in slots] for r, slots in store.window(0, 200).items()} == \
+        {'cam-1': ['a'], 'cam-2': ['c']}
+    assert list(store.window(0, 200, area='B')) == ['cam-2']
+    assert [s.slot_id for s in store.resource_window('cam-1', 90, 510)] == ['a', 'b']
+    assert store.resource_window('nope', 0, 10) == []
+
+
+def test_owner_follows_the_order_slots_were_added():
+    store = ScheduleStore()
+    store.bulk_import([slot('a', 'cam', 500, 600, campaign_id='c1'),
+                       slot('b', 'cam', 0, 100, campaign_id='c2')])
+    store.add(slot('c', 'cam', 200, 300, campaign_id='c3'))
+    store.add(slot('d', 'cam', 700, 800, campaign_id='c2'))
+    assert store.owner('cam') == ('A', 'c2')
+    store.remove('d')
+    assert store.owner('cam') == ('A', 'c3')
+    # not the owning slot: the owner stays
+    store.remove('a')
+    assert store.owner('cam') == ('A', 'c3')
+    store.remove('c')
+    assert store.owner('cam') == ('A', 'c2')
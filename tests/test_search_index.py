@@ -0,0 +1,45 @@
+import time
+
+from campaign_repository import CampaignRepository
+from search_index import CampaignSearch, Document, SearchIndex
+
+HEADER = 'campaign_id,description,area,status,cameras,reports\n'
+
+
+def write_campaigns(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(HEADER + ''.join(rows))
+
+
+def test_prefix_exact_and_fuzzy_matches():
+    index = SearchIndex()
+    index.add(Document('1', 'area', 'Rivonia Road', 'Sandton', '/a'))
+    index.add(Document('2', 'area', 'William Mooi Road', 'Western Bypass', '/b'))
+    assert [hit.doc.doc_id for hit in index.search('riv')] == ['1']
+    assert [hit.doc.doc_id for hit in index.search('rivnia')] == ['1']
+    assert {hit.doc.doc_id for hit in index.search('road')} == {'1', '2'}
+    assert [hit.doc.doc_id for hit in index.search('road wes')] == ['2']
+    assert index.search('road', kinds={'camera'}) == []
+
+
+def test_remove_drops_document_and_vocabulary():
+    index = SearchIndex()
+    index.add(Document('1', 'area', 'Rivonia', '', '/a'))
+    index.remove('1')
+    assert index.search('rivonia') == [] and index.vocabulary_size == 0
+
+
+def test_changed_campaigns_are_reindexed_off_the_query_path(tmp_path):
+    path = str(tmp_path / 'campaigns.csv')
+    write_campaigns(path, ['c1,Old road,Rivonia,open,1,0\n'])
+    search = CampaignSearch(CampaignRepository(path, check_interval=0))
+    assert search.search('rivonia', kinds={'campaign'})[0].doc.doc_id == 'campaign:c1'
+
+    write_campaigns(path, ['c1,New road,Sandton,open,1,0\n'])
+    # the query that notices the change still answers from the current index
+    search.search('sandton')
+    deadline = time.monotonic() + 5
+    while not search.search('sandton') and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert search.search('sandton', kinds={'campaign'})[0].doc.doc_id == 'campaign:c1'
+    assert search.search('rivonia') == []
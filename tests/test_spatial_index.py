@@ -0,0 +1,125 @@
+import math
+import random
+
+import pytest
+
+from spatial_index import BASE_ZOOM, Camera, SpatialIndex, _cells, distance_m, project, view_rect
+
+
+def camera(n: int, lat: float, lon: float) -> Camera:
+    return Camera(f'cam{n}', 'c1', 'road', f'Camera {n}', lat, lon)
+
+
+def scattered(seed: int = 7):
+    rng = random.Random(seed)
+    points = []
+    # dense city clusters plus a few spread over the world and around the antimeridian
+    for lat, lon in ((51.5, -0.1), (-26.2, 28.0), (40.7, -74.0)):
+        points += [(lat + rng.uniform(-0.2, 0.2), lon + rng.uniform(-0.2, 0.2)) for _ in range(300)]
+    points += [(rng.uniform(-60, 60), rng.uniform(-180, 180)) for _ in range(100)]
+    points += [(rng.uniform(-20, 20), rng.choice((-1, 1)) * rng.uniform(179, 180)) for _ in range(50)]
+    return [camera(n, lat, lon) for n, (lat, lon) in enumerate(points)]
+
+
+@pytest.fixture
+def cameras():
+    return scattered()
+
+
+@pytest.fixture
+def index(cameras):
+    index = SpatialIndex()
+    for c in cameras:
+        index.insert(c)
+    return index
+
+
+def projected_distance(a: Camera, lat: float, lon: float) -> float:
+    (ax, ay), (qx, qy) = project(a.lat, a.lon), project(lat, lon)
+    dx = abs(ax - qx)
+    return math.hypot(min(dx, 1 - dx), ay - qy)
+
+
+@pytest.mark.parametrize('box', [
+    (51.4, -0.2, 51.6, 0.0),
+    (-30, 20, -20, 30),
+    (-60, -180, 60, 180),
+    (-20, 179.5, 20, -179.5),  # crosses the antimeridian
+])
+def test_bbox_matches_brute_force(index, cameras, box):
+    south, west, north, east = box
+
+    def inside(c):
+        in_lon = west <= c.lon <= east if west <= east else c.lon >= west or c.lon <= east
+        return south <= c.lat <= north and in_lon
+
+    assert {c.camera_id for c in index.bbox(*box)} == {c.camera_id for c in cameras if inside(c)}
+    assert len(index.bbox(*box, limit=3)) == min(3, sum(map(inside, cameras)))
+
+
+def test_nearest_matches_brute_force(index, cameras):
+    rng = random.Random(1)
+    queries = [(51.5, -0.1), (0.0, 179.99), (10.0, -179.99), (-26.1, 28.1)]
+    queries += [(rng.uniform(-60, 60), rng.uniform(-180, 180)) for _ in range(20)]
+    for lat, lon in queries:
+        found = index.nearest(lat, lon, k=5)
+        expected = sorted(cameras, key=lambda c: projected_distance(c, lat, lon))[:5]
+        assert [c.camera_id for _, c in found] == [c.camera_id for c in expected]
+        assert all(metres == pytest.approx(distance_m(lat, lon, c.lat, c.lon)) for metres, c in found)
+
+
+def test_nearest_looks_across_the_antimeridian():
+    index = SpatialIndex()
+    index.insert(camera(1, 0.0, 179.99))
+    index.insert(camera(2, 0.0, -179.0))
+    (metres, nearest), = index.nearest(0.0, -179.99)
+    assert nearest.camera_id == 'cam1'
+    assert metres < 3000
+
+
+@pytest.mark.parametrize('center,zoom', [((51.5, -0.1), 9), ((51.5, -0.1), 12), ((0, 0), 2), ((-26.2, 28.0), BASE_ZOOM)])
+def test_view_clusters_add_up_to_the_cameras_in_view(index, cameras, center, zoom):
+    width, height = 1200, 800
+    x0, y0, x1, y1 = view_rect(center, zoom, width, height)
+    n = _cells(zoom)
+
+    def cell_in_view(c):
+        x, y = project(c.lat, c.lon)
+        i, j = int(x * n), int(y * n)
+        return max(0, int(x0 * n)) <= i <= min(n - 1, int(x1 * n)) and max(0, int(y0 * n)) <= j <= min(n - 1, int(y1 * n))
+
+    markers = index.view(center, zoom, width, height)
+    assert sum(m.count for m in markers) == sum(map(cell_in_view, cameras))
+    assert len({m.key for m in markers}) == len(markers)
+    assert all((m.camera is not None) == (m.count == 1) for m in markers)
+
+
+def levels(index: SpatialIndex):
+    return ({key: sorted(c.camera_id for c in members) for key, members in index._base.items()},
+            [{key: (cell[0], round(cell[1], 9), round(cell[2], 9)) for key, cell in level.items()}
+             for level in index._levels])
+
+
+def test_insert_and_remove_keep_every_level_consistent(cameras):
+    rng = random.Random(3)
+    index = SpatialIndex()
+    live = {}
+    for step in range(3000):
+        c = rng.choice(cameras)
+        if c.camera_id in live and rng.random() < 0.5:
+            index.remove(c.camera_id)
+            del live[c.camera_id]
+        else:
+            # reinserting an id moves the camera
+            moved = c._replace(lat=c.lat + rng.uniform(-1, 1))
+            index.insert(moved)
+            live[c.camera_id] = moved
+    rebuilt = SpatialIndex()
+    for c in live.values():
+        rebuilt.insert(c)
+    assert len(index) == len(live)
+    assert levels(index) == levels(rebuilt)
+
+    for camera_id in list(live):
+        index.remove(camera_id)
+    assert index._base == {} and all(level == {} for level in index._levels)
@@ -0,0 +1,67 @@
+import numpy as np
+
+from timeseries import DAY, HOUR, MINUTE, Rollup, TimeSeriesStore, lttb
+
+
+def reference(timestamps, counts, resolution):
+    buckets = timestamps - timestamps % resolution
+    unique = np.unique(buckets)
+    return unique, np.array([counts[buckets == b].sum() for b in unique])
+
+
+def test_rollups_match_a_full_recompute_with_late_counts():
+    rng = np.random.default_rng(1)
+    store = TimeSeriesStore(retention={})
+    all_ts, all_counts = [], []
+    for batch in range(50):
+        # mostly increasing batches with some late counts mixed in
+        base = batch * 600 - (rng.integers(0, 3000) if batch % 7 == 0 else 0)
+        ts = np.sort(base + rng.integers(0, 600, 40))
+        counts = rng.integers(0, 20, 40)
+        store.add('cam', ts, counts)
+        all_ts.append(ts)
+        all_counts.append(counts)
+    ts, counts = np.concatenate(all_ts), np.concatenate(all_counts)
+    for resolution in (MINUTE, HOUR, DAY):
+        buckets, sums = store.range('cam', resolution)
+        expected_buckets, expected_sums = reference(ts, counts, resolution)
+        assert np.array_equal(buckets, expected_buckets)
+        assert np.array_equal(sums, expected_sums)
+
+
+def test_range_returns_copies():
+    store = TimeSeriesStore()
+    store.add('cam', [0, 60], [1, 2])
+    buckets, counts = store.range('cam', MINUTE)
+    store.add('cam', [60], [5])
+    assert counts.tolist() == [1, 2]
+    assert store.range('cam', MINUTE)[1].tolist() == [1, 7]
+
+
+def test_retention_drops_old_buckets_and_late_counts_before_the_cutoff():
+    rollup = Rollup(retention=10 * MINUTE)
+    for minute in range(100):
+        rollup.add(np.array([minute * MINUTE]), np.array([1]))
+    buckets, _ = rollup.range(None, None)
+    assert buckets[0] == 89 * MINUTE and len(buckets) == 11
+    assert len(rollup.buckets) < 100  # trimmed buckets are compacted away
+    rollup.add(np.array([0]), np.array([1]))
+    assert rollup.range(None, 0 * MINUTE)[0].size == 0
+    assert not rollup.covers(0) and rollup.covers(89 * MINUTE)
+
+
+def test_query_falls_back_to_a_rollup_that_covers_the_range():
+    store = TimeSeriesStore(retention={MINUTE: DAY, HOUR: None, DAY: None})
+    hours = np.arange(0, 3 * DAY, HOUR)
+    store.add('cam', hours, np.ones(len(hours), dtype=np.int64))
+    # a two-hour window from the first day fits the minute rollup's size limit but it was trimmed
+    x, y = store.query(['cam'], start=0, end=2 * HOUR, width=100)
+    assert x.tolist() == [0, HOUR, 2 * HOUR] and y.tolist() == [1, 1, 1]
+
+
+def test_lttb_keeps_endpoints_and_size():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    sx, sy = lttb(x, y, 100)
+    assert len(sx) == 100 and sx[0] == 0 and sx[-1] == 999
+    assert np.all(np.diff(sx) > 0)
@@ -0,0 +1,284 @@
+"""
+Car-count time series for the campaign charts.
+
+Counts are rolled up per camera into minute / hour / day buckets as they are
+added, so a query never touches raw events. query() picks the finest rollup
+that keeps the range under max_points buckets, sums the requested cameras
+and downsamples the result to the chart width with LTTB
+(largest-triangle-three-buckets), so the chart payload stays a few hundred
+points whatever the range.
+
+Each rollup is a pair of arrays with spare capacity that doubles when full,
+so adding counts after the existing buckets is an amortized O(new) append
+and late counts only re-merge the buckets from the first late one on.
+Buckets older than RETENTION[resolution] before a rollup's latest bucket
+are dropped; queries fall back to a coarser rollup for ranges a finer one
+no longer covers.
+"""
+
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+RESOLUTIONS = (MINUTE, HOUR, DAY)
+# how far back each rollup is kept, in seconds (None: forever)
+RETENTION = {MINUTE: 14 * DAY, HOUR: 730 * DAY, DAY: None}
+
+_EMPTY = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+
+def _merge(buckets_a, counts_a, buckets_b, counts_b):
+    """
+    Sum two bucket series (each sorted, unique buckets) into one.
+    """
+    if len(buckets_a) == 0:
+        return buckets_b, counts_b
+    if len(buckets_b) == 0:
+        return buckets_a, counts_a
+    if buckets_b[0] > buckets_a[-1]:
+        # the common case for live data: new buckets strictly after the old ones
+        return np.concatenate([buckets_a, buckets_b]), np.concatenate([counts_a, counts_b])
+    buckets = np.concatenate([buckets_a, buckets_b])
+    counts = np.concatenate([counts_a, counts_b])
+    order = np.argsort(buckets, kind='stable')
+    buckets, counts = buckets[order], counts[order]
+    unique, starts = np.unique(buckets, return_index=True)
+    return unique, np.add.reduceat(counts, starts)
+
+
+def _rollup(timestamps, counts, resolution: int):
+    buckets = timestamps - timestamps % resolution
+    unique, inverse = np.unique(buckets, return_inverse=True)
+    sums = np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+    return unique, sums
+
+
+def lttb(x, y, threshold: int):
+    """
+    Largest-triangle-three-buckets downsampling of (x, y) to threshold points.
+    Bucket averages are computed with NumPy in one pass; the selection walk is
+    inherently sequential but each step is a vectorized argmax over one bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # interior points are split into threshold - 2 buckets; first and last points are always kept
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    cum_x = np.concatenate([[0.0], np.cumsum(x)])
+    cum_y = np.concatenate([[0.0], np.cumsum(y)])
+    sizes = np.maximum(ends - starts, 1)
+    avg_x = (cum_x[ends] - cum_x[starts]) / sizes
+    avg_y = (cum_y[ends] - cum_y[starts]) / sizes
+    # the "next bucket average" of the last bucket is the last point itself
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = starts[i], max(ends[i], starts[i] + 1)
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - next_x[i]) * (by - y[a]) - (x[a] - bx) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return x[selected], y[selected]
+
+
+class Rollup:
+    """
+    Sorted, unique buckets and their counts at one resolution. The live
+    data is buckets[start:end] of arrays with room to grow at the end.
+    """
+
+    def __init__(self, retention: Optional[int] = None, capacity: int = 64):
+        self.retention = retention
+        self.buckets = np.empty(capacity, dtype=np.int64)
+        self.counts = np.empty(capacity, dtype=np.int64)
+        self.start = 0
+        self.end = 0
+        self.cutoff: Optional[int] = None  # buckets before this were dropped
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def _reserve(self, n: int):
+        # make room for n buckets after end, compacting away trimmed ones or doubling
+        if self.end + n <= len(self.buckets):
+            return
+        size = len(self)
+        capacity = len(self.buckets)
+        while size + n > capacity // 2:
+            capacity *= 2
+        buckets = np.empty(capacity, dtype=np.int64)
+        counts = np.empty(capacity, dtype=np.int64)
+        buckets[:size] = self.buckets[self.start:self.end]
+        counts[:size] = self.counts[self.start:self.end]
+        self.buckets, self.counts = buckets, counts
+        self.start, self.end = 0, size
+
+    def add(self, buckets: np.ndarray, counts: np.ndarray):
+        if self.cutoff is not None:
+            keep = np.searchsorted(buckets, self.cutoff, side='left')
+            buckets, counts = buckets[keep:], counts[keep:]
+        if len(buckets) == 0:
+            return
+        # only buckets from the first new one on need merging; for live data that's none
+        at = self.start + int(np.searchsorted(self.buckets[self.start:self.end], buckets[0], side='left'))
+        if at < self.end:
+            buckets, counts = _merge(self.buckets[at:self.end], self.counts[at:self.end], buckets, counts)
+        self.end = at
+        self._reserve(len(buckets))
+        self.buckets[self.end:self.end + len(buckets)] = buckets
+        self.counts[self.end:self.end + len(buckets)] = counts
+        self.end += len(buckets)
+        self._trim()
+
+    def _trim(self):
+        if self.retention is None:
+            return
+        cutoff = int(self.buckets[self.end - 1]) - self.retention
+        drop = int(np.searchsorted(self.buckets[self.start:self.end], cutoff, side='left'))
+        if drop:
+            self.start += drop
+            self.cutoff = cutoff
+
+    def range(self, start: Optional[int], end: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        buckets = self.buckets[self.start:self.end]
+        lo = 0 if start is None else np.searchsorted(buckets, start, side='left')
+        hi = len(buckets) if end is None else np.searchsorted(buckets, end, side='right')
+        # copies: later adds rewrite the tail of the arrays in place
+        return buckets[lo:hi].copy(), self.counts[self.start + lo:self.start + hi].copy()
+
+    def covers(self, start: int) -> bool:
+        return self.cutoff is None or start >= self.cutoff
+
+
+class CameraSeries:
+    def __init__(self, retention: Dict[int, Optional[int]] = RETENTION):
+        self.rollups: Dict[int, Rollup] = {r: Rollup(retention.get(r)) for r in RESOLUTIONS}
+        self.lock = threading.Lock()
+
+    def add(self, timestamps, counts):
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64)
+        if len(timestamps) == 0:
+            return
+        rolled = {r: _rollup(timestamps, counts, r) for r in RESOLUTIONS}
+        with self.lock:
+            for resolution, (buckets, sums) in rolled.items():
+                self.rollups[resolution].add(buckets, sums)
+
+    def range(self, resolution: int, start: Optional[int], end: Optional[int]):
+        with self.lock:
+            return self.rollups[resolution].range(start, end)
+
+    def covers(self, resolution: int, start: int) -> bool:
+        with self.lock:
+            return self.rollups[resolution].covers(start)
+
+    def extent(self) -> Optional[Tuple[int, int]]:
+        with self.lock:
+            minute = self.rollups[MINUTE]
+            if len(minute) == 0:
+                return None
+            # finer rollups may have dropped the oldest buckets; the coarsest starts first
+            first = min(int(r.buckets[r.start]) for r in self.rollups.values())
+            return first, int(minute.buckets[minute.end - 1])
+
+
+class TimeSeriesStore:
+    def __init__(self, retention: Dict[int, Optional[int]] = RETENTION):
+        self.retention = retention
+        self._series: Dict[str, CameraSeries] = {}
+        self._lock = threading.Lock()
+
+    def series(self, camera_id: str) -> CameraSeries:
+        series = self._series.get(camera_id)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(camera_id, CameraSeries(self.retention))
+        return series
+
+    def add(self, camera_id: str, timestamps, counts):
+        """
+        Add car counts observed by camera_id at unix timestamps (seconds).
+        """
+        self.series(camera_id).add(timestamps, counts)
+
+    def range(self, camera_id: str, resolution: int, start: Optional[int] = None, end: Optional[int] = None):
+        """
+        (buckets, counts) of one camera at resolution, empty for unknown cameras.
+        """
+        series = self._series.get(camera_id)
+        if series is None:
+            return _EMPTY
+        return series.range(resolution, start, end)
+
+    def extent(self, camera_ids: Iterable[str]) -> Optional[Tuple[int, int]]:
+        extents = [self._series[c].extent() for c in camera_ids if c in self._series]
+        extents = [e for e in extents if e is not None]
+        if not extents:
+            return None
+        return min(e[0] for e in extents), max(e[1] for e in extents)
+
+    def query(self,
+              camera_ids: Iterable[str],
+              start: Optional[int] = None,
+              end: Optional[int] = None,
+              width: int = 300,
+              max_points: int = 20000):
+        """
+        Summed counts of camera_ids between start and end (unix seconds),
+        downsampled to at most width points. Returns (timestamps, counts).
+        """
+        camera_ids = [c for c in camera_ids if c in self._series]
+        if not camera_ids:
+            return _EMPTY
+        extent = self.extent(camera_ids)
+        if extent is None:
+            return _EMPTY
+        lo = extent[0] if start is None else start
+        hi = extent[1] if end is None else end
+
+        resolution = RESOLUTIONS[-1]
+        for candidate in RESOLUTIONS:
+            if (hi - lo) // candidate <= max_points and \
+                    all(self._series[c].covers(candidate, lo) for c in camera_ids):
+                resolution = candidate
+                break
+
+        buckets, counts = _EMPTY
+        for camera_id in camera_ids:
+            b, c = self._series[camera_id].range(resolution, start, end)
+            buckets, counts = _merge(buckets, counts, b, c)
+        return lttb(buckets, counts, width)
+
+
+def svg_polyline_points(x, y, width: int = 600, height: int = 180, pad: int = 20) -> str:
+    """
+    Scale (x, y) into an SVG viewBox of width x height and format as polyline points.
+    """
+    if len(x) == 0:
+        return ''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x_span = (x[-1] - x[0]) or 1.0
+    y_min, y_max = y.min(), y.max()
+    y_span = (y_max - y_min) or 1.0
+    px = pad + (x - x[0]) / x_span * (width - 2 * pad)
+    py = height - pad - (y - y_min) / y_span * (height - 2 * pad)
+    return ' '.join(f'{a:.1f},{b:.1f}' for a, b in zip(px, py))
+
+
+# shared by the ingestion path and the campaign pages
+car_counts = TimeSeriesStore()